@@ -0,0 +1,352 @@
+"""Admission control and backpressure for the physiognomy API.
+
+Without a limit, a burst of uploads is accepted into uvicorn all at once.
+Every request holds its image and model activations while the CPU
+time-slices between them, so latency climbs for everyone until the
+container runs out of memory or clients time out. ``AdmissionController``
+is a pure ASGI middleware that puts a bounded queue in front of the
+expensive routes:
+
+* Routes map to pools (by default all four analysis endpoints share one
+  ``inference`` pool sized to the CPUs; give an endpoint its own pool for a
+  separate concurrency limit).
+* A pool runs at most ``concurrency`` requests. Up to ``queue`` more wait in
+  priority order, for at most ``max_wait_ms``.
+* When the queue is full, a new request is answered 503 with Retry-After
+  (the estimated drain time) at once, before its body is read. A
+  higher-priority request instead displaces the lowest-priority waiter.
+* Routes without a pool (``/health``, ``/``, ``/palm-analysis-info/``) are
+  never queued, so cheap requests stay fast during an overload.
+* ``GET /health`` responses get an ``admission`` object with per-pool
+  active/queued counts, queue-wait percentiles and rejection counters.
+
+In the physiognomy service::
+
+    from admission_control import AdmissionController, physiognomy_config
+
+    app = FastAPI(...)
+    app = AdmissionController(app, *physiognomy_config())     # ASGI app served by uvicorn
+
+Load test with the swagger mock (043) as the backend and the open-model load
+generator (042) at 3x its capacity, with and without admission control::
+
+    python admission_control.py bench --capacity 20 --overload 3 --duration 10
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from latency_sketch import LatencySketch
+
+HEALTH_PATH = "/health"
+
+
+@dataclass
+class PoolConfig:
+    concurrency: int
+    queue: int
+    max_wait_ms: float = 10000.0
+
+
+@dataclass
+class Route:
+    pool: str
+    priority: int = 1  # lower is served first
+
+
+def physiognomy_config() -> Tuple[Dict[str, PoolConfig], Dict[str, Route]]:
+    """Pools and routes for the physiognomy API, sized from ADMISSION_* env vars."""
+    concurrency = int(os.getenv("ADMISSION_CONCURRENCY", str(os.cpu_count() or 1)))
+    pools = {
+        "inference": PoolConfig(
+            concurrency=concurrency,
+            queue=int(os.getenv("ADMISSION_QUEUE", str(2 * concurrency))),
+            max_wait_ms=float(os.getenv("ADMISSION_MAX_WAIT_MS", "10000")),
+        ),
+    }
+    routes = {
+        # Re-analyses from Cloudinary are usually the user waiting on history; serve them first
+        "POST /analyze-face-from-cloudinary/": Route("inference", priority=0),
+        "POST /analyze-palm-cloudinary/": Route("inference", priority=0),
+        "POST /analyze-face/": Route("inference"),
+        "POST /analyze-palm/": Route("inference"),
+    }
+    return pools, routes
+
+
+class Pool:
+    """Concurrency slots plus a bounded priority queue of waiters."""
+
+    def __init__(self, name: str, config: PoolConfig):
+        self.name = name
+        self.config = config
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._service_time = 0.0  # EWMA seconds, for Retry-After
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.displaced = 0
+        self.queue_wait = LatencySketch()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        service = self._service_time or 1.0
+        backlog = self.active + self.queued
+        return max(1, math.ceil(backlog * service / self.config.concurrency))
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot; False when rejected (queue full, displaced or waited too long)."""
+        if self.active < self.config.concurrency and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            self.queue_wait.add(0.0)
+            return True
+
+        if self.queued >= self.config.queue:
+            live = [w for w in self._waiters if not w[2].done()]
+            worst = max(live, key=lambda w: (w[0], w[1])) if live else None
+            if worst is None or worst[0] <= priority:
+                self.rejected_full += 1
+                return False
+            worst[2].set_result(False)  # make room for the more important request
+            self.displaced += 1
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait({future}, timeout=self.config.max_wait_ms / 1000)
+        except asyncio.CancelledError:
+            # Client gone while queued: withdraw, or hand back a slot granted in the meantime
+            if not future.done():
+                future.cancel()
+            elif future.result():
+                self.release(0.0, record=False)
+            raise
+        if not future.done():
+            future.cancel()
+            self.rejected_timeout += 1
+            return False
+        if not future.result():
+            return False
+        self.admitted += 1
+        self.queue_wait.add((time.perf_counter() - started) * 1000)
+        return True
+
+    def release(self, service_seconds: float, record: bool = True) -> None:
+        if record:
+            self._service_time = service_seconds if not self._service_time else \
+                0.9 * self._service_time + 0.1 * service_seconds
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)  # the slot passes straight to the waiter
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        wait = self.queue_wait
+        return {
+            "concurrency": self.config.concurrency,
+            "queue_limit": self.config.queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "displaced": self.displaced,
+            "queue_wait_ms": {key: round(value, 2) if isinstance(value, float) else value
+                              for key, value in wait.summary((0.5, 0.99)).items()},
+            "service_time_ms": round(self._service_time * 1000, 1),
+        }
+
+
+async def _reject(send, status: int, retry_after: Optional[int], detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionController:
+    """ASGI middleware: bounded, prioritized admission for routed requests."""
+
+    def __init__(self, app, pools: Dict[str, PoolConfig], routes: Dict[str, Route], health_path: str = HEALTH_PATH):
+        self.app = app
+        self.pools = {name: Pool(name, config) for name, config in pools.items()}
+        self.routes = routes
+        self.health_path = health_path
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == self.health_path and scope["method"] == "GET":
+            await self._health(scope, receive, send)
+            return
+
+        route = self.routes.get(f"{scope['method']} {scope['path']}")
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        pool = self.pools[route.pool]
+        if not await pool.acquire(route.priority):
+            # The body is never read: rejected uploads cost almost nothing
+            await _reject(send, 503, pool.retry_after(), "Server busy, retry later")
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release(time.perf_counter() - started)
+
+    async def _health(self, scope, receive, send) -> None:
+        """Pass /health through, adding the admission stats to a JSON object body."""
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await finish()
+
+        async def finish():
+            body = b"".join(chunks)
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                payload = None
+            headers = list(start.get("headers", []))
+            if isinstance(payload, dict):
+                payload["admission"] = self.stats()
+                body = json.dumps(payload).encode()
+                headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                headers.append((b"content-length", str(len(body)).encode()))
+            await send({"type": "http.response.start", "status": start.get("status", 200), "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, capture)
+
+
+# ============================================
+# Load test
+# ============================================
+
+def _serve(port: int, capacity: float, admission: bool) -> None:
+    """Mock physiognomy backend that completes ``capacity`` analyses per second, optionally behind admission control."""
+    import uvicorn
+
+    from swagger_mock import MockApp
+    from swagger_spec import load_service
+
+    workers = 4
+    analysis = {"latency": f"fixed:{1000 * workers / capacity:g}", "max_rps": capacity, "burst": 1}
+    profile = {"default": {"latency": "fixed:2"},
+               "operations": {key: analysis for key in ("POST /analyze-face/", "POST /analyze-palm/")}}
+    app: Any = MockApp(load_service("physiognomy"), profile)
+    if admission:
+        pools = {"inference": PoolConfig(concurrency=workers, queue=workers * 2, max_wait_ms=2000)}
+        routes = {"POST /analyze-face/": Route("inference"), "POST /analyze-palm/": Route("inference")}
+        app = AdmissionController(app, pools, routes)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False, backlog=4096)
+
+
+def bench(capacity: float, overload: float, duration: float, port: int) -> None:
+    import socket
+    import subprocess
+    import sys
+
+    import httpx
+
+    from swagger_loadgen import build_target, run_scenario
+
+    rows = []
+    for admission in (False, True):
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "_serve", "--port", str(port),
+                                   "--capacity", str(capacity)] + (["--admission"] if admission else []))
+        try:
+            deadline = time.monotonic() + 15
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise SystemExit("backend did not start (is uvicorn installed?)")
+                    time.sleep(0.1)
+            base_url = f"http://127.0.0.1:{port}"
+            targets = [build_target(config, None) for config in (
+                {"service": "physiognomy", "endpoint": "POST /analyze-face/", "rate": capacity * overload,
+                 "base_url": base_url, "files": {"file": "khuon-mat-hinh-chu-nhat.jpg"}},
+                {"service": "physiognomy", "endpoint": "GET /palm-analysis-info/", "rate": 10, "base_url": base_url},
+            )]
+            asyncio.run(run_scenario(targets, duration, timeout=60))
+            health = httpx.get(base_url + HEALTH_PATH).json().get("admission")
+        finally:
+            server.terminate()
+            server.wait()
+        rows.append((admission, targets, health))
+
+    print("=" * 100)
+    print(f"ADMISSION CONTROL ({overload:g}x overload: {capacity * overload:g} analyses/s offered, "
+          f"capacity {capacity:g}/s, {duration:g}s)")
+    print("=" * 100)
+    print(f"{'':<10} {'endpoint':<26} {'200':>7} {'503':>6} {'other':>6} {'p50 ms':>9} {'p99 ms':>9} {'p99 200s':>9}")
+    for admission, targets, health in rows:
+        for t in targets:
+            ok, rejected = t.statuses.get("200", 0), t.statuses.get("503", 0)
+            other = sum(t.statuses.values()) - ok - rejected
+            print(f"{'admission' if admission else 'none':<10} {t.endpoint:<26} {ok:>7} {rejected:>6} "
+                  f"{other:>6} {t.latency.quantile(0.5) or 0:>9.1f} {t.latency.quantile(0.99) or 0:>9.1f} "
+                  f"{t.ok_latency.quantile(0.99) or 0:>9.1f}")
+        if health:
+            pool = health["inference"]
+            print(f"{'':<10} /health: queue_wait p50 {pool['queue_wait_ms']['p50']} ms, "
+                  f"p99 {pool['queue_wait_ms']['p99']} ms, rejected_full {pool['rejected_full']}, "
+                  f"rejected_timeout {pool['rejected_timeout']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Admission control for the physiognomy API")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--capacity", type=float, default=20, help="Analyses/second the mock backend can complete")
+    b.add_argument("--overload", type=float, default=3)
+    b.add_argument("--duration", type=float, default=10)
+    b.add_argument("--port", type=int, default=28101)
+    s = sub.add_parser("_serve")
+    s.add_argument("--port", type=int, required=True)
+    s.add_argument("--capacity", type=float, required=True)
+    s.add_argument("--admission", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.capacity, args.overload, args.duration, args.port)
+    else:
+        _serve(args.port, args.capacity, args.admission)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Result cache for the physiognomy face/palm analyses.
+
+Retries, re-scans and history reloads post byte-identical images to
+``/analyze-face/`` and ``/analyze-palm/``, and each one re-ran landmark
+detection and interpretation. Results are now cached under::
+
+    sha256(endpoint, model revision, params, sha256(image bytes))
+
+so the same image with the same parameters (``gender`` for palms) is
+answered from memory, or from the shared on-disk store when another worker
+computed it. ANALYSIS_MODEL_REVISION (set it on every model or prompt
+change) is part of the key, so a new revision never serves old answers.
+Concurrent identical requests, typically a client retry while the first
+attempt is still running, wait for one computation instead of starting a
+second one.
+
+In the physiognomy service::
+
+    from analysis_result_cache import analysis_cache
+
+    @app.post("/analyze-palm/")
+    async def analyze_palm(file: UploadFile, gender: str = "male"):
+        image = await file.read()
+        return await analysis_cache.aget_or_compute(
+            "analyze-palm", image, {"gender": gender},
+            lambda: run_in_threadpool(analyze_palm_image, image, gender))
+
+Replaying a request log (JSON lines with endpoint, image path, gender) or a
+synthetic one with retries and re-scans::
+
+    python analysis_result_cache.py bench --requests 1000 --compute-ms 400
+    python analysis_result_cache.py bench --log requests.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_REVISION = os.getenv("ANALYSIS_MODEL_REVISION", "1")
+MEMORY_MAX_MB = float(os.getenv("ANALYSIS_CACHE_MEMORY_MB", "128"))
+# Shared store for all workers; empty disables it
+DISK_PATH = os.getenv("ANALYSIS_CACHE_DB", "")
+TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Result handed to async waiters when the computing request was cancelled
+_CANCELLED = object()
+
+
+def image_digest(image: bytes) -> str:
+    """SHA-256 of the uploaded image bytes (after multipart/base64 decoding)."""
+    return hashlib.sha256(image).hexdigest()
+
+
+def result_key(endpoint: str, image: bytes, params: Optional[Dict[str, Any]] = None,
+               revision: str = MODEL_REVISION) -> str:
+    material = json.dumps([endpoint, revision, params or {}, image_digest(image)], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ResultCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # waited for an identical in-flight computation
+    compute_seconds: float = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        return (total - self.misses) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.__dict__)
+        out["hit_ratio"] = round(self.hit_ratio, 4)
+        return out
+
+
+class AnalysisResultCache:
+    """
+    Memory LRU (bounded by encoded size) in front of an optional SQLite store.
+
+    Results must be JSON-serializable; they are kept zlib-compressed, since
+    face results carry the annotated image as base64.
+    """
+
+    def __init__(self, memory_max_bytes: int = int(MEMORY_MAX_MB * 1024 * 1024), disk_path: str = DISK_PATH,
+                 ttl: float = TTL, revision: str = MODEL_REVISION):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_path = disk_path
+        self.ttl = ttl
+        self.revision = revision
+        self.stats = ResultCacheStats()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._ainflight: Dict[str, "asyncio.Future"] = {}
+
+    # --------------------------------------------
+    # Storage
+    # --------------------------------------------
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if not self.disk_path:
+            return None
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.disk_path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                       "created_at REAL NOT NULL)")
+            self._local.db = db
+        return db
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = blob
+            self._memory_bytes += len(blob)
+            while self._memory_bytes > self.memory_max_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+        if blob is None:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute("SELECT value FROM results WHERE key = ? AND created_at > ?",
+                             (key, time.time() - self.ttl)).fetchone()
+            if row is None:
+                return None
+            blob = row[0]
+            self._remember(key, blob)
+            self.stats.disk_hits += 1
+        return json.loads(zlib.decompress(blob))
+
+    def _store(self, key: str, result: Any) -> None:
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 3)
+        self._remember(key, blob)
+        db = self._db()
+        if db is not None:
+            try:
+                db.execute("INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)",
+                           (key, blob, time.time()))
+            except sqlite3.Error:
+                logger.warning("Could not persist analysis result %s", key, exc_info=True)
+
+    def key(self, endpoint: str, image: bytes, params: Optional[Dict[str, Any]] = None) -> str:
+        return result_key(endpoint, image, params, self.revision)
+
+    # --------------------------------------------
+    # Lookup or compute
+    # --------------------------------------------
+
+    def get_or_compute(self, endpoint: str, image: bytes, params: Optional[Dict[str, Any]],
+                       compute: Callable[[], Any]) -> Any:
+        """Cached result, or ``compute()`` once for concurrent identical calls (exceptions are not cached)."""
+        key = self.key(endpoint, image, params)
+        while True:
+            result = self._lookup(key)
+            if result is not None:
+                return result
+            with self._lock:
+                event = self._inflight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._inflight[key] = threading.Event()
+            if owner:
+                break
+            event.wait()
+            with self._lock:
+                blob = self._memory.get(key)
+            if blob is not None:
+                self.stats.coalesced += 1
+                return json.loads(zlib.decompress(blob))
+            # The owner failed: try again (and probably compute ourselves)
+
+        try:
+            t0 = time.perf_counter()
+            result = compute()
+            self.stats.compute_seconds += time.perf_counter() - t0
+            self.stats.misses += 1
+            self._store(key, result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    async def aget_or_compute(self, endpoint: str, image: bytes, params: Optional[Dict[str, Any]],
+                              compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant: ``compute`` returns an awaitable; coalescing is per event loop."""
+        key = self.key(endpoint, image, params)
+        while True:
+            result = self._lookup(key)
+            if result is not None:
+                return result
+            future = self._ainflight.get(key)
+            if future is None:
+                break
+            result = await asyncio.shield(future)
+            if result is not _CANCELLED:
+                self.stats.coalesced += 1
+                return result
+            # The owner was cancelled (client gone): try again (and probably compute ourselves)
+
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        try:
+            t0 = time.perf_counter()
+            result = await compute()
+            self.stats.compute_seconds += time.perf_counter() - t0
+            self.stats.misses += 1
+            self._store(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Not the waiters' cancellation: release them to retry
+            future.set_result(_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't log "never retrieved"
+            raise
+        finally:
+            del self._ainflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        db = self._db()
+        if db is not None:
+            db.execute("DELETE FROM results")
+
+    def memory_usage(self) -> Tuple[int, int]:
+        """(entries, bytes) held in memory."""
+        return len(self._memory), self._memory_bytes
+
+
+analysis_cache = AnalysisResultCache()
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _synthetic_log(requests: int, users: int, seed: int = 11):
+    """
+    Upload sessions: a new scan, then with some probability a retry (same
+    bytes, within a second), history reloads of the same image later, and
+    re-scans of the same photo with the other gender setting.
+    """
+    import random
+
+    rng = random.Random(seed)
+    images = []
+    log = []
+    t = 0.0
+    while len(log) < requests:
+        t += rng.expovariate(4.0)
+        if not images or rng.random() < 0.45:
+            endpoint = rng.choice(["analyze-face", "analyze-palm"])
+            image = os.urandom(rng.randint(60, 400) * 1024)
+            gender = rng.choice(["male", "female"]) if endpoint == "analyze-palm" else None
+            images.append((endpoint, image, gender))
+            log.append((t, endpoint, image, gender))
+            if rng.random() < 0.15:
+                log.append((t + rng.uniform(0.05, 0.5), endpoint, image, gender))  # client retry, in flight
+        else:
+            endpoint, image, gender = rng.choice(images[-users:])
+            if endpoint == "analyze-palm" and rng.random() < 0.1:
+                gender = "female" if gender == "male" else "male"
+            log.append((t, endpoint, image, gender))
+    log.sort(key=lambda entry: entry[0])
+    return log[:requests]
+
+
+def _load_log(path: str):
+    log = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            with open(entry["image"], "rb") as image:
+                log.append((entry.get("t", len(log) * 0.25), entry["endpoint"], image.read(), entry.get("gender")))
+    return log
+
+
+def bench(requests: int, users: int, compute_ms: float, speedup: float, log_path: Optional[str]) -> None:
+    """Replay a request log through the cache with a simulated analysis."""
+    import tempfile
+
+    from latency_sketch import LatencySketch
+
+    import base64
+
+    log = _load_log(log_path) if log_path else _synthetic_log(requests, users)
+    # Face results carry the annotated image as base64 (incompressible, like the real JPEG)
+    annotated = base64.b64encode(os.urandom(48 * 1024)).decode("ascii")
+
+    async def analyze(endpoint: str, image: bytes, gender: Optional[str]) -> Dict[str, Any]:
+        await asyncio.sleep(compute_ms / 1000)
+        return {"endpoint": endpoint, "gender": gender, "digest": image_digest(image)[:16],
+                "annotated_image": annotated if endpoint == "analyze-face" else None}
+
+    async def replay(cache: Optional[AnalysisResultCache]):
+        sketch, hits = LatencySketch(), LatencySketch()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def one(at: float, endpoint: str, image: bytes, gender: Optional[str]):
+            delay = start + at / speedup - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            t0 = time.perf_counter()
+            params = {"gender": gender} if gender else {}
+            if cache is None:
+                await analyze(endpoint, image, gender)
+            else:
+                misses = cache.stats.misses
+                await cache.aget_or_compute(endpoint, image, params, lambda: analyze(endpoint, image, gender))
+                hit = cache.stats.misses == misses
+            elapsed = (time.perf_counter() - t0) * 1000
+            sketch.add(elapsed)
+            if cache is not None and hit:
+                hits.add(elapsed)
+
+        await asyncio.gather(*(one(*entry) for entry in log))
+        return sketch, hits
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [("no cache", None),
+                ("memory", AnalysisResultCache(disk_path="")),
+                ("memory 1 MiB + disk", AnalysisResultCache(memory_max_bytes=1024 * 1024,
+                                                            disk_path=os.path.join(tmp, "results.sqlite3")))]
+        print("=" * 96)
+        print(f"ANALYSIS RESULT CACHE ({len(log)} requests, {len({image_digest(e[2]) for e in log})} distinct images, "
+              f"analysis {compute_ms:g} ms)")
+        print("=" * 96)
+        print(f"{'cache':<22} {'hit ratio':>9} {'coalesced':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+              f"{'hit p50':>9} {'hit p99':>9} {'compute s':>10}")
+        for label, cache in runs:
+            sketch, hits = asyncio.run(replay(cache))
+            stats = cache.stats if cache else ResultCacheStats(misses=len(log),
+                                                              compute_seconds=len(log) * compute_ms / 1000)
+            print(f"{label:<22} {stats.hit_ratio:>9.1%} {stats.coalesced:>9} {sketch.quantile(0.5):>9.2f} "
+                  f"{sketch.quantile(0.9):>9.2f} {sketch.quantile(0.99):>9.2f} {hits.quantile(0.5) or 0:>9.3f} "
+                  f"{hits.quantile(0.99) or 0:>9.3f} {stats.compute_seconds:>10.1f}")
+        entries, size = runs[1][1].memory_usage()
+        print(f"memory cache: {entries} results in {size / 1024:.0f} KiB compressed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Face/palm analysis result cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Replay a request log through the cache")
+    b.add_argument("--requests", type=int, default=1000)
+    b.add_argument("--users", type=int, default=200, help="Recent uploads a reload/re-scan picks from")
+    b.add_argument("--compute-ms", type=float, default=400, help="Simulated analysis time")
+    b.add_argument("--speedup", type=float, default=5, help="Replay the log this much faster than recorded")
+    b.add_argument("--log", help="JSON lines: {t, endpoint, image, gender}")
+    args = parser.parse_args()
+
+    bench(args.requests, args.users, args.compute_ms, args.speedup, args.log)
+
+
+if __name__ == "__main__":
+    main()
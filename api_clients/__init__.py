@@ -0,0 +1,3 @@
+"""Clients generated by swagger_client_gen.py: chatbot, chatbot_docs, glowlab, physiognomy."""
+
+from ._base import ApiError, shared_async_client, shared_client
@@ -0,0 +1,178 @@
+"""Shared runtime for the generated clients. Generated by swagger_client_gen.py."""
+
+import asyncio
+import dataclasses
+import json as _json
+import os
+import sys
+import threading
+import weakref
+from typing import Any, ClassVar, Dict, Optional, Tuple, Union
+
+import httpx
+
+# One pool for every generated client in the process: connections to the same
+# host are reused across services and threads
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("API_CLIENT_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("API_CLIENT_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+DEFAULT_TIMEOUT = httpx.Timeout(float(os.getenv("API_CLIENT_TIMEOUT", "120")), connect=5.0)
+
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+# File upload: raw bytes, or (filename, bytes[, content type])
+FileInput = Union[bytes, Tuple[str, bytes], Tuple[str, bytes, str]]
+
+
+def shared_client() -> httpx.Client:
+    """Process-wide keep-alive client."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+    return _sync_client
+
+
+def shared_async_client() -> httpx.AsyncClient:
+    """Keep-alive client for the running event loop (connections cannot cross loops)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+    return client
+
+
+class ApiError(Exception):
+    """Non-2xx response."""
+
+    def __init__(self, status_code: int, body: Any, method: str, url: str):
+        super().__init__(f"{method} {url} -> {status_code}: {str(body)[:300]}")
+        self.status_code = status_code
+        self.body = body
+
+
+class Model:
+    """Base for generated dataclasses: JSON names and nested model types per field."""
+
+    _json_names: ClassVar[Dict[str, str]] = {}
+    _nested: ClassVar[Dict[str, Tuple[str, str]]] = {}  # field -> ("one" | "list", model class name)
+
+    @classmethod
+    def _model(cls, name: str) -> type:
+        return getattr(sys.modules[cls.__module__], name)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Build from a decoded JSON object; unknown keys are ignored, missing ones are None."""
+        kwargs = {}
+        for f in dataclasses.fields(cls):
+            value = data.get(cls._json_names.get(f.name, f.name))
+            nested = cls._nested.get(f.name)
+            if nested and value is not None:
+                model = cls._model(nested[1])
+                value = [model.from_dict(v) for v in value] if nested[0] == "list" else model.from_dict(value)
+            kwargs[f.name] = value
+        return cls(**kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON object with None fields omitted."""
+        out = {}
+        for f in dataclasses.fields(self):
+            value = getattr(self, f.name)
+            if value is None:
+                continue
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [v.to_dict() if isinstance(v, Model) else v for v in value]
+            out[self._json_names.get(f.name, f.name)] = value
+        return out
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(response: httpx.Response, model: Any) -> Any:
+    if not response.content:
+        return None
+    if "json" not in response.headers.get("content-type", "json"):
+        return response.text
+    data = response.json()
+    if model is None or data is None:
+        return data
+    if isinstance(model, list):
+        return [model[0].from_dict(v) for v in data]
+    return model.from_dict(data)
+
+
+def _files(files: Dict[str, FileInput]) -> Dict[str, Any]:
+    return {name: (name, value) if isinstance(value, bytes) else value for name, value in files.items()}
+
+
+def _form(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Plain form fields (FastAPI Form()): objects go as JSON text
+    return {name: _json.dumps(_encode(value)) if isinstance(value, (dict, Model)) else value
+            for name, value in data.items() if value is not None}
+
+
+class _ClientBase:
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = dict(headers or {})
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def _prepare(self, params, json, data, files, headers) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"headers": {**self.headers, **{k: v for k, v in (headers or {}).items() if v is not None}}}
+        if params:
+            kwargs["params"] = {k: v for k, v in params.items() if v is not None}
+        if json is not None:
+            kwargs["json"] = _encode(json)
+        if data:
+            kwargs["data"] = _form(data)
+        if files:
+            # Non-empty files makes httpx send multipart/form-data, otherwise data is urlencoded
+            kwargs["files"] = _files({k: v for k, v in files.items() if v is not None})
+        return kwargs
+
+
+class BaseClient(_ClientBase):
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.Client] = None):
+        super().__init__(base_url, token, headers)
+        self._client = client
+
+    def _request(self, method: str, path: str, params=None, json=None, data=None, files=None, headers=None,
+                 model=None) -> Any:
+        client = self._client or shared_client()
+        url = self.base_url + path
+        response = client.request(method, url, **self._prepare(params, json, data, files, headers))
+        if response.status_code >= 400:
+            raise ApiError(response.status_code, response.text, method, url)
+        return _decode(response, model)
+
+
+class AsyncBaseClient(_ClientBase):
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.AsyncClient] = None):
+        super().__init__(base_url, token, headers)
+        self._client = client
+
+    async def _request(self, method: str, path: str, params=None, json=None, data=None, files=None, headers=None,
+                       model=None) -> Any:
+        client = self._client or shared_async_client()
+        url = self.base_url + path
+        response = await client.request(method, url, **self._prepare(params, json, data, files, headers))
+        if response.status_code >= 400:
+            raise ApiError(response.status_code, response.text, method, url)
+        return _decode(response, model)
@@ -0,0 +1,149 @@
+"""Generated by swagger_client_gen.py from aichatbot.swagger. Do not edit by hand."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote as _quote
+
+try:
+    from typing import Literal
+except ImportError:  # Python < 3.8
+    from typing_extensions import Literal
+
+from ._base import ApiError, AsyncBaseClient, BaseClient, FileInput, Model
+
+DEFAULT_BASE_URL = os.getenv("CHATBOT_BASE_URL", "http://localhost:8000/api/v1")
+
+
+@dataclass
+class File(Model):
+    """File"""
+
+    filename: str  # Tên file
+    size: Optional[str] = None  # Kích thước file
+    modified: Optional[str] = None  # Ngày sửa đổi
+
+
+@dataclass
+class ChartJsonInput(Model):
+    """ChartJsonInput"""
+
+    chart_data: Dict[str, Any]  # JSON lá số từ API (toàn bộ response object)
+    question: str  # Câu hỏi cần luận giải (ví dụ: "Sự nghiệp của tôi như thế nào?", "Năm nay tôi có tình duyên không?")
+
+
+@dataclass
+class Error(Model):
+    """Error"""
+
+    message: str  # Thông báo lỗi
+
+
+@dataclass
+class AnalysisResult(Model):
+    """AnalysisResult"""
+
+    analysis: str  # Kết quả luận giải chi tiết
+    timestamp: str  # Thời gian phân tích
+    status: str  # Trạng thái
+    filename: Optional[str] = None  # Tên file đã phân tích (nếu có)
+    name: Optional[str] = None  # Tên người xem lá số
+    extracted_text: Optional[str] = None  # Text đã trích xuất/format từ lá số
+    method: Optional[str] = None  # Phương pháp: json/ocr+vision/pdf
+    processing_time: Optional[str] = None  # Thời gian xử lý
+
+
+@dataclass
+class ChatStart(Model):
+    """ChatStart"""
+
+    user_id: int  # ID người dùng
+    chart_id: Optional[int] = None  # ID lá số (optional)
+
+
+@dataclass
+class ChatMessage(Model):
+    """ChatMessage"""
+
+    conversation_id: int  # ID cuộc hội thoại
+    message: str  # Tin nhắn
+
+
+class ChatbotClient(BaseClient):
+    """🔮 Tử Vi API Pro - NHANH GẤP 5 LẦN (sync; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    def get_chat_history(self, conversation_id: int) -> Any:
+        """Lấy lịch sử chat (GET /chat/history/{conversation_id})"""
+        return self._request("GET", f"/chat/history/{_quote(str(conversation_id), safe='')}", model=None)
+
+    def post_chat_message(self, body: Union[ChatMessage, Dict[str, Any]]) -> Any:
+        """Gửi tin nhắn và nhận phản hồi từ Agent (POST /chat/message)"""
+        return self._request("POST", "/chat/message", json=body, model=None)
+
+    def post_chat_start(self, body: Union[ChatStart, Dict[str, Any]]) -> Any:
+        """Bắt đầu cuộc hội thoại mới (POST /chat/start)"""
+        return self._request("POST", "/chat/start", json=body, model=None)
+
+    def get_user_conversations(self, user_id: int) -> Any:
+        """Lấy danh sách conversation IDs của user (GET /chat/user/{user_id}/conversations)"""
+        return self._request("GET", f"/chat/user/{_quote(str(user_id), safe='')}/conversations", model=None)
+
+    def list_files(self, *, x_fields: Optional[str] = None) -> List[File]:
+        """📁 Lấy danh sách file trong thư mục test (GET /files)"""
+        return self._request("GET", "/files", headers={'X-Fields': x_fields}, model=[File])
+
+    def analyze_upload(self, file: FileInput, *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🐌 CẢN CŨ - CHẬM: Upload và luận giải từ hình ảnh/PDF (dùng OCR + Vision) (POST /tuvi/analyze)"""
+        return self._request("POST", "/tuvi/analyze", files={'file': file}, headers={'X-Fields': x_fields}, model=AnalysisResult)
+
+    def analyze_json(self, body: Union[ChartJsonInput, Dict[str, Any]], *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🚀 ENDPOINT MỚI - NHANH NHẤT: Luận giải từ JSON lá số (KHÔNG CẦN OCR/VISION) (POST /tuvi/analyze-json)"""
+        return self._request("POST", "/tuvi/analyze-json", json=body, headers={'X-Fields': x_fields}, model=AnalysisResult)
+
+    def analyze_file(self, filename: str, *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🔍 Luận giải file có sẵn trong thư mục test (CHẬM - dùng OCR/Vision) (GET /tuvi/analyze/{filename})"""
+        return self._request("GET", f"/tuvi/analyze/{_quote(str(filename), safe='')}", headers={'X-Fields': x_fields}, model=AnalysisResult)
+
+
+class AsyncChatbotClient(AsyncBaseClient):
+    """🔮 Tử Vi API Pro - NHANH GẤP 5 LẦN (async; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    async def get_chat_history(self, conversation_id: int) -> Any:
+        """Lấy lịch sử chat (GET /chat/history/{conversation_id})"""
+        return await self._request("GET", f"/chat/history/{_quote(str(conversation_id), safe='')}", model=None)
+
+    async def post_chat_message(self, body: Union[ChatMessage, Dict[str, Any]]) -> Any:
+        """Gửi tin nhắn và nhận phản hồi từ Agent (POST /chat/message)"""
+        return await self._request("POST", "/chat/message", json=body, model=None)
+
+    async def post_chat_start(self, body: Union[ChatStart, Dict[str, Any]]) -> Any:
+        """Bắt đầu cuộc hội thoại mới (POST /chat/start)"""
+        return await self._request("POST", "/chat/start", json=body, model=None)
+
+    async def get_user_conversations(self, user_id: int) -> Any:
+        """Lấy danh sách conversation IDs của user (GET /chat/user/{user_id}/conversations)"""
+        return await self._request("GET", f"/chat/user/{_quote(str(user_id), safe='')}/conversations", model=None)
+
+    async def list_files(self, *, x_fields: Optional[str] = None) -> List[File]:
+        """📁 Lấy danh sách file trong thư mục test (GET /files)"""
+        return await self._request("GET", "/files", headers={'X-Fields': x_fields}, model=[File])
+
+    async def analyze_upload(self, file: FileInput, *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🐌 CẢN CŨ - CHẬM: Upload và luận giải từ hình ảnh/PDF (dùng OCR + Vision) (POST /tuvi/analyze)"""
+        return await self._request("POST", "/tuvi/analyze", files={'file': file}, headers={'X-Fields': x_fields}, model=AnalysisResult)
+
+    async def analyze_json(self, body: Union[ChartJsonInput, Dict[str, Any]], *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🚀 ENDPOINT MỚI - NHANH NHẤT: Luận giải từ JSON lá số (KHÔNG CẦN OCR/VISION) (POST /tuvi/analyze-json)"""
+        return await self._request("POST", "/tuvi/analyze-json", json=body, headers={'X-Fields': x_fields}, model=AnalysisResult)
+
+    async def analyze_file(self, filename: str, *, x_fields: Optional[str] = None) -> AnalysisResult:
+        """🔍 Luận giải file có sẵn trong thư mục test (CHẬM - dùng OCR/Vision) (GET /tuvi/analyze/{filename})"""
+        return await self._request("GET", f"/tuvi/analyze/{_quote(str(filename), safe='')}", headers={'X-Fields': x_fields}, model=AnalysisResult)
@@ -0,0 +1,404 @@
+"""Generated by swagger_client_gen.py from swagger.json. Do not edit by hand."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote as _quote
+
+try:
+    from typing import Literal
+except ImportError:  # Python < 3.8
+    from typing_extensions import Literal
+
+from ._base import ApiError, AsyncBaseClient, BaseClient, FileInput, Model
+
+DEFAULT_BASE_URL = os.getenv("GLOWLAB_BASE_URL", "http://localhost:3000")
+
+
+SuccessCode = Literal['OPERATION_SUCCESS']
+RoleName = Literal['admin', 'user']
+EnumsGender = Literal['male', 'female']
+Gender = EnumsGender
+EnumsLineType = Literal['heart', 'head', 'life', 'fate', 'sun', 'unknown']
+LineType = EnumsLineType
+EnumsLifeAspectType = Literal['health', 'career', 'relationships', 'personality']
+LifeAspectType = EnumsLifeAspectType
+RecordStringNumber = Dict[str, float]
+
+
+@dataclass
+class GeneralResponse(Model):
+    """GeneralResponse"""
+
+    data: Any
+    code: SuccessCode
+    message: str
+
+
+@dataclass
+class CreateUserDTO(Model):
+    """CreateUserDTO"""
+
+    password: str
+    firstName: str
+    lastName: str
+    email: str
+    phone: str
+    age: float
+    gender: Gender
+    username: Optional[str] = None
+    confirmPassword: Optional[str] = None
+    avatar: Optional[str] = None
+
+
+@dataclass
+class UpdateUserDTO(Model):
+    """UpdateUserDTO"""
+
+    firstName: str
+    lastName: str
+    email: str
+    phone: str
+    age: float
+    gender: Gender
+    avatar: Optional[str] = None
+
+
+@dataclass
+class InterpretationDto(Model):
+    """InterpretationDto"""
+
+    lineType: LineType
+    pattern: str
+    meaning: str
+    lengthPx: float
+    confidence: float
+
+
+@dataclass
+class LifeAspectDto(Model):
+    """LifeAspectDto"""
+
+    aspect: LifeAspectType
+    content: str
+
+
+@dataclass
+class PalmAnalysisDto(Model):
+    """PalmAnalysisDto"""
+    _nested: ClassVar[Dict[str, Tuple[str, str]]] = {'interpretations': ('list', 'InterpretationDto'), 'lifeAspects': ('list', 'LifeAspectDto')}
+
+    userId: float
+    annotatedImage: str
+    targetLines: str
+    imageHeight: float
+    imageWidth: float
+    imageChannels: float
+    summaryText: str
+    interpretations: List[InterpretationDto]
+    lifeAspects: List[LifeAspectDto]
+    palmLinesDetected: Optional[float] = None
+    detectedHeartLine: Optional[float] = None
+    detectedHeadLine: Optional[float] = None
+    detectedLifeLine: Optional[float] = None
+    detectedFateLine: Optional[float] = None
+
+
+@dataclass
+class FacialAnalysisDto(Model):
+    """FacialAnalysisDto"""
+
+    userId: str
+    resultText: str
+    faceShape: str
+    harmonyScore: float
+    probabilities: RecordStringNumber
+    harmonyDetails: RecordStringNumber
+    metrics: List[Dict[str, Any]]
+    annotatedImage: str
+    processedAt: str
+
+
+@dataclass
+class AuthRequest(Model):
+    """AuthRequest"""
+
+    username: str
+    password: str
+
+
+@dataclass
+class ChangePasswordDTO(Model):
+    """ChangePasswordDTO"""
+
+    oldPassword: str
+    password: str
+
+
+@dataclass
+class RequestResetPassword(Model):
+    """RequestResetPassword"""
+
+    email: str
+
+
+@dataclass
+class ResetPassword(Model):
+    """ResetPassword"""
+
+    password: str
+
+
+@dataclass
+class RefreshTokenRequest(Model):
+    """RefreshTokenRequest"""
+
+    refreshToken: str
+
+
+class GlowlabClient(BaseClient):
+    """ai-phil (sync; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    def get_user_by_role(self, *, role_name: List[RoleName], page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetUserByRole (GET /user-role/users)"""
+        return self._request("GET", "/user-role/users", params={'roleName': role_name, 'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    def get_role_by_user(self, *, user_id: float, page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetRoleByUser (GET /user-role/roles)"""
+        return self._request("GET", "/user-role/roles", params={'userId': user_id, 'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    def update_user_role(self, body: List[RoleName], *, user_id: float) -> GeneralResponse:
+        """UpdateUserRole (PUT /user-role)"""
+        return self._request("PUT", "/user-role", params={'userId': user_id}, json=body, model=GeneralResponse)
+
+    def get_users(self, *, id: float) -> GeneralResponse:
+        """GetUsers (GET /users)"""
+        return self._request("GET", "/users", params={'id': id}, model=GeneralResponse)
+
+    def update_user(self, body: Union[UpdateUserDTO, Dict[str, Any]], *, id: float) -> GeneralResponse:
+        """UpdateUser (PUT /users)"""
+        return self._request("PUT", "/users", params={'id': id}, json=body, model=GeneralResponse)
+
+    def delete_user(self, *, id: float) -> GeneralResponse:
+        """DeleteUser (DELETE /users)"""
+        return self._request("DELETE", "/users", params={'id': id}, model=GeneralResponse)
+
+    def get_users_by_email(self, email: str) -> GeneralResponse:
+        """GetUsersByEmail (GET /users/email/{email})"""
+        return self._request("GET", f"/users/email/{_quote(str(email), safe='')}", model=GeneralResponse)
+
+    def get_all_users(self, *, page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetAllUsers (GET /users/all)"""
+        return self._request("GET", "/users/all", params={'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    def create_user_internal(self, body: Union[CreateUserDTO, Dict[str, Any]], *, role_name: List[RoleName]) -> GeneralResponse:
+        """CreateUserInternal (POST /users/signUpInternal)"""
+        return self._request("POST", "/users/signUpInternal", params={'roleName': role_name}, json=body, model=GeneralResponse)
+
+    def create_user(self, body: Union[CreateUserDTO, Dict[str, Any]]) -> GeneralResponse:
+        """CreateUser (POST /users/signUp)"""
+        return self._request("POST", "/users/signUp", json=body, model=GeneralResponse)
+
+    def update_current_user(self, body: Union[UpdateUserDTO, Dict[str, Any]]) -> GeneralResponse:
+        """UpdateCurrentUser (PUT /users/me)"""
+        return self._request("PUT", "/users/me", json=body, model=GeneralResponse)
+
+    def save_palm_analysis(self, body: Union[PalmAnalysisDto, Dict[str, Any]]) -> Any:
+        """SavePalmAnalysis (POST /palm-analysis)"""
+        return self._request("POST", "/palm-analysis", json=body, model=None)
+
+    def get_palm_analysis_by_user(self, user_id: float) -> Any:
+        """GetPalmAnalysisByUser (GET /palm-analysis/user/{userId})"""
+        return self._request("GET", f"/palm-analysis/user/{_quote(str(user_id), safe='')}", model=None)
+
+    def get_all_palm_analyses(self) -> Any:
+        """GetAllPalmAnalyses (GET /palm-analysis/all)"""
+        return self._request("GET", "/palm-analysis/all", model=None)
+
+    def update_palm_analysis(self, id: float, body: Union[PalmAnalysisDto, Dict[str, Any]]) -> Any:
+        """UpdatePalmAnalysis (PUT /palm-analysis/{id})"""
+        return self._request("PUT", f"/palm-analysis/{_quote(str(id), safe='')}", json=body, model=None)
+
+    def delete_palm_analysis(self, id: float) -> Any:
+        """DeletePalmAnalysis (DELETE /palm-analysis/{id})"""
+        return self._request("DELETE", f"/palm-analysis/{_quote(str(id), safe='')}", model=None)
+
+    def save_facial_analysis(self, body: Union[FacialAnalysisDto, Dict[str, Any]]) -> GeneralResponse:
+        """SaveFacialAnalysis (POST /facial-analysis)"""
+        return self._request("POST", "/facial-analysis", json=body, model=GeneralResponse)
+
+    def get_facial_analyses_by_user(self, user_id: float) -> GeneralResponse:
+        """GetFacialAnalysesByUser (GET /facial-analysis/user/{userId})"""
+        return self._request("GET", f"/facial-analysis/user/{_quote(str(user_id), safe='')}", model=GeneralResponse)
+
+    def get_all_facial_analyses(self) -> GeneralResponse:
+        """GetAllFacialAnalyses (GET /facial-analysis/all)"""
+        return self._request("GET", "/facial-analysis/all", model=GeneralResponse)
+
+    def update_facial_analysis(self, id: float, body: Union[FacialAnalysisDto, Dict[str, Any]]) -> GeneralResponse:
+        """UpdateFacialAnalysis (PUT /facial-analysis/{id})"""
+        return self._request("PUT", f"/facial-analysis/{_quote(str(id), safe='')}", json=body, model=GeneralResponse)
+
+    def delete_facial_analysis(self, id: float) -> GeneralResponse:
+        """DeleteFacialAnalysis (DELETE /facial-analysis/{id})"""
+        return self._request("DELETE", f"/facial-analysis/{_quote(str(id), safe='')}", model=GeneralResponse)
+
+    def login(self, body: Union[AuthRequest, Dict[str, Any]]) -> GeneralResponse:
+        """Login (POST /auth/user)"""
+        return self._request("POST", "/auth/user", json=body, model=GeneralResponse)
+
+    def get_current_login(self) -> GeneralResponse:
+        """GetCurrentLogin (GET /auth/me)"""
+        return self._request("GET", "/auth/me", model=GeneralResponse)
+
+    def change_password(self, body: Union[ChangePasswordDTO, Dict[str, Any]]) -> GeneralResponse:
+        """ChangePassword (POST /auth/me/change-password)"""
+        return self._request("POST", "/auth/me/change-password", json=body, model=GeneralResponse)
+
+    def request_forgot_password(self, body: Union[RequestResetPassword, Dict[str, Any]]) -> GeneralResponse:
+        """RequestForgotPassword (POST /auth/request-forgot-pass)"""
+        return self._request("POST", "/auth/request-forgot-pass", json=body, model=GeneralResponse)
+
+    def reset_password(self, body: Union[ResetPassword, Dict[str, Any]], *, token: str) -> GeneralResponse:
+        """ResetPassword (POST /auth/reset-pass)"""
+        return self._request("POST", "/auth/reset-pass", params={'token': token}, json=body, model=GeneralResponse)
+
+    def refresh_token(self, body: Union[RefreshTokenRequest, Dict[str, Any]]) -> GeneralResponse:
+        """RefreshToken (POST /auth/refresh-token)"""
+        return self._request("POST", "/auth/refresh-token", json=body, model=GeneralResponse)
+
+    def login_with_google_mobile(self, body: Dict[str, Any]) -> GeneralResponse:
+        """LoginWithGoogleMobile (POST /auth/google/mobile)"""
+        return self._request("POST", "/auth/google/mobile", json=body, model=GeneralResponse)
+
+    def login_with_google_web(self, body: Dict[str, Any]) -> GeneralResponse:
+        """LoginWithGoogleWeb (POST /auth/google/web)"""
+        return self._request("POST", "/auth/google/web", json=body, model=GeneralResponse)
+
+
+class AsyncGlowlabClient(AsyncBaseClient):
+    """ai-phil (async; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    async def get_user_by_role(self, *, role_name: List[RoleName], page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetUserByRole (GET /user-role/users)"""
+        return await self._request("GET", "/user-role/users", params={'roleName': role_name, 'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    async def get_role_by_user(self, *, user_id: float, page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetRoleByUser (GET /user-role/roles)"""
+        return await self._request("GET", "/user-role/roles", params={'userId': user_id, 'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    async def update_user_role(self, body: List[RoleName], *, user_id: float) -> GeneralResponse:
+        """UpdateUserRole (PUT /user-role)"""
+        return await self._request("PUT", "/user-role", params={'userId': user_id}, json=body, model=GeneralResponse)
+
+    async def get_users(self, *, id: float) -> GeneralResponse:
+        """GetUsers (GET /users)"""
+        return await self._request("GET", "/users", params={'id': id}, model=GeneralResponse)
+
+    async def update_user(self, body: Union[UpdateUserDTO, Dict[str, Any]], *, id: float) -> GeneralResponse:
+        """UpdateUser (PUT /users)"""
+        return await self._request("PUT", "/users", params={'id': id}, json=body, model=GeneralResponse)
+
+    async def delete_user(self, *, id: float) -> GeneralResponse:
+        """DeleteUser (DELETE /users)"""
+        return await self._request("DELETE", "/users", params={'id': id}, model=GeneralResponse)
+
+    async def get_users_by_email(self, email: str) -> GeneralResponse:
+        """GetUsersByEmail (GET /users/email/{email})"""
+        return await self._request("GET", f"/users/email/{_quote(str(email), safe='')}", model=GeneralResponse)
+
+    async def get_all_users(self, *, page_index: Optional[float] = None, page_size: Optional[float] = None) -> GeneralResponse:
+        """GetAllUsers (GET /users/all)"""
+        return await self._request("GET", "/users/all", params={'pageIndex': page_index, 'pageSize': page_size}, model=GeneralResponse)
+
+    async def create_user_internal(self, body: Union[CreateUserDTO, Dict[str, Any]], *, role_name: List[RoleName]) -> GeneralResponse:
+        """CreateUserInternal (POST /users/signUpInternal)"""
+        return await self._request("POST", "/users/signUpInternal", params={'roleName': role_name}, json=body, model=GeneralResponse)
+
+    async def create_user(self, body: Union[CreateUserDTO, Dict[str, Any]]) -> GeneralResponse:
+        """CreateUser (POST /users/signUp)"""
+        return await self._request("POST", "/users/signUp", json=body, model=GeneralResponse)
+
+    async def update_current_user(self, body: Union[UpdateUserDTO, Dict[str, Any]]) -> GeneralResponse:
+        """UpdateCurrentUser (PUT /users/me)"""
+        return await self._request("PUT", "/users/me", json=body, model=GeneralResponse)
+
+    async def save_palm_analysis(self, body: Union[PalmAnalysisDto, Dict[str, Any]]) -> Any:
+        """SavePalmAnalysis (POST /palm-analysis)"""
+        return await self._request("POST", "/palm-analysis", json=body, model=None)
+
+    async def get_palm_analysis_by_user(self, user_id: float) -> Any:
+        """GetPalmAnalysisByUser (GET /palm-analysis/user/{userId})"""
+        return await self._request("GET", f"/palm-analysis/user/{_quote(str(user_id), safe='')}", model=None)
+
+    async def get_all_palm_analyses(self) -> Any:
+        """GetAllPalmAnalyses (GET /palm-analysis/all)"""
+        return await self._request("GET", "/palm-analysis/all", model=None)
+
+    async def update_palm_analysis(self, id: float, body: Union[PalmAnalysisDto, Dict[str, Any]]) -> Any:
+        """UpdatePalmAnalysis (PUT /palm-analysis/{id})"""
+        return await self._request("PUT", f"/palm-analysis/{_quote(str(id), safe='')}", json=body, model=None)
+
+    async def delete_palm_analysis(self, id: float) -> Any:
+        """DeletePalmAnalysis (DELETE /palm-analysis/{id})"""
+        return await self._request("DELETE", f"/palm-analysis/{_quote(str(id), safe='')}", model=None)
+
+    async def save_facial_analysis(self, body: Union[FacialAnalysisDto, Dict[str, Any]]) -> GeneralResponse:
+        """SaveFacialAnalysis (POST /facial-analysis)"""
+        return await self._request("POST", "/facial-analysis", json=body, model=GeneralResponse)
+
+    async def get_facial_analyses_by_user(self, user_id: float) -> GeneralResponse:
+        """GetFacialAnalysesByUser (GET /facial-analysis/user/{userId})"""
+        return await self._request("GET", f"/facial-analysis/user/{_quote(str(user_id), safe='')}", model=GeneralResponse)
+
+    async def get_all_facial_analyses(self) -> GeneralResponse:
+        """GetAllFacialAnalyses (GET /facial-analysis/all)"""
+        return await self._request("GET", "/facial-analysis/all", model=GeneralResponse)
+
+    async def update_facial_analysis(self, id: float, body: Union[FacialAnalysisDto, Dict[str, Any]]) -> GeneralResponse:
+        """UpdateFacialAnalysis (PUT /facial-analysis/{id})"""
+        return await self._request("PUT", f"/facial-analysis/{_quote(str(id), safe='')}", json=body, model=GeneralResponse)
+
+    async def delete_facial_analysis(self, id: float) -> GeneralResponse:
+        """DeleteFacialAnalysis (DELETE /facial-analysis/{id})"""
+        return await self._request("DELETE", f"/facial-analysis/{_quote(str(id), safe='')}", model=GeneralResponse)
+
+    async def login(self, body: Union[AuthRequest, Dict[str, Any]]) -> GeneralResponse:
+        """Login (POST /auth/user)"""
+        return await self._request("POST", "/auth/user", json=body, model=GeneralResponse)
+
+    async def get_current_login(self) -> GeneralResponse:
+        """GetCurrentLogin (GET /auth/me)"""
+        return await self._request("GET", "/auth/me", model=GeneralResponse)
+
+    async def change_password(self, body: Union[ChangePasswordDTO, Dict[str, Any]]) -> GeneralResponse:
+        """ChangePassword (POST /auth/me/change-password)"""
+        return await self._request("POST", "/auth/me/change-password", json=body, model=GeneralResponse)
+
+    async def request_forgot_password(self, body: Union[RequestResetPassword, Dict[str, Any]]) -> GeneralResponse:
+        """RequestForgotPassword (POST /auth/request-forgot-pass)"""
+        return await self._request("POST", "/auth/request-forgot-pass", json=body, model=GeneralResponse)
+
+    async def reset_password(self, body: Union[ResetPassword, Dict[str, Any]], *, token: str) -> GeneralResponse:
+        """ResetPassword (POST /auth/reset-pass)"""
+        return await self._request("POST", "/auth/reset-pass", params={'token': token}, json=body, model=GeneralResponse)
+
+    async def refresh_token(self, body: Union[RefreshTokenRequest, Dict[str, Any]]) -> GeneralResponse:
+        """RefreshToken (POST /auth/refresh-token)"""
+        return await self._request("POST", "/auth/refresh-token", json=body, model=GeneralResponse)
+
+    async def login_with_google_mobile(self, body: Dict[str, Any]) -> GeneralResponse:
+        """LoginWithGoogleMobile (POST /auth/google/mobile)"""
+        return await self._request("POST", "/auth/google/mobile", json=body, model=GeneralResponse)
+
+    async def login_with_google_web(self, body: Dict[str, Any]) -> GeneralResponse:
+        """LoginWithGoogleWeb (POST /auth/google/web)"""
+        return await self._request("POST", "/auth/google/web", json=body, model=GeneralResponse)
@@ -0,0 +1,128 @@
+"""Generated by swagger_client_gen.py from aianalyzepalmandface.swagger. Do not edit by hand."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote as _quote
+
+try:
+    from typing import Literal
+except ImportError:  # Python < 3.8
+    from typing_extensions import Literal
+
+from ._base import ApiError, AsyncBaseClient, BaseClient, FileInput, Model
+
+DEFAULT_BASE_URL = os.getenv("PHYSIOGNOMY_BASE_URL", "http://localhost:8001")
+
+
+@dataclass
+class BodyAnalyzeFaceAnalyzeFacePost(Model):
+    """Body_analyze_face_analyze_face__post"""
+
+    file: bytes  # Image file (jpg, png, webp, heic) to analyze.
+
+
+@dataclass
+class BodyAnalyzePalmAnalyzePalmPost(Model):
+    """Body_analyze_palm_analyze_palm__post"""
+
+    file: bytes  # Image file (jpg, png, webp, heic) containing hands to analyze.
+
+
+@dataclass
+class CloudinaryAnalysisRequest(Model):
+    """CloudinaryAnalysisRequest"""
+
+    signed_url: str
+    user_id: str
+    timestamp: str
+    original_folder_path: str
+
+
+@dataclass
+class HTTPValidationError(Model):
+    """HTTPValidationError"""
+    _nested: ClassVar[Dict[str, Tuple[str, str]]] = {'detail': ('list', 'ValidationError')}
+
+    detail: Optional[List[ValidationError]] = None
+
+
+@dataclass
+class ValidationError(Model):
+    """ValidationError"""
+
+    loc: List[Any]
+    msg: str
+    type: str
+
+
+class PhysiognomyClient(BaseClient):
+    """Physiognomy Face Analysis API (sync; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    def health_check(self) -> Any:
+        """Health Check (GET /health)"""
+        return self._request("GET", "/health", model=None)
+
+    def read_root(self) -> Any:
+        """Health Check (GET /)"""
+        return self._request("GET", "/", model=None)
+
+    def analyze_face(self, file: FileInput) -> Any:
+        """Analyze a single face image (POST /analyze-face/)"""
+        return self._request("POST", "/analyze-face/", files={'file': file}, model=None)
+
+    def analyze_face_from_cloudinary(self, body: Union[CloudinaryAnalysisRequest, Dict[str, Any]]) -> Any:
+        """Analyze face from Cloudinary signed URL (POST /analyze-face-from-cloudinary/)"""
+        return self._request("POST", "/analyze-face-from-cloudinary/", json=body, model=None)
+
+    def analyze_palm(self, file: FileInput, *, gender: str = 'male') -> Any:
+        """Analyze palm/hand image (POST /analyze-palm/)"""
+        return self._request("POST", "/analyze-palm/", params={'gender': gender}, files={'file': file}, model=None)
+
+    def analyze_palm_cloudinary(self, body: Union[CloudinaryAnalysisRequest, Dict[str, Any]]) -> Any:
+        """Analyze palm image from Cloudinary (POST /analyze-palm-cloudinary/)"""
+        return self._request("POST", "/analyze-palm-cloudinary/", json=body, model=None)
+
+    def get_palm_analysis_info(self) -> Any:
+        """Get palm analysis capabilities (GET /palm-analysis-info/)"""
+        return self._request("GET", "/palm-analysis-info/", model=None)
+
+
+class AsyncPhysiognomyClient(AsyncBaseClient):
+    """Physiognomy Face Analysis API (async; shared keep-alive pool)"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):
+        super().__init__(base_url, token, **kwargs)
+
+    async def health_check(self) -> Any:
+        """Health Check (GET /health)"""
+        return await self._request("GET", "/health", model=None)
+
+    async def read_root(self) -> Any:
+        """Health Check (GET /)"""
+        return await self._request("GET", "/", model=None)
+
+    async def analyze_face(self, file: FileInput) -> Any:
+        """Analyze a single face image (POST /analyze-face/)"""
+        return await self._request("POST", "/analyze-face/", files={'file': file}, model=None)
+
+    async def analyze_face_from_cloudinary(self, body: Union[CloudinaryAnalysisRequest, Dict[str, Any]]) -> Any:
+        """Analyze face from Cloudinary signed URL (POST /analyze-face-from-cloudinary/)"""
+        return await self._request("POST", "/analyze-face-from-cloudinary/", json=body, model=None)
+
+    async def analyze_palm(self, file: FileInput, *, gender: str = 'male') -> Any:
+        """Analyze palm/hand image (POST /analyze-palm/)"""
+        return await self._request("POST", "/analyze-palm/", params={'gender': gender}, files={'file': file}, model=None)
+
+    async def analyze_palm_cloudinary(self, body: Union[CloudinaryAnalysisRequest, Dict[str, Any]]) -> Any:
+        """Analyze palm image from Cloudinary (POST /analyze-palm-cloudinary/)"""
+        return await self._request("POST", "/analyze-palm-cloudinary/", json=body, model=None)
+
+    async def get_palm_analysis_info(self) -> Any:
+        """Get palm analysis capabilities (GET /palm-analysis-info/)"""
+        return await self._request("GET", "/palm-analysis-info/", model=None)
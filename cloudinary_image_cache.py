@@ -0,0 +1,395 @@
+"""Local disk cache for images fetched from Cloudinary.
+
+``/analyze-face-from-cloudinary/`` and ``/analyze-palm-cloudinary/`` receive
+a ``signed_url`` (CloudinaryAnalysisRequest). Until now every call downloaded
+the image again, including re-analyses of the same upload. In the physiognomy
+service::
+
+    from cloudinary_image_cache import image_cache
+
+    image_bytes = image_cache.fetch(request.signed_url)               # sync endpoints
+    image_bytes = await image_cache.afetch(request.signed_url)        # async endpoints
+
+Cache key: the full delivery URL. Cloudinary's ``s--XXXX--`` signatures are
+deterministic, so the signature stays in the key and a forged URL never
+matches a cached entry. The only query parameters dropped are auth tokens
+on public ``upload`` URLs, where they grant nothing. A version segment
+(``/v1712345678/``) right after the delivery type or the signature is
+immutable in Cloudinary (a re-upload gets a new version), so those URLs are
+served from disk without any request. Unversioned URLs are revalidated with
+If-None-Match / If-Modified-Since once their Cache-Control max-age (or
+IMAGE_CACHE_TTL) runs out, which costs a 304 instead of the whole image.
+
+Entries live under IMAGE_CACHE_DIR, one file per image, with a SQLite index
+(WAL, shared by all uvicorn workers) tracking size and last use. The least
+recently used entries are evicted when the total exceeds IMAGE_CACHE_MAX_MB.
+All downloads share one pooled keep-alive httpx client, and concurrent
+misses for the same image in a process wait for a single download.
+
+Benchmark against a local stand-in for res.cloudinary.com::
+
+    python cloudinary_image_cache.py bench --fetches 400 --images 40 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cloudinary_images"))
+MAX_BYTES = int(float(os.getenv("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+# Freshness for unversioned URLs without Cache-Control max-age (seconds)
+DEFAULT_TTL = float(os.getenv("IMAGE_CACHE_TTL", "0"))
+
+# /<cloud>/<resource_type>/<delivery type>/[s--SIGNATURE--/]v<version>/...
+_DELIVERY_TYPE = re.compile(r"^/[^/]+/[^/]+/([^/]+)/")
+_VERSIONED = re.compile(r"^/[^/]+/[^/]+/[^/]+/(?:s--[A-Za-z0-9_-]+--/)?v\d+/")
+_AUTH_PARAMS = frozenset({"__cld_token__"})
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+# Only refresh last_used on hits when it is older than this, to keep hits read-only
+_TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    immutable INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+"""
+
+
+def cache_key(url: str) -> Tuple[str, bool]:
+    """
+    Normalize a Cloudinary delivery URL.
+
+    Returns:
+        (key, immutable): key keeps the signature and all query parameters except auth tokens on
+        public URLs; immutable when the version follows the delivery type or signature
+    """
+    parts = urlsplit(url)
+    delivery = _DELIVERY_TYPE.match(parts.path)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if delivery is not None and delivery.group(1) == "upload":
+        query = [(name, value) for name, value in query if name not in _AUTH_PARAMS]
+    key = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+    return key, _VERSIONED.match(parts.path) is not None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    revalidated: int = 0  # 304 Not Modified
+    misses: int = 0
+    bytes_downloaded: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class ImageCache:
+    """Size-bounded LRU of downloaded images on disk; thread-safe."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES, default_ttl: float = DEFAULT_TTL,
+                 client: Optional[httpx.Client] = None, timeout: float = 30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.stats = CacheStats()
+        self._client = client
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # key -> [lock, waiters]: concurrent misses for one image wait for a single download
+        self._inflight: Dict[str, list] = {}
+
+    # --------------------------------------------
+    # Storage
+    # --------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        """Per-thread connection; the directory and index are created on first use."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._local.db = db
+        return db
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.stats.evictions += 1
+            logger.debug("Evicted %s (%d bytes)", key, size)
+
+    # --------------------------------------------
+    # Fetching
+    # --------------------------------------------
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        timeout=httpx.Timeout(self.timeout, connect=5.0),
+                        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0),
+                        follow_redirects=True,
+                    )
+        return self._client
+
+    def _expires_at(self, response: httpx.Response, now: float) -> float:
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        return now + (float(match.group(1)) if match else self.default_ttl)
+
+    def fetch(self, url: str) -> bytes:
+        """Image bytes for ``url``, from disk when possible; raises httpx.HTTPStatusError on 4xx/5xx."""
+        key, immutable = cache_key(url)
+        with self._lock:
+            entry = self._inflight.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                return self._fetch(url, key, immutable)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._inflight[key]
+
+    def _fetch(self, url: str, key: str, immutable: bool) -> bytes:
+        db = self._db()
+        now = time.time()
+        row = db.execute("SELECT etag, last_modified, immutable, expires_at, last_used FROM entries WHERE key = ?",
+                         (key,)).fetchone()
+        data = self._read(key) if row else None
+
+        headers = {}
+        if data is not None:
+            etag, last_modified, entry_immutable, expires_at, last_used = row
+            if entry_immutable or expires_at > now:
+                self.stats.hits += 1
+                if now - last_used > _TOUCH_INTERVAL:
+                    db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+                return data
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = self.client.get(url, headers=headers)
+        if response.status_code == 304 and data is not None:
+            self.stats.revalidated += 1
+            db.execute("UPDATE entries SET expires_at = ?, last_used = ? WHERE key = ?",
+                       (self._expires_at(response, now), now, key))
+            return data
+        response.raise_for_status()
+
+        data = response.content
+        self.stats.misses += 1
+        self.stats.bytes_downloaded += len(data)
+        self._write(key, data)
+        db.execute(
+            "INSERT OR REPLACE INTO entries (key, etag, last_modified, size, immutable, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, response.headers.get("etag"), response.headers.get("last-modified"), len(data), int(immutable),
+             self._expires_at(response, now), now),
+        )
+        self._evict()
+        return data
+
+    async def afetch(self, url: str) -> bytes:
+        """``fetch`` on the default executor, for async endpoints."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.fetch, url)
+
+    def clear(self) -> None:
+        db = self._db()
+        for (key,) in db.execute("SELECT key FROM entries").fetchall():
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        db.execute("DELETE FROM entries")
+
+    def size(self) -> Tuple[int, int]:
+        """(entries, bytes) currently cached."""
+        return self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+
+image_cache = ImageCache()
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def bench(fetches: int, images: int, image_kb: int, latency_ms: float, threads: int) -> None:
+    """Repeated analyses (Zipf-like reuse of uploads) against a local Cloudinary stand-in."""
+    import random
+    import shutil
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    blobs = {i: os.urandom(image_kb * 1024) for i in range(images)}
+    served = {"requests": 0, "bytes": 0, "not_modified": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)  # CDN round trip / origin fetch
+            i = int(re.search(r"img(\d+)\.jpg", self.path).group(1))
+            etag = f'"{hashlib.md5(blobs[i]).hexdigest()}"'
+            served["requests"] += 1
+            if self.headers.get("If-None-Match") == etag:
+                served["not_modified"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            served["bytes"] += len(blobs[i])
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(blobs[i])))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(blobs[i])
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/demo/image/upload"
+
+    rng = random.Random(3)
+    weights = [1 / (rank + 1) for rank in range(images)]
+    workload = rng.choices(range(images), weights, k=fetches)
+
+    def signed(i: int, versioned: bool) -> str:
+        # Signed like Cloudinary: the signature is a deterministic hash of the rest of the path
+        version = f"/v17000000{i:02d}" if versioned else ""
+        signature = hashlib.sha1(f"{version}/users/42/img{i}.jpg".encode()).hexdigest()[:8]
+        return f"{base}/s--{signature}--{version}/users/42/img{i}.jpg"
+
+    def run(label: str, fetch) -> None:
+        before = dict(served)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            for data in pool.map(fetch, workload):
+                assert len(data) == image_kb * 1024
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<38} {elapsed / fetches * 1000 * threads:>8.1f} ms/fetch  {fetches / elapsed:>7.0f} fetch/s  "
+              f"{served['requests'] - before['requests']:>5} requests  "
+              f"{(served['bytes'] - before['bytes']) / 1024 / 1024:>7.1f} MiB")
+
+    print("=" * 100)
+    print(f"CLOUDINARY IMAGE CACHE ({fetches} fetches of {images} images, {image_kb} KiB, "
+          f"{latency_ms:g} ms origin latency, {threads} threads)")
+    print("=" * 100)
+
+    def per_call(i: int) -> bytes:
+        response = httpx.get(signed(i, True))
+        response.raise_for_status()
+        return response.content
+
+    run("httpx.get per call (before)", per_call)
+    pooled = httpx.Client(limits=httpx.Limits(max_connections=threads))
+    run("pooled client, no cache", lambda i: pooled.get(signed(i, True)).content)
+
+    directory = tempfile.mkdtemp(prefix="image_cache_bench_")
+    try:
+        cache = ImageCache(directory, max_bytes=images * image_kb * 1024 * 2)
+        run("cache, versioned URLs (immutable)", lambda i: cache.fetch(signed(i, True)))
+        cache = ImageCache(directory, max_bytes=images * image_kb * 1024 * 2, default_ttl=0)
+        run("cache, unversioned URLs (revalidate)", lambda i: cache.fetch(signed(i, False)))
+        small = ImageCache(os.path.join(directory, "small"), max_bytes=images * image_kb * 1024 // 4)
+        run("cache limited to 25% of the images", lambda i: small.fetch(signed(i, True)))
+        print(f"unversioned: {cache.stats.as_dict()}")
+        print(f"25% cache:   {small.stats.as_dict()}, on disk {small.size()[1] / 1024 / 1024:.1f} MiB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cloudinary image cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--fetches", type=int, default=400)
+    b.add_argument("--images", type=int, default=40)
+    b.add_argument("--image-kb", type=int, default=300)
+    b.add_argument("--latency-ms", type=float, default=80)
+    b.add_argument("--threads", type=int, default=4)
+    sub.add_parser("stats", help="Entries and bytes in IMAGE_CACHE_DIR")
+    sub.add_parser("clear", help="Empty IMAGE_CACHE_DIR")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.fetches, args.images, args.image_kb, args.latency_ms, args.threads)
+    elif args.command == "stats":
+        entries, size = image_cache.size()
+        print(f"{CACHE_DIR}: {entries} images, {size / 1024 / 1024:.1f} MiB of {MAX_BYTES / 1024 / 1024:.0f} MiB")
+    else:
+        image_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
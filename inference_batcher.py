@@ -0,0 +1,340 @@
+"""Dynamic micro-batching for the face/palm model inference.
+
+Each multipart upload used to run the model on its own. With concurrent
+uploads a single batched call is far cheaper: a GEMM reads the weights once
+for the whole batch, and ONNX Runtime / BLAS vectorize across it.
+``MicroBatcher`` collects requests until it has ``max_batch`` items or the
+oldest one has waited ``max_wait_ms``. It then runs one batched inference
+in an executor thread, so the event loop keeps accepting uploads, and
+resolves each caller's future with its own row.
+
+The batch is only held open while requests are arriving faster than
+``max_wait_ms`` apart (EWMA of the inter-arrival gap). A lone client is
+dispatched at once instead of paying the wait for nothing; under load the
+wait fills batches.
+
+Latency bound: ``max_wait_ms`` only limits how long a batch is held open.
+With a backlog larger than ``max_batch`` an item also waits for every batch
+ahead of it. The guarantee is ``max_queue_wait_ms``: an item that has not
+started inference by then is dropped and ``submit`` raises ``QueueTimeout``,
+so a call takes at most that plus one batch inference. Past ``max_queue``
+waiting items ``submit`` raises ``QueueFull`` at once. Both let the caller
+shed load (QueueTimeout is a QueueFull).
+
+In the physiognomy service::
+
+    face_batcher = MicroBatcher(OnnxBatchModel("models/face_landmarks.onnx"), max_batch=16, max_wait_ms=4)
+
+    @app.post("/analyze-face/")
+    async def analyze_face(file: UploadFile):
+        tensor = preprocess(await file.read())          # (3, H, W) float32
+        landmarks = await face_batcher.submit(tensor)
+        ...
+
+    face_batcher.metrics()   # queue depth, batch sizes, queue wait / inference percentiles
+
+Throughput and latency at 1, 8 and 32 closed-loop clients, unbatched vs
+batched, with a NumPy landmark-regressor stand-in::
+
+    python inference_batcher.py bench --seconds 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "4"))
+DEFAULT_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "256"))
+DEFAULT_MAX_QUEUE_WAIT_MS = float(os.getenv("INFERENCE_MAX_QUEUE_WAIT_MS", "1000"))
+
+
+class QueueFull(Exception):
+    """The batcher already holds ``max_queue`` waiting items."""
+
+
+class QueueTimeout(QueueFull):
+    """An item waited ``max_queue_wait_ms`` without being dispatched."""
+
+
+class OnnxBatchModel:
+    """Batched ONNX Runtime session: stacks inputs along axis 0, returns one output row per input."""
+
+    def __init__(self, path: str, threads: Optional[int] = None):
+        import numpy as np
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._np = np
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, inputs: Sequence[Any]) -> List[Any]:
+        batch = self._np.stack(inputs).astype(self._np.float32, copy=False)
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return list(output)
+
+
+class MicroBatcher:
+    """
+    Async front end that batches ``submit`` calls for a batch inference function.
+
+    Args:
+        infer: Called with a list of inputs (in submit order), returns a list of
+            outputs of the same length; runs in ``executor``
+        max_batch: Dispatch as soon as this many items are waiting
+        max_wait_ms: ...or when the oldest waiting item is this old
+        max_queue: Waiting items beyond this make ``submit`` raise QueueFull
+        max_queue_wait_ms: Items not dispatched within this make ``submit`` raise QueueTimeout
+        workers: Batches allowed to run concurrently (1 lets BLAS use every core)
+    """
+
+    def __init__(
+        self,
+        infer: Callable[[List[Any]], Sequence[Any]],
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_queue_wait_ms: float = DEFAULT_MAX_QUEUE_WAIT_MS,
+        workers: int = 1,
+        executor: Optional[Executor] = None,
+        name: str = "",
+    ):
+        self.infer = infer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait_ms / 1000
+        self.workers = workers
+        self.name = name or getattr(infer, "__name__", type(infer).__name__)
+        self._executor = executor or ThreadPoolExecutor(workers, thread_name_prefix=f"batch-{self.name}")
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._last_arrival = 0.0
+        self._arrival_gap = float("inf")  # EWMA of seconds between submits
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reset_metrics()
+
+    def reset_metrics(self) -> None:
+        self.submitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.queue_wait = LatencySketch()
+        self.inference = LatencySketch()
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (tests, uvicorn reload): old tasks died with the old loop
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._pending = []
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its output; raises QueueFull, QueueTimeout or the inference exception."""
+        self._start()
+        if len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{self.name}: {len(self._pending)} items waiting")
+        future = self._loop.create_future()
+        now = time.perf_counter()
+        gap = now - self._last_arrival
+        self._arrival_gap = gap if self._arrival_gap == float("inf") else 0.8 * self._arrival_gap + 0.2 * gap
+        self._last_arrival = now
+        self._pending.append((item, future, now))
+        self.submitted += 1
+        self._wakeup.set()
+        try:
+            await asyncio.wait({future}, timeout=self.max_queue_wait)
+        except asyncio.CancelledError:
+            future.cancel()  # the worker skips it
+            raise
+        if not future.done() and any(entry[1] is future for entry in self._pending):
+            # Still queued: give up; once dispatched, the running batch is awaited instead
+            self._pending = [entry for entry in self._pending if entry[1] is not future]
+            future.cancel()
+            self.expired += 1
+            raise QueueTimeout(f"{self.name}: not dispatched within {self.max_queue_wait * 1000:g} ms")
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        # Hold the batch open until it is full or its oldest item hits max_wait,
+        # unless arrivals are too sparse for waiting to add anything
+        deadline = self._pending[0][2] + self.max_wait
+        while len(self._pending) < self.max_batch and self._arrival_gap < self.max_wait:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        if self._pending:
+            self._wakeup.set()  # leftovers: let the next worker (or next round) pick them up at once
+        return batch
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            # Callers that gave up (client disconnected, timeout) are not worth computing
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait.add((started - enqueued) * 1000)
+            try:
+                outputs = await loop.run_in_executor(self._executor, self.infer, [item for item, _, _ in batch])
+                if len(outputs) != len(batch):
+                    raise ValueError(f"{self.name}: {len(outputs)} outputs for a batch of {len(batch)}")
+            except Exception as e:
+                self.failed_batches += 1
+                logger.exception("Batch of %d failed in %s", len(batch), self.name)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.inference.add((time.perf_counter() - started) * 1000)
+            self.batches += 1
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for (_, future, _), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def metrics(self) -> Dict[str, Any]:
+        items = sum(size * n for size, n in self.batch_sizes.items())
+        return {
+            "name": self.name,
+            "queue_depth": len(self._pending),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": round(items / self.batches, 2) if self.batches else None,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_ms": self.queue_wait.summary((0.5, 0.99)),
+            "inference_ms": self.inference.summary((0.5, 0.99)),
+        }
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _landmark_model(size: int, hidden: int, seed: int = 0):
+    """NumPy stand-in for the landmark regressor: 2-layer MLP over a downscaled crop -> 68 (x, y)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    w1 = rng.standard_normal((3 * size * size, hidden), dtype=np.float32) * 0.01
+    w2 = rng.standard_normal((hidden, 136), dtype=np.float32) * 0.01
+
+    def infer(inputs: List[Any]) -> List[Any]:
+        batch = np.stack(inputs).reshape(len(inputs), -1)
+        return list(np.maximum(batch @ w1, 0) @ w2)
+
+    return infer
+
+
+def bench(seconds: float, clients: Sequence[int], size: int, hidden: int, max_batch: int, max_wait_ms: float) -> None:
+    import numpy as np
+
+    infer = _landmark_model(size, hidden)
+    image = np.random.default_rng(1).random((3, size, size), dtype=np.float32)
+    one_ms = min(_time(lambda: infer([image])) for _ in range(20)) * 1000
+    batch_ms = min(_time(lambda: infer([image] * max_batch)) for _ in range(5)) * 1000
+
+    async def closed_loop(n: int, call) -> Tuple[float, LatencySketch]:
+        sketch = LatencySketch()
+        stop = time.perf_counter() + seconds
+        done = 0
+
+        async def client():
+            nonlocal done
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                await call(image)
+                sketch.add((time.perf_counter() - t0) * 1000)
+                done += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(n)))
+        return done / (time.perf_counter() - t0), sketch
+
+    async def run(n: int):
+        pool = ThreadPoolExecutor(min(n, os.cpu_count() or 1))
+        loop = asyncio.get_running_loop()
+        unbatched = await closed_loop(n, lambda x: loop.run_in_executor(pool, infer, [x]))
+        batcher = MicroBatcher(infer, max_batch=max_batch, max_wait_ms=max_wait_ms, name="landmarks")
+        batched = await closed_loop(n, batcher.submit)
+        metrics = batcher.metrics()
+        await batcher.close()
+        pool.shutdown()
+        return unbatched, batched, metrics
+
+    print("=" * 96)
+    print(f"MICRO-BATCHING ({os.cpu_count()} CPU, {3 * size * size}x{hidden} MLP: {one_ms:.2f} ms for 1 image, "
+          f"{batch_ms:.2f} ms for {max_batch}; max_batch {max_batch}, max_wait {max_wait_ms:g} ms)")
+    print("=" * 96)
+    print(f"{'clients':>7}  {'unbatched req/s':>15} {'p50':>7} {'p99':>7}   {'batched req/s':>13} {'p50':>7} {'p99':>7}"
+          f"  {'mean batch':>10} {'queue p99':>9}")
+    for n in clients:
+        (u_rps, u), (b_rps, b), metrics = asyncio.run(run(n))
+        print(f"{n:>7}  {u_rps:>15.0f} {u.quantile(0.5):>7.2f} {u.quantile(0.99):>7.2f}   {b_rps:>13.0f} "
+              f"{b.quantile(0.5):>7.2f} {b.quantile(0.99):>7.2f}  {metrics['mean_batch_size']:>10} "
+              f"{metrics['queue_wait_ms']['p99']:>9.2f}")
+
+
+def _time(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-batching inference queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench")
+    b.add_argument("--seconds", type=float, default=5, help="Per client count and mode")
+    b.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    b.add_argument("--size", type=int, default=96, help="Input crop size (3 x size x size)")
+    b.add_argument("--hidden", type=int, default=512)
+    b.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    b.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    bench(args.seconds, args.clients, args.size, args.hidden, args.max_batch, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
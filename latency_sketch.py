@@ -0,0 +1,235 @@
+"""Mergeable latency sketch with relative-error quantiles (DDSketch-style).
+
+Values fall into logarithmic bins ``ceil(log(v) / log(gamma))`` with
+``gamma = (1 + a) / (1 - a)``, so every quantile is within relative error
+``a`` (1% by default) of the exact answer, independent of the distribution.
+Two sketches with the same accuracy merge by adding bin counts, which makes
+them suitable for hourly rollups (tuvi_latency_rollup.py) and per-worker
+histograms in load tests (swagger_loadgen.py).
+
+    sketch = LatencySketch()
+    for ms in samples:
+        sketch.add(ms)
+    sketch.quantile(0.99)
+    blob = sketch.to_bytes()            # a few hundred bytes
+    LatencySketch.from_bytes(blob).merge(other)
+
+Accuracy/size self-check::
+
+    python latency_sketch.py --samples 1000000
+"""
+
+import argparse
+import math
+import random
+import struct
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values at or below this count as zero (processingTime of cache hits, clock noise)
+MIN_VALUE = 1e-6
+
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<Bd")
+_STATS = struct.Struct("<ddd")
+
+
+def _write_varint(out: bytearray, n: int) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+class LatencySketch:
+    """Log-binned quantile sketch; not thread-safe (use one per worker and merge)."""
+
+    __slots__ = ("relative_accuracy", "gamma", "_ln_gamma", "bins", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._ln_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def ln_gamma(self) -> float:
+        """``ln(gamma)``; bin index of v is ``ceil(ln(v) / ln_gamma)`` (also usable in SQL)."""
+        return self._ln_gamma
+
+    def key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._ln_gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= MIN_VALUE:
+            self.zero_count += count
+        else:
+            k = math.ceil(math.log(value) / self._ln_gamma)
+            self.bins[k] = self.bins.get(k, 0) + count
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def add_bins(
+        self,
+        bins: Iterable[Tuple[Optional[int], int]],
+        total: float,
+        minimum: float,
+        maximum: float,
+    ) -> None:
+        """
+        Add pre-binned counts (e.g. aggregated by ``ceil(ln(v) / ln_gamma)`` in SQL).
+
+        Args:
+            bins: (index, count) pairs; index None counts as zero
+            total: Sum of the binned values
+            minimum: Smallest binned value
+            maximum: Largest binned value
+        """
+        for k, n in bins:
+            if k is None:
+                self.zero_count += n
+            else:
+                self.bins[k] = self.bins.get(k, 0) + n
+            self.count += n
+        self.sum += total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for k, n in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0..1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen > rank:
+                # Midpoint of (gamma^(k-1), gamma^k] in the relative sense; clamp to the observed range
+                value = 2 * self.gamma ** k / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Sequence[float]) -> Dict[str, Optional[float]]:
+        return {f"p{q * 100:g}": self.quantile(q) for q in qs}
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def summary(self, qs: Sequence[float] = (0.5, 0.9, 0.99)) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {"count": self.count, "mean": self.mean,
+                                           "min": self.min if self.count else None,
+                                           "max": self.max if self.count else None}
+        out.update(self.quantiles(qs))
+        return out
+
+    def to_bytes(self) -> bytes:
+        """Compact encoding: header, stats, then zigzag-delta varint bin indexes with varint counts."""
+        out = bytearray(_HEADER.pack(_FORMAT_VERSION, self.relative_accuracy))
+        out += _STATS.pack(self.sum, self.min, self.max)
+        _write_varint(out, self.zero_count)
+        _write_varint(out, len(self.bins))
+        previous = 0
+        for k in sorted(self.bins):
+            delta = k - previous
+            _write_varint(out, (delta << 1) ^ (delta >> 63))
+            _write_varint(out, self.bins[k])
+            previous = k
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LatencySketch":
+        version, accuracy = _HEADER.unpack_from(data, 0)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format version {version}")
+        sketch = cls(accuracy)
+        sketch.sum, sketch.min, sketch.max = _STATS.unpack_from(data, _HEADER.size)
+        pos = _HEADER.size + _STATS.size
+        sketch.zero_count, pos = _read_varint(data, pos)
+        n_bins, pos = _read_varint(data, pos)
+        k = 0
+        for _ in range(n_bins):
+            zigzag, pos = _read_varint(data, pos)
+            k += (zigzag >> 1) ^ -(zigzag & 1)
+            n, pos = _read_varint(data, pos)
+            sketch.bins[k] = n
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LatencySketch accuracy and size check")
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    # Answer latencies: lognormal body (~1.5 s) plus a slow tail of tool-heavy turns
+    samples = [rng.lognormvariate(7.3, 0.5) if rng.random() < 0.97 else rng.lognormvariate(9.2, 0.6)
+               for _ in range(args.samples)]
+
+    t0 = time.perf_counter()
+    parts = [LatencySketch(args.accuracy) for _ in range(24)]
+    for i, v in enumerate(samples):
+        parts[i % 24].add(v)
+    add_ns = (time.perf_counter() - t0) / len(samples) * 1e9
+
+    t0 = time.perf_counter()
+    blobs = [p.to_bytes() for p in parts]
+    merged = LatencySketch(args.accuracy)
+    for blob in blobs:
+        merged.merge(LatencySketch.from_bytes(blob))
+    merge_ms = (time.perf_counter() - t0) * 1000
+
+    exact = sorted(samples)
+    print("=" * 70)
+    print(f"LATENCY SKETCH ({args.samples:,} samples, a={args.accuracy})")
+    print("=" * 70)
+    print(f"add: {add_ns:.0f} ns/value, 24 hourly parts encoded+decoded+merged in {merge_ms:.1f} ms")
+    print(f"encoded size per part: {sum(map(len, blobs)) / len(blobs):.0f} B, merged: {len(merged.to_bytes())} B")
+    for q in (0.5, 0.9, 0.99, 0.999):
+        true = exact[int(q * (len(exact) - 1))]
+        est = merged.quantile(q)
+        print(f"p{q * 100:<5g} exact {true:>10.1f}  sketch {est:>10.1f}  error {abs(est - true) / true:.3%}")
+
+
+if __name__ == "__main__":
+    main()
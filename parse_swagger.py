@@ -1,44 +1,47 @@
-import json
-
-with open('aichatbot.swagger', 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-print("=" * 80)
-print("CHATBOT AI API ENDPOINTS")
-print("=" * 80)
-print(f"Base Path: {data.get('basePath', '/')}")
-print()
-
-for path, methods in data['paths'].items():
-    print(f"\n{'='*80}")
-    print(f"Path: {path}")
-    print(f"{'='*80}")
-    
-    for method, details in methods.items():
-        if method == 'parameters':
-            continue
-            
-        print(f"\n{method.upper()}")
-        print(f"Summary: {details.get('summary', 'N/A')}")
-        print(f"Description: {details.get('description', 'N/A')[:200]}...")
-        
-        if 'parameters' in details:
-            print(f"Parameters:")
-            for param in details['parameters']:
-                required = "REQUIRED" if param.get('required') else "optional"
-                print(f"  - {param['name']} ({param['in']}) [{required}]: {param.get('description', '')}")
-        
-        if 'responses' in details:
-            print(f"Responses: {', '.join(details['responses'].keys())}")
-
-print("\n" + "=" * 80)
-print("DEFINITIONS")
-print("=" * 80)
-if 'definitions' in data:
-    for name, schema in data['definitions'].items():
+import sys
+
+from swagger_spec import load_spec, type_label
+
+# Any spec dialect; several files can be listed (default: the chatbot spec)
+files = sys.argv[1:] or ['aichatbot.swagger']
+
+for file in files:
+    spec = load_spec(file)
+
+    print("=" * 80)
+    print(f"{spec.title.upper()} ENDPOINTS ({file})")
+    print("=" * 80)
+    print(f"Base Path: {spec.base_path or '/'}")
+    print()
+
+    for path, methods in spec.by_path.items():
+        print(f"\n{'='*80}")
+        print(f"Path: {path}")
+        print(f"{'='*80}")
+
+        for method, op in methods.items():
+            print(f"\n{method}")
+            print(f"Summary: {op.summary or 'N/A'}")
+            print(f"Description: {(op.description or 'N/A')[:200]}...")
+
+            if op.parameters or op.body:
+                print(f"Parameters:")
+                for param in op.parameters:
+                    required = "REQUIRED" if param.required else "optional"
+                    print(f"  - {param.name} ({param.location}) [{required}]: {param.description}")
+                if op.body:
+                    required = "REQUIRED" if op.body.required else "optional"
+                    print(f"  - body ({op.body.content_type}) [{required}]: {type_label(op.body.schema)}")
+
+            if op.responses:
+                print(f"Responses: {', '.join(op.responses.keys())}")
+
+    print("\n" + "=" * 80)
+    print("DEFINITIONS")
+    print("=" * 80)
+    for name, schema in spec.schemas.items():
         print(f"\n{name}:")
-        if 'properties' in schema:
-            for prop, details in schema['properties'].items():
-                required = "REQUIRED" if prop in schema.get('required', []) else "optional"
-                prop_type = details.get('type', 'unknown')
-                print(f"  - {prop} ({prop_type}) [{required}]")
+        for prop, details in schema.get('properties', {}).items():
+            required = "REQUIRED" if prop in schema.get('required', []) else "optional"
+            print(f"  - {prop} ({type_label(details)}) [{required}]")
+    print()
@@ -0,0 +1,6 @@
+#!/bin/bash
+# Replication role and pg_hba entry for the pg-replica service
+set -e
+psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" \
+    -c "CREATE ROLE repl WITH REPLICATION LOGIN PASSWORD '$REPLICATION_PASSWORD'"
+echo "host replication repl all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,201 @@
+"""Post-deploy smoke test over every idempotent GET in the specs.
+
+Each GET operation of the glowlab, chatbot and physiognomy specs is called
+a few times, concurrently across endpoints with bounded parallelism. The
+runner checks the status code and validates the body against the documented
+2xx schema (swagger_spec.validate). It then compares the median latency with
+a stored baseline.
+
+Operations whose path parameters are not given with ``--param`` are
+skipped, and so are secured operations when there is no token::
+
+    python smoke_test.py                                   # localhost / *_BASE_URL
+    python smoke_test.py --host 203.0.113.10 --param conversation_id=42 --param userId=1
+    python smoke_test.py --token "$GLOWLAB_TOKEN" --update-baseline
+
+Exit status is 1 when any endpoint fails, returns an invalid body, or has a
+median latency above ``baseline * (1 + threshold)`` (and above it by at least
+``--min-delta-ms``, so fast endpoints do not trip on noise).
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, urlunparse
+
+import httpx
+
+from swagger_spec import HERE, Operation, Spec, load_service, sample_value, validate
+
+SMOKE_SERVICES = ("glowlab", "chatbot", "physiognomy")
+BASELINE_FILE = os.path.join(HERE, "smoke_baseline.json")
+
+
+@dataclass
+class Check:
+    service: str
+    op: Operation
+    url: str
+    headers: Dict[str, str]
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    skipped: str = ""
+
+    @property
+    def name(self) -> str:
+        return f"{self.service} {self.op.key}"
+
+    @property
+    def p50(self) -> Optional[float]:
+        return statistics.median(self.latencies_ms) if self.latencies_ms else None
+
+
+def _with_host(base_url: str, host: Optional[str]) -> str:
+    if not host:
+        return base_url
+    parts = urlparse(base_url)
+    netloc = f"{host}:{parts.port}" if parts.port else host
+    return urlunparse(parts._replace(netloc=netloc))
+
+
+def plan(spec: Spec, params: Dict[str, str], token: Optional[str], host: Optional[str],
+         include: List[str], exclude: List[str]) -> List[Check]:
+    """One Check per GET operation, with path parameters filled in (or a skip reason)."""
+    base_url = _with_host(spec.base_url, host)
+    checks = []
+    for op in spec.operations:
+        if op.method != "GET":
+            continue
+        name = f"{spec.name} {op.key}"
+        if include and not any(fnmatch.fnmatch(name, pattern) for pattern in include):
+            continue
+        if any(fnmatch.fnmatch(name, pattern) for pattern in exclude):
+            continue
+        path, missing = op.path, []
+        for p in op.parameters:
+            if p.location == "path":
+                if p.name in params:
+                    path = path.replace("{" + p.name + "}", params[p.name])
+                else:
+                    missing.append(p.name)
+        headers = {"Authorization": f"Bearer {token}"} if op.auth and token else {}
+        check = Check(spec.name, op, base_url + path, headers)
+        if missing:
+            check.skipped = f"needs --param {', '.join(missing)}"
+        elif op.auth and not token:
+            check.skipped = "needs --token"
+        checks.append(check)
+    return checks
+
+
+async def _probe(client: httpx.AsyncClient, spec: Spec, check: Check, samples: int, semaphore: asyncio.Semaphore) -> None:
+    query = {p.name: sample_value(spec, p.schema, p.name) for p in check.op.parameters
+             if p.location == "query" and p.required}
+    for i in range(samples):
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                response = await client.get(check.url, headers=check.headers, params=query)
+            except httpx.HTTPError as e:
+                check.statuses.append(type(e).__name__)
+                check.errors.append(f"{type(e).__name__}: {e}")
+                return
+            elapsed = (time.perf_counter() - t0) * 1000
+        check.statuses.append(str(response.status_code))
+        if not response.is_success:
+            check.errors.append(f"HTTP {response.status_code}: {response.text[:120]}")
+            return
+        check.latencies_ms.append(elapsed)
+        if i == 0:
+            schema = check.op.success_schema()
+            if schema:
+                try:
+                    body = response.json()
+                except ValueError:
+                    check.errors.append("response is not JSON")
+                    return
+                check.errors.extend(validate(spec, schema, body)[:5])
+
+
+async def run(checks: List[Check], specs: Dict[str, Spec], samples: int, concurrency: int, timeout: float) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(timeout, connect=5.0)) as client:
+        await asyncio.gather(*(_probe(client, specs[c.service], c, samples, semaphore)
+                               for c in checks if not c.skipped))
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Post-deploy smoke test over the spec GET endpoints")
+    parser.add_argument("--service", action="append", choices=SMOKE_SERVICES, help="Repeatable (default: all)")
+    parser.add_argument("--host", help="Replace the host of every base URL (ports/paths kept)")
+    parser.add_argument("--param", action="append", default=[], help="Path parameter name=value, repeatable")
+    parser.add_argument("--token", default=os.getenv("GLOWLAB_TOKEN"), help="Bearer token for secured operations")
+    parser.add_argument("--include", action="append", default=[], help='Glob on "service METHOD /path"')
+    parser.add_argument("--exclude", action="append", default=[], help='Glob on "service METHOD /path"')
+    parser.add_argument("--samples", type=int, default=5, help="Requests per endpoint (median is compared)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.5, help="Allowed relative median increase")
+    parser.add_argument("--min-delta-ms", type=float, default=50, help="Ignore increases smaller than this")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run's medians as the baseline")
+    args = parser.parse_args()
+
+    params = dict(p.split("=", 1) for p in args.param)
+    specs = {name: load_service(name) for name in (args.service or SMOKE_SERVICES)}
+    checks = [c for spec in specs.values()
+              for c in plan(spec, params, args.token, args.host, args.include, args.exclude)]
+    t0 = time.perf_counter()
+    asyncio.run(run(checks, specs, args.samples, args.concurrency, args.timeout))
+    wall = time.perf_counter() - t0
+
+    baseline = load_baseline(args.baseline)
+    failed = regressed = 0
+    print("=" * 100)
+    print(f"SMOKE TEST ({sum(not c.skipped for c in checks)} endpoints, {wall:.1f}s)")
+    print("=" * 100)
+    for c in checks:
+        if c.skipped:
+            print(f"SKIP  {c.name:<58} {c.skipped}")
+            continue
+        base = baseline.get(c.name, {}).get("p50_ms")
+        verdict, note = "OK", ""
+        if c.errors:
+            verdict, note = "FAIL", "; ".join(c.errors)
+            failed += 1
+        elif base is not None and c.p50 is not None:
+            note = f"baseline {base:.0f} ms ({(c.p50 - base) / base:+.0%})"
+            if c.p50 > base * (1 + args.threshold) and c.p50 - base >= args.min_delta_ms:
+                verdict = "SLOW"
+                regressed += 1
+        latency = f"{c.p50:7.1f} ms" if c.p50 is not None else " " * 10
+        print(f"{verdict:<5} {c.name:<58} {latency}  {note}")
+
+    if args.update_baseline:
+        updated = dict(baseline)
+        updated.update({c.name: {"p50_ms": round(c.p50, 1)} for c in checks if c.p50 is not None and not c.errors})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(updated.items())), f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    print(f"{failed} failed, {regressed} slower than baseline")
+    sys.exit(1 if failed or (regressed and not args.update_baseline) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+"""Generate typed Python clients for the service specs.
+
+Reads the specs listed in swagger_spec.SERVICES and writes an ``api_clients``
+package next to this file:
+
+    api_clients/_base.py         shared runtime: one keep-alive httpx pool per
+                                 process (sync) / per event loop (async)
+    api_clients/<service>.py     dataclass models from definitions / schemas,
+                                 ``<Service>Client`` and ``Async<Service>Client``
+
+Usage::
+
+    python swagger_client_gen.py generate            # all services
+    python swagger_client_gen.py generate --service chatbot
+
+    from api_clients.chatbot import ChatbotClient, ChatStart
+    chat = ChatbotClient()                            # CHATBOT_BASE_URL or localhost:8000/api/v1
+    chat.post_chat_start(ChatStart(user_id=1))
+
+Throughput of the generated (pooled) client vs a new connection per call,
+against a local stdlib HTTP server::
+
+    python swagger_client_gen.py bench --requests 5000 --threads 8 --connect-ms 30
+"""
+
+import argparse
+import keyword
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from swagger_spec import HERE, SERVICES, Operation, Spec, load_service, ref_name
+
+OUTPUT_DIR = os.path.join(HERE, "api_clients")
+
+HEADER = '"""Generated by swagger_client_gen.py from {source}. Do not edit by hand."""\n'
+
+RUNTIME = '''"""Shared runtime for the generated clients. Generated by swagger_client_gen.py."""
+
+import asyncio
+import dataclasses
+import json as _json
+import os
+import sys
+import threading
+import weakref
+from typing import Any, ClassVar, Dict, Optional, Tuple, Union
+
+import httpx
+
+# One pool for every generated client in the process: connections to the same
+# host are reused across services and threads
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("API_CLIENT_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("API_CLIENT_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+DEFAULT_TIMEOUT = httpx.Timeout(float(os.getenv("API_CLIENT_TIMEOUT", "120")), connect=5.0)
+
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+# File upload: raw bytes, or (filename, bytes[, content type])
+FileInput = Union[bytes, Tuple[str, bytes], Tuple[str, bytes, str]]
+
+
+def shared_client() -> httpx.Client:
+    """Process-wide keep-alive client."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+    return _sync_client
+
+
+def shared_async_client() -> httpx.AsyncClient:
+    """Keep-alive client for the running event loop (connections cannot cross loops)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+    return client
+
+
+class ApiError(Exception):
+    """Non-2xx response."""
+
+    def __init__(self, status_code: int, body: Any, method: str, url: str):
+        super().__init__(f"{method} {url} -> {status_code}: {str(body)[:300]}")
+        self.status_code = status_code
+        self.body = body
+
+
+class Model:
+    """Base for generated dataclasses: JSON names and nested model types per field."""
+
+    _json_names: ClassVar[Dict[str, str]] = {}
+    _nested: ClassVar[Dict[str, Tuple[str, str]]] = {}  # field -> ("one" | "list", model class name)
+
+    @classmethod
+    def _model(cls, name: str) -> type:
+        return getattr(sys.modules[cls.__module__], name)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Build from a decoded JSON object; unknown keys are ignored, missing ones are None."""
+        kwargs = {}
+        for f in dataclasses.fields(cls):
+            value = data.get(cls._json_names.get(f.name, f.name))
+            nested = cls._nested.get(f.name)
+            if nested and value is not None:
+                model = cls._model(nested[1])
+                value = [model.from_dict(v) for v in value] if nested[0] == "list" else model.from_dict(value)
+            kwargs[f.name] = value
+        return cls(**kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON object with None fields omitted."""
+        out = {}
+        for f in dataclasses.fields(self):
+            value = getattr(self, f.name)
+            if value is None:
+                continue
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [v.to_dict() if isinstance(v, Model) else v for v in value]
+            out[self._json_names.get(f.name, f.name)] = value
+        return out
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(response: httpx.Response, model: Any) -> Any:
+    if not response.content:
+        return None
+    if "json" not in response.headers.get("content-type", "json"):
+        return response.text
+    data = response.json()
+    if model is None or data is None:
+        return data
+    if isinstance(model, list):
+        return [model[0].from_dict(v) for v in data]
+    return model.from_dict(data)
+
+
+def _files(files: Dict[str, FileInput]) -> Dict[str, Any]:
+    return {name: (name, value) if isinstance(value, bytes) else value for name, value in files.items()}
+
+
+def _form(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Plain form fields (FastAPI Form()): objects go as JSON text
+    return {name: _json.dumps(_encode(value)) if isinstance(value, (dict, Model)) else value
+            for name, value in data.items() if value is not None}
+
+
+class _ClientBase:
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = dict(headers or {})
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def _prepare(self, params, json, data, files, headers) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"headers": {**self.headers, **{k: v for k, v in (headers or {}).items() if v is not None}}}
+        if params:
+            kwargs["params"] = {k: v for k, v in params.items() if v is not None}
+        if json is not None:
+            kwargs["json"] = _encode(json)
+        if data:
+            kwargs["data"] = _form(data)
+        if files:
+            # Non-empty files makes httpx send multipart/form-data, otherwise data is urlencoded
+            kwargs["files"] = _files({k: v for k, v in files.items() if v is not None})
+        return kwargs
+
+
+class BaseClient(_ClientBase):
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.Client] = None):
+        super().__init__(base_url, token, headers)
+        self._client = client
+
+    def _request(self, method: str, path: str, params=None, json=None, data=None, files=None, headers=None,
+                 model=None) -> Any:
+        client = self._client or shared_client()
+        url = self.base_url + path
+        response = client.request(method, url, **self._prepare(params, json, data, files, headers))
+        if response.status_code >= 400:
+            raise ApiError(response.status_code, response.text, method, url)
+        return _decode(response, model)
+
+
+class AsyncBaseClient(_ClientBase):
+    def __init__(self, base_url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                 client: Optional[httpx.AsyncClient] = None):
+        super().__init__(base_url, token, headers)
+        self._client = client
+
+    async def _request(self, method: str, path: str, params=None, json=None, data=None, files=None, headers=None,
+                       model=None) -> Any:
+        client = self._client or shared_async_client()
+        url = self.base_url + path
+        response = await client.request(method, url, **self._prepare(params, json, data, files, headers))
+        if response.status_code >= 400:
+            raise ApiError(response.status_code, response.text, method, url)
+        return _decode(response, model)
+'''
+
+
+# ============================================
+# Naming
+# ============================================
+
+def class_name(schema_name: str) -> str:
+    """``_36_Enums.Gender`` -> ``Enums_Gender``; ``Record_string.number_`` -> ``RecordStringNumber``."""
+    name = re.sub(r"^_\d+_", "", schema_name)
+    parts = [p for p in re.split(r"[^0-9A-Za-z]+", name) if p]
+    return "".join(p[0].upper() + p[1:] for p in parts) or "Model"
+
+
+def snake(name: str) -> str:
+    name = re.sub(r"[^0-9A-Za-z]+", "_", name)
+    name = re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower().strip("_")
+    name = re.sub(r"_+", "_", name)
+    if not name or name[0].isdigit():
+        name = "p_" + name
+    return name + "_" if keyword.iskeyword(name) else name
+
+
+def method_name(op: Operation) -> str:
+    """Operation ids as methods; FastAPI's ``<name>_<path slug>_<method>`` ids are trimmed to ``<name>``."""
+    slug = re.sub(r"\W", "_", op.path) + "_" + op.method.lower()
+    op_id = op.operation_id
+    if op_id.endswith(slug) and len(op_id) > len(slug):
+        op_id = op_id[: -len(slug)]
+    return snake(op_id)
+
+
+# ============================================
+# Code generation
+# ============================================
+
+class _ModuleWriter:
+    def __init__(self, spec: Spec):
+        self.spec = spec
+        self.names = {name: class_name(name) for name in spec.schemas}
+        self.aliases: List[str] = []
+        self.models: List[str] = []
+
+    def annotation(self, schema: Optional[Dict[str, Any]]) -> str:
+        """Python type for a schema (refs become model / alias names)."""
+        if not schema:
+            return "Any"
+        if "$ref" in schema:
+            return self.names.get(ref_name(schema["$ref"]), "Any")
+        kind = schema.get("type")
+        if "enum" in schema and kind in ("string", None):
+            return "Literal[" + ", ".join(repr(v) for v in schema["enum"]) + "]"
+        if kind == "string":
+            return "bytes" if schema.get("format") == "binary" else "str"
+        if kind == "integer":
+            return "int"
+        if kind == "number":
+            return "float"
+        if kind == "boolean":
+            return "bool"
+        if kind == "array":
+            return f"List[{self.annotation(schema.get('items'))}]"
+        if kind == "object" or "properties" in schema:
+            extra = schema.get("additionalProperties")
+            if isinstance(extra, dict) and not schema.get("properties"):
+                return f"Dict[str, {self.annotation(extra)}]"
+            return "Dict[str, Any]"
+        return "Any"
+
+    def is_model(self, schema_name: str) -> bool:
+        schema = self.spec.schemas.get(schema_name, {})
+        return bool(schema.get("properties"))
+
+    def nested(self, schema: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if "$ref" in schema and self.is_model(ref_name(schema["$ref"])):
+            return "one", self.names[ref_name(schema["$ref"])]
+        items = schema.get("items") or {}
+        if schema.get("type") == "array" and "$ref" in items and self.is_model(ref_name(items["$ref"])):
+            return "list", self.names[ref_name(items["$ref"])]
+        return None
+
+    def write_schemas(self) -> None:
+        for name, schema in self.spec.schemas.items():
+            cls = self.names[name]
+            if not self.is_model(name):
+                self.aliases.append(f"{cls} = {self.annotation(schema)}")
+                continue
+            required = set(schema.get("required", []))
+            fields, json_names, nested = [], {}, {}
+            for prop, prop_schema in schema["properties"].items():
+                attr = snake(prop) if not prop.isidentifier() or keyword.iskeyword(prop) else prop
+                if attr != prop:
+                    json_names[attr] = prop
+                link = self.nested(prop_schema)
+                if link:
+                    nested[attr] = link
+                ann = self.annotation(prop_schema)
+                comment = f"  # {prop_schema['description']}" if prop_schema.get("description") else ""
+                fields.append((prop in required, attr, ann, comment.replace("\n", " ")))
+            # Dataclass order: required fields first
+            lines = ["@dataclass", f"class {cls}(Model):"]
+            doc = schema.get("description") or schema.get("title") or name
+            lines.append(f'    """{doc}"""')
+            if json_names:
+                lines.append(f"    _json_names: ClassVar[Dict[str, str]] = {json_names!r}")
+            if nested:
+                lines.append(f"    _nested: ClassVar[Dict[str, Tuple[str, str]]] = {nested!r}")
+            lines.append("")
+            for is_required, attr, ann, comment in sorted(fields, key=lambda f: not f[0]):
+                default = "" if is_required else " = None"
+                ann = ann if is_required else f"Optional[{ann}]"
+                lines.append(f"    {attr}: {ann}{default}{comment}")
+            self.models.append("\n".join(lines))
+
+    def response_model(self, op: Operation) -> str:
+        schema = op.success_schema() or {}
+        link = self.nested(schema)
+        if not link:
+            return "None"
+        return f"[{link[1]}]" if link[0] == "list" else link[1]
+
+    def return_annotation(self, op: Operation) -> str:
+        schema = op.success_schema() or {}
+        link = self.nested(schema)
+        if not link:
+            return "Any"
+        return f"List[{link[1]}]" if link[0] == "list" else link[1]
+
+    def method(self, op: Operation, is_async: bool) -> str:
+        args, params, headers, data, files = ["self"], [], [], [], []
+        path_expr = op.path
+        for p in op.parameters:
+            if p.location == "path":
+                arg = snake(p.name)
+                args.append(f"{arg}: {self.annotation(p.schema)}")
+                path_expr = path_expr.replace("{" + p.name + "}", "{_quote(str(" + arg + "), safe='')}")
+        body_arg = None
+        if op.body and op.body.content_type == "application/json":
+            body_arg = f"body: Union[{self.annotation(op.body.schema)}, Dict[str, Any]]" \
+                if "$ref" in op.body.schema else f"body: {self.annotation(op.body.schema)}"
+            args.append(body_arg if op.body.required else body_arg + " = None")
+        keyword_args = []
+        if op.body and op.body.content_type != "application/json":
+            form = self.spec.deref(op.body.schema)
+            for prop, prop_schema in form.get("properties", {}).items():
+                arg = snake(prop)
+                is_file = prop_schema.get("format") == "binary"
+                ann = "FileInput" if is_file else self.annotation(prop_schema)
+                if prop in form.get("required", []):
+                    args.append(f"{arg}: {ann}")
+                else:
+                    keyword_args.append(f"{arg}: Optional[{ann}] = None")
+                # Only binary properties are file parts; Form() fields reject parts with a filename
+                (files if is_file else data).append(f"{prop!r}: {arg}")
+        for p in op.parameters:
+            if p.location in ("query", "header"):
+                arg = snake(p.name)
+                default = p.schema.get("default")
+                ann = self.annotation(p.schema)
+                if default is not None:
+                    keyword_args.append(f"{arg}: {ann} = {default!r}")
+                elif p.required:
+                    keyword_args.insert(0, f"{arg}: {ann}")
+                else:
+                    keyword_args.append(f"{arg}: Optional[{ann}] = None")
+                (params if p.location == "query" else headers).append(f"{p.name!r}: {arg}")
+        if keyword_args:
+            args.append("*")
+            args.extend(keyword_args)
+
+        call = [f'"{op.method}"', f'f"{path_expr}"' if "{" in path_expr else f'"{path_expr}"']
+        if params:
+            call.append("params={" + ", ".join(params) + "}")
+        if body_arg:
+            call.append("json=body")
+        if data:
+            call.append("data={" + ", ".join(data) + "}")
+        if files:
+            call.append("files={" + ", ".join(files) + "}")
+        if headers:
+            call.append("headers={" + ", ".join(headers) + "}")
+        call.append(f"model={self.response_model(op)}")
+
+        summary = (op.summary or op.operation_id).replace('"""', "'''").replace("\\", "\\\\").splitlines()[0]
+        prefix = "async def" if is_async else "def"
+        await_ = "await " if is_async else ""
+        signature = f"    {prefix} {method_name(op)}({', '.join(args)}) -> {self.return_annotation(op)}:"
+        return "\n".join([
+            signature,
+            f'        """{summary} ({op.method} {op.path})"""',
+            f"        return {await_}self._request({', '.join(call)})",
+        ])
+
+    def render(self) -> str:
+        service = SERVICES[self.spec.name]
+        self.write_schemas()
+        base = class_name(self.spec.name)
+        out = [
+            HEADER.format(source=service["file"]),
+            "from __future__ import annotations",
+            "",
+            "import os",
+            "from dataclasses import dataclass",
+            "from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union",
+            "from urllib.parse import quote as _quote",
+            "",
+            "try:",
+            "    from typing import Literal",
+            "except ImportError:  # Python < 3.8",
+            "    from typing_extensions import Literal",
+            "",
+            "from ._base import ApiError, AsyncBaseClient, BaseClient, FileInput, Model",
+            "",
+            f'DEFAULT_BASE_URL = os.getenv("{service["env"]}", "{service["base_url"]}")',
+            "",
+        ]
+        if self.aliases:
+            out += [""] + self.aliases + [""]
+        for model in self.models:
+            out += ["", model, ""]
+        for is_async in (False, True):
+            cls = f"Async{base}Client" if is_async else f"{base}Client"
+            parent = "AsyncBaseClient" if is_async else "BaseClient"
+            out += [
+                "",
+                f"class {cls}({parent}):",
+                f'    """{self.spec.title} ({"async" if is_async else "sync"}; shared keep-alive pool)"""',
+                "",
+                "    def __init__(self, base_url: str = DEFAULT_BASE_URL, token: Optional[str] = None, **kwargs: Any):",
+                "        super().__init__(base_url, token, **kwargs)",
+            ]
+            for op in self.spec.operations:
+                out += ["", self.method(op, is_async)]
+            out.append("")
+        return "\n".join(out)
+
+
+def generate(services: Optional[List[str]] = None, output_dir: str = OUTPUT_DIR) -> List[str]:
+    """
+    Write the api_clients package.
+
+    Args:
+        services: Service names from swagger_spec.SERVICES (default: all)
+        output_dir: Package directory
+
+    Returns:
+        Paths written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    names = services or list(SERVICES)
+    for name in names:
+        path = os.path.join(output_dir, f"{name}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_ModuleWriter(load_service(name)).render())
+        written.append(path)
+
+    runtime_path = os.path.join(output_dir, "_base.py")
+    with open(runtime_path, "w", encoding="utf-8") as f:
+        f.write(RUNTIME)
+    init_path = os.path.join(output_dir, "__init__.py")
+    present = sorted(m[:-3] for m in os.listdir(output_dir) if m.endswith(".py") and not m.startswith("_"))
+    with open(init_path, "w", encoding="utf-8") as f:
+        f.write('"""Clients generated by swagger_client_gen.py: ' + ", ".join(present) + '."""\n\n')
+        f.write("from ._base import ApiError, shared_async_client, shared_client\n")
+    return written + [runtime_path, init_path]
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+class _BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    body = b'{"success": true, "conversation_id": 42, "messages": []}'
+    connect_delay = 0.0
+
+    def setup(self):
+        # Stand-in for TCP + TLS handshake round trips to the VPS (paid once per connection)
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench(requests: int, threads: int, connect_ms: float) -> None:
+    import asyncio
+    import json
+    import urllib.request
+
+    import httpx
+
+    from api_clients.chatbot import AsyncChatbotClient, ChatbotClient
+
+    _BenchHandler.connect_delay = connect_ms / 1000
+    ThreadingHTTPServer.request_queue_size = 128  # default backlog of 5 drops bursts of new connections
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BenchHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/api/v1"
+    per_thread = requests // threads
+
+    def run_threads(call) -> float:
+        def worker():
+            for i in range(per_thread):
+                call(i)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return per_thread * threads / (time.perf_counter() - t0)
+
+    pooled = ChatbotClient(base_url)
+
+    def naive_httpx(i: int) -> Any:
+        # httpx.get()/requests.get() style: a fresh client (TLS context, TCP connection) per call
+        with httpx.Client() as client:
+            return client.get(f"{base_url}/chat/history/{i}").json()
+
+    def naive_urllib(i: int) -> Any:
+        # Cheapest per-call baseline: new TCP connection, no client setup
+        with urllib.request.urlopen(f"{base_url}/chat/history/{i}") as response:
+            return json.loads(response.read())
+
+    async def run_async() -> float:
+        client = AsyncChatbotClient(base_url)
+
+        async def worker():
+            for i in range(per_thread):
+                await client.get_chat_history(i)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(threads)))
+        return per_thread * threads / (time.perf_counter() - t0)
+
+    print("=" * 70)
+    print(f"GENERATED CLIENT THROUGHPUT ({per_thread * threads} GETs, {threads} workers, connect {connect_ms:g} ms)")
+    print("=" * 70)
+    print(f"{'httpx client per call':<28} {run_threads(naive_httpx):>8.0f} req/s")
+    print(f"{'urllib connection per call':<28} {run_threads(naive_urllib):>8.0f} req/s")
+    print(f"{'generated sync (pooled)':<28} {run_threads(lambda i: pooled.get_chat_history(i)):>8.0f} req/s")
+    print(f"{'generated async (pooled)':<28} {asyncio.run(run_async()):>8.0f} req/s")
+    server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate Python clients from the swagger specs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    g = sub.add_parser("generate")
+    g.add_argument("--service", action="append", choices=list(SERVICES), help="Repeatable (default: all)")
+    g.add_argument("--out", default=OUTPUT_DIR)
+    b = sub.add_parser("bench")
+    b.add_argument("--requests", type=int, default=5000)
+    b.add_argument("--threads", type=int, default=8)
+    b.add_argument("--connect-ms", type=float, default=0, help="Simulated handshake cost per new connection")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        for path in generate(args.service, args.out):
+            print(f"wrote {os.path.relpath(path, HERE)}")
+    else:
+        bench(args.requests, args.threads, args.connect_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""Open-model load generator driven by the swagger specs.
+
+Request templates come from the specs (swagger_spec.sample_value fills
+bodies, path and query parameters from ``example`` / ``default`` / type);
+a scenario only lists endpoints, arrival rates and whatever values must be
+real (ids, tokens, image files)::
+
+    {
+      "name": "chatbot-baseline",
+      "duration": 60,
+      "targets": [
+        {"service": "chatbot", "endpoint": "POST /chat/message", "rate": 5,
+         "body": {"conversation_id": 42, "message": "Năm nay sự nghiệp thế nào?"}},
+        {"service": "chatbot", "endpoint": "POST /tuvi/analyze-json", "rate": 1},
+        {"service": "glowlab", "endpoint": "POST /auth/refresh-token", "rate": 10,
+         "body": {"refreshToken": "$GLOWLAB_REFRESH_TOKEN"}},
+        {"service": "physiognomy", "endpoint": "POST /analyze-palm/", "rate": 2,
+         "query": {"gender": "female"}, "files": {"file": "vantay.jpg"}}
+      ]
+    }
+
+Arrivals are scheduled at a constant rate (or Poisson with ``--poisson``)
+independently of completions, so a slow server does not slow the offered
+load down. Latency is measured from the *scheduled* send time (no
+coordinated omission); ``service`` latency from the actual send is reported
+next to it. Arrivals beyond ``--max-inflight`` are counted as dropped.
+
+Latencies are recorded in ``LatencySketch`` (latency_sketch.py, DDSketch-style
+log bins) rather than an HDR histogram. Both are mergeable, but the sketch's
+guarantee is different: every reported quantile is within 1% *relative*
+error of the exact value at any magnitude, and there is no fixed
+lowest/highest trackable value. Reports embed the sketch so runs can be
+merged and compared later.
+
+    python swagger_loadgen.py run --scenario chatbot.json --out reports/before.json
+    python swagger_loadgen.py run --service chatbot --endpoint "GET /chat/history/{conversation_id}" \\
+        --path conversation_id=42 --rate 50 --duration 30 --out reports/after.json
+    python swagger_loadgen.py compare reports/before.json reports/after.json --threshold 0.1
+
+String values starting with ``$`` are read from the environment. ``--token``
+(or GLOWLAB_TOKEN) is sent as a bearer token to endpoints that require auth.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from latency_sketch import LatencySketch
+from swagger_spec import HERE, Operation, load_service, sample_value
+
+REPORT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+DEFAULT_UPLOAD = os.path.join(HERE, "small.jpg")
+
+
+def _env(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith("$"):
+        return os.getenv(value[1:], "")
+    if isinstance(value, dict):
+        return {k: _env(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_env(v) for v in value]
+    return value
+
+
+@dataclass
+class Target:
+    """One endpoint at a fixed arrival rate, with its prepared request."""
+
+    service: str
+    endpoint: str  # "METHOD /path" as in the spec
+    rate: float
+    method: str = ""
+    url: str = ""
+    request: Dict[str, Any] = field(default_factory=dict)
+    latency: LatencySketch = field(default_factory=LatencySketch)
+    service_time: LatencySketch = field(default_factory=LatencySketch)
+    ok_latency: LatencySketch = field(default_factory=LatencySketch)  # 2xx only: rejections are fast and skew p99 down
+    statuses: Dict[str, int] = field(default_factory=dict)
+    sent: int = 0
+    dropped: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.service} {self.endpoint}"
+
+
+def build_target(config: Dict[str, Any], token: Optional[str]) -> Target:
+    """Resolve a scenario entry against its spec into a ready-to-send request."""
+    service = config["service"]
+    spec = load_service(service)
+    method, path = config["endpoint"].split(" ", 1)
+    op: Operation = spec.operation(method, path)
+
+    path_values = _env(config.get("path", {}))
+    query = {p.name: sample_value(spec, p.schema, p.name) for p in op.parameters if p.location == "query" and p.required}
+    query.update(_env(config.get("query", {})))
+    headers = {k: str(v) for k, v in _env(config.get("headers", {})).items()}
+    if op.auth and token:
+        headers.setdefault("Authorization", f"Bearer {token}")
+
+    for p in op.parameters:
+        if p.location == "path":
+            value = path_values.get(p.name, sample_value(spec, p.schema, p.name))
+            path = path.replace("{" + p.name + "}", str(value))
+
+    request: Dict[str, Any] = {"headers": headers, "params": query}
+    if op.body is not None:
+        if op.body.content_type == "application/json":
+            request["json"] = _env(config["body"]) if "body" in config else sample_value(spec, op.body.schema)
+        else:
+            form = spec.deref(op.body.schema)
+            uploads = _env(config.get("files", {}))
+            files, data = {}, {}
+            for prop, prop_schema in form.get("properties", {}).items():
+                if prop_schema.get("format") == "binary":
+                    file_path = uploads.get(prop, DEFAULT_UPLOAD)
+                    with open(os.path.join(HERE, file_path), "rb") as f:
+                        files[prop] = (os.path.basename(file_path), f.read(), "image/jpeg")
+                else:
+                    data[prop] = str(config.get("form", {}).get(prop, sample_value(spec, prop_schema, prop)))
+            request["files"] = files
+            if data:
+                request["data"] = data
+
+    base_url = config.get("base_url") or spec.base_url
+    return Target(service, config["endpoint"], float(config["rate"]), method.upper(), base_url + path, request)
+
+
+async def _fire(client: httpx.AsyncClient, target: Target, scheduled: float, record: bool) -> None:
+    loop = asyncio.get_running_loop()
+    sent_at = loop.time()
+    try:
+        response = await client.request(target.method, target.url, **target.request)
+        status = str(response.status_code)
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError as e:
+        status = f"error:{type(e).__name__}"
+    done = loop.time()
+    if record:
+        target.latency.add((done - scheduled) * 1000)
+        target.service_time.add((done - sent_at) * 1000)
+        if status.startswith("2"):
+            target.ok_latency.add((done - scheduled) * 1000)
+        target.statuses[status] = target.statuses.get(status, 0) + 1
+
+
+async def _drive(client: httpx.AsyncClient, target: Target, start: float, duration: float, warmup: float,
+                 poisson: bool, inflight: List[int], max_inflight: int, tasks: set) -> None:
+    loop = asyncio.get_running_loop()
+    # crc32, not hash(): str hashes are salted per process and would change the schedule every run
+    rng = random.Random(zlib.crc32(target.name.encode("utf-8")))
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(target.rate) if poisson else 1.0 / target.rate
+        if offset >= duration:
+            return
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        record = offset >= warmup
+        if inflight[0] >= max_inflight:
+            if record:
+                target.dropped += 1
+            continue
+        if record:
+            target.sent += 1
+        inflight[0] += 1
+        task = asyncio.ensure_future(_fire(client, target, scheduled, record))
+        tasks.add(task)
+
+        def finished(t, task=task):
+            inflight[0] -= 1
+            tasks.discard(task)
+        task.add_done_callback(finished)
+
+
+async def run_scenario(targets: List[Target], duration: float, warmup: float = 0.0, poisson: bool = False,
+                       max_inflight: int = 1000, timeout: float = 120.0) -> float:
+    """Run all targets concurrently; returns the measured wall time (seconds, after warmup)."""
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(timeout, connect=10.0)) as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time() + 0.05
+        inflight, tasks = [0], set()
+        await asyncio.gather(*(_drive(client, t, start, duration + warmup, warmup, poisson, inflight, max_inflight, tasks)
+                               for t in targets))
+        if tasks:
+            await asyncio.wait(tasks)
+        return loop.time() - start - warmup
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def report(targets: List[Target], scenario: str, duration: float, elapsed: float, poisson: bool) -> Dict[str, Any]:
+    """JSON-serializable report; sketches are included so runs can be merged later."""
+    endpoints = {}
+    for t in targets:
+        completed = t.latency.count
+        ok = sum(n for status, n in t.statuses.items() if status.startswith("2"))
+        endpoints[t.name] = {
+            "url": t.url,
+            "offered_rps": t.rate,
+            "achieved_rps": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+            "sent": t.sent,
+            "completed": completed,
+            "dropped": t.dropped,
+            "statuses": t.statuses,
+            "error_rate": round(1 - ok / completed, 4) if completed else None,
+            "latency_ms": {k: (round(v, 2) if isinstance(v, float) else v)
+                           for k, v in t.latency.summary(REPORT_QUANTILES).items()},
+            "service_ms": {k: (round(v, 2) if isinstance(v, float) else v)
+                           for k, v in t.service_time.summary(REPORT_QUANTILES).items()},
+            "ok_latency_ms": {k: (round(v, 2) if isinstance(v, float) else v)
+                              for k, v in t.ok_latency.summary(REPORT_QUANTILES).items()},
+            "sketch": base64.b64encode(t.latency.to_bytes()).decode("ascii"),
+        }
+    return {
+        "scenario": scenario,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "duration_s": duration,
+        "arrivals": "poisson" if poisson else "constant",
+        "endpoints": endpoints,
+    }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float, error_threshold: float) -> List[str]:
+    """
+    Print per-endpoint deltas between two reports.
+
+    Returns:
+        Endpoints that regressed (p99 up by more than ``threshold`` or error
+        rate up by more than ``error_threshold``)
+    """
+    regressions = []
+    names = sorted(set(before["endpoints"]) | set(after["endpoints"]))
+    print(f"{'endpoint':<52} {'p50 ms':>17} {'p99 ms':>19} {'errors':>15}")
+    for name in names:
+        a, b = before["endpoints"].get(name), after["endpoints"].get(name)
+        if a is None or b is None:
+            print(f"{name:<52} {'only in ' + ('after' if a is None else 'before'):>17}")
+            continue
+        p50a, p50b = a["latency_ms"]["p50"], b["latency_ms"]["p50"]
+        p99a, p99b = a["latency_ms"]["p99"], b["latency_ms"]["p99"]
+        ea, eb = a["error_rate"] or 0.0, b["error_rate"] or 0.0
+        change = (p99b - p99a) / p99a if p99a and p99b is not None else 0.0
+        flag = ""
+        if change > threshold or eb - ea > error_threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<52} {p50a or 0:>8.1f}->{p50b or 0:<8.1f} {p99a or 0:>8.1f}->{p99b or 0:<8.1f}{change:+6.0%} "
+              f"{ea:>6.1%}->{eb:<6.1%}{flag}")
+    return regressions
+
+
+def _pairs(values: List[str]) -> Dict[str, str]:
+    return dict(v.split("=", 1) for v in values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Swagger-driven open-model load generator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run")
+    r.add_argument("--scenario", help="Scenario JSON (see module docstring)")
+    r.add_argument("--service", help="Single-service shorthand: service name from swagger_spec.SERVICES")
+    r.add_argument("--endpoint", action="append", default=[], help='"METHOD /path", repeatable')
+    r.add_argument("--rate", type=float, default=10, help="Requests/second per endpoint")
+    r.add_argument("--path", action="append", default=[], help="Path parameter name=value")
+    r.add_argument("--query", action="append", default=[], help="Query parameter name=value")
+    r.add_argument("--base-url", help="Override the service base URL")
+    r.add_argument("--duration", type=float, help="Seconds of measured load (default: scenario or 30)")
+    r.add_argument("--warmup", type=float, default=0, help="Seconds of load before measuring")
+    r.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times")
+    r.add_argument("--max-inflight", type=int, default=1000)
+    r.add_argument("--timeout", type=float, default=120)
+    r.add_argument("--token", default=os.getenv("GLOWLAB_TOKEN"), help="Bearer token for endpoints with auth")
+    r.add_argument("--out", help="Write the JSON report here")
+
+    c = sub.add_parser("compare")
+    c.add_argument("before")
+    c.add_argument("after")
+    c.add_argument("--threshold", type=float, default=0.10, help="Allowed relative p99 increase")
+    c.add_argument("--error-threshold", type=float, default=0.01, help="Allowed error rate increase")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.before, encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.after, encoding="utf-8") as f:
+            after = json.load(f)
+        sys.exit(1 if compare(before, after, args.threshold, args.error_threshold) else 0)
+
+    if args.scenario:
+        with open(args.scenario, encoding="utf-8") as f:
+            scenario = json.load(f)
+    elif args.service and args.endpoint:
+        scenario = {"name": f"{args.service}-adhoc", "targets": [
+            {"service": args.service, "endpoint": e, "rate": args.rate, "path": _pairs(args.path),
+             "query": _pairs(args.query), **({"base_url": args.base_url} if args.base_url else {})}
+            for e in args.endpoint]}
+    else:
+        parser.error("run needs --scenario or --service with --endpoint")
+
+    duration = args.duration or scenario.get("duration", 30)
+    targets = [build_target(t, args.token) for t in scenario["targets"]]
+    offered = sum(t.rate for t in targets)
+    print(f"Running {scenario.get('name', 'scenario')}: {len(targets)} endpoints, {offered:g} req/s offered, {duration:g}s")
+    elapsed = asyncio.run(run_scenario(targets, duration, args.warmup, args.poisson, args.max_inflight, args.timeout))
+    result = report(targets, scenario.get("name", ""), duration, elapsed, args.poisson)
+
+    for name, e in result["endpoints"].items():
+        lat = e["latency_ms"]
+        print(f"{name:<52} {e['achieved_rps']:>7.1f} rps  p50 {lat['p50'] or 0:>8.1f}  p99 {lat['p99'] or 0:>8.1f}  "
+              f"err {e['error_rate'] or 0:.1%}  dropped {e['dropped']}")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Local mock servers generated from the swagger specs.
+
+Every operation in a spec is served by a plain ASGI app that answers with a
+schema-valid fixture (swagger_spec.sample_value on the first 2xx response
+schema), so client, load-test and ops code can be exercised without the VPS.
+Request bodies, including the multipart uploads of ``/analyze-face/`` and
+``/analyze-palm/``, are read to the end before responding, like the real
+servers do.
+
+Each operation can get a latency distribution, an error rate and a
+throughput cap (token bucket) from a profile JSON::
+
+    {
+      "default": {"latency": "lognormal:40:0.4"},
+      "operations": {
+        "POST /analyze-face/": {"latency": "lognormal:2500:0.3", "max_rps": 4, "error_rate": 0.02},
+        "POST /chat/message": {"latency": "uniform:800:3000", "error_status": 503}
+      }
+    }
+
+Latency specs: ``fixed:MS``, ``uniform:LO:HI``, ``normal:MEAN:SD``,
+``lognormal:MEDIAN:SIGMA``, ``exponential:MEAN``. With ``max_rps`` requests
+above the cap queue for a token (``"throttle": "queue"``, default, models a
+saturated worker pool) or are rejected with 429 + Retry-After
+(``"throttle": "reject"``).
+
+    pip install uvicorn
+    python swagger_mock.py serve --service chatbot --service physiognomy --profile mock_profile.json
+    # -> export CHATBOT_BASE_URL=http://127.0.0.1:8000/api/v1 ...
+    curl http://127.0.0.1:8000/api/v1/__mock__/stats
+
+Injected vs measured latency, through swagger_loadgen::
+
+    python swagger_mock.py bench --rate 40 --duration 5
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import urlparse
+
+from swagger_spec import SERVICES, Operation, Spec, load_service, sample_value
+
+STATS_PATH = "/__mock__/stats"
+
+
+def parse_latency(text: str) -> Callable[[random.Random], float]:
+    """``"lognormal:40:0.4"`` -> sampler returning milliseconds."""
+    kind, *args = text.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution {text!r}")
+
+
+class TokenBucket:
+    """Throughput cap: ``rate`` tokens/second, bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, going into debt if needed; returns seconds to wait for it."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def try_take(self) -> Optional[float]:
+        """Take a token if one is available (None), else seconds until one is."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+class MockOperation:
+    """Fixture, behaviour and counters for one operation."""
+
+    def __init__(self, spec: Spec, op: Operation, profile: Dict[str, Any], seed: int):
+        self.op = op
+        self.pattern: Pattern = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", op.path) + "$")
+        status = next((s for s in sorted(op.responses) if s.startswith("2")), "200")
+        self.status = int(status) if status.isdigit() else 200
+        self.body = json.dumps(sample_value(spec, op.success_schema()), ensure_ascii=False).encode("utf-8")
+        self.latency = parse_latency(profile.get("latency", "fixed:0"))
+        self.error_rate = float(profile.get("error_rate", 0))
+        self.error_status = int(profile.get("error_status", 500))
+        self.bucket = TokenBucket(profile["max_rps"], profile.get("burst")) if profile.get("max_rps") else None
+        self.reject = profile.get("throttle", "queue") == "reject"
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "bytes_in": 0, "inflight": 0, "max_inflight": 0}
+
+
+async def _read_body(receive) -> int:
+    size, more = 0, True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        size += len(message.get("body", b""))
+        more = message.get("more_body", False)
+    return size
+
+
+async def _respond(send, status: int, body: bytes, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                + (headers or [])})
+    await send({"type": "http.response.body", "body": body})
+
+
+class MockApp:
+    """ASGI app serving every operation of one spec under its base URL path."""
+
+    def __init__(self, spec: Spec, profile: Optional[Dict[str, Any]] = None, check_auth: bool = False, seed: int = 0):
+        profile = profile or {}
+        self.spec = spec
+        self.prefix = urlparse(spec.base_url).path.rstrip("/")
+        self.check_auth = check_auth
+        overrides = profile.get("operations", {})
+        self.operations = [MockOperation(spec, op, {**profile.get("default", {}), **overrides.get(op.key, {})}, seed + i)
+                           for i, op in enumerate(spec.operations)]
+        # Literal paths before templated ones, so /chat/history/all wins over /chat/history/{id}
+        self.operations.sort(key=lambda m: m.op.path.count("{"))
+
+    def match(self, method: str, path: str) -> Tuple[Optional[MockOperation], bool]:
+        """(operation, path_known): path_known distinguishes 405 from 404."""
+        path_known = False
+        for mock in self.operations:
+            if mock.pattern.match(path):
+                path_known = True
+                if mock.op.method == method:
+                    return mock, True
+        return None, path_known
+
+    def stats(self) -> Dict[str, Any]:
+        return {m.op.key: m.stats for m in self.operations if m.stats["requests"]}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"]
+        if self.prefix and path.startswith(self.prefix):
+            path = path[len(self.prefix):] or "/"
+        if path == STATS_PATH:
+            await _read_body(receive)
+            await _respond(send, 200, json.dumps(self.stats()).encode())
+            return
+        mock, path_known = self.match(scope["method"], path)
+        size = await _read_body(receive)
+        if mock is None:
+            await _respond(send, 405 if path_known else 404, b'{"detail": "Not mocked"}')
+            return
+
+        stats = mock.stats
+        stats["requests"] += 1
+        stats["bytes_in"] += size
+        if self.check_auth and mock.op.auth:
+            if not any(k == b"authorization" for k, _ in scope["headers"]):
+                await _respond(send, 401, b'{"detail": "Not authenticated"}')
+                return
+        if mock.bucket:
+            if mock.reject:
+                retry_after = mock.bucket.try_take()
+                if retry_after is not None:
+                    stats["throttled"] += 1
+                    await _respond(send, 429, b'{"detail": "Too many requests"}',
+                                   [(b"retry-after", str(math.ceil(retry_after)).encode())])
+                    return
+            else:
+                wait = mock.bucket.reserve()
+                if wait:
+                    stats["throttled"] += 1
+                    await asyncio.sleep(wait)
+
+        stats["inflight"] += 1
+        stats["max_inflight"] = max(stats["max_inflight"], stats["inflight"])
+        try:
+            await asyncio.sleep(mock.latency(mock.rng) / 1000)
+        finally:
+            stats["inflight"] -= 1
+        if mock.error_rate and mock.rng.random() < mock.error_rate:
+            stats["errors"] += 1
+            await _respond(send, mock.error_status, b'{"detail": "Injected error"}')
+            return
+        await _respond(send, mock.status, mock.body)
+
+
+def create_app(service: str, profile: Optional[Dict[str, Any]] = None, check_auth: bool = False) -> MockApp:
+    return MockApp(load_service(service), profile, check_auth)
+
+
+def _server(app: MockApp, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False,
+                            backlog=2048, limit_concurrency=None)
+    return uvicorn.Server(config)
+
+
+async def serve(services: List[str], profile: Dict[str, Any], check_auth: bool, port_offset: int) -> None:
+    servers = []
+    used = set()
+    for name in services:
+        spec = load_service(name)
+        port = (urlparse(SERVICES[name]["base_url"]).port or 80) + port_offset
+        if port in used:
+            raise SystemExit(f"{name}: port {port} already taken by another mocked service")
+        used.add(port)
+        app = MockApp(spec, profile.get(name, profile), check_auth)
+        servers.append(_server(app, port))
+        print(f"{name:<12} {len(spec.operations):>3} operations  "
+              f"export {SERVICES[name]['env']}=http://127.0.0.1:{port}{app.prefix}")
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def bench(rate: float, duration: float, port_offset: int) -> None:
+    """Serve the chatbot and physiognomy specs with known latencies and measure them with swagger_loadgen."""
+    import os
+    import socket
+    import subprocess
+    import sys
+    import tempfile
+
+    import httpx
+
+    from swagger_loadgen import build_target, run_scenario
+
+    profile = {
+        "default": {"latency": "fixed:5"},
+        "operations": {
+            "POST /chat/message": {"latency": "lognormal:40:0.5", "error_rate": 0.05},
+            "POST /analyze-face/": {"latency": "uniform:20:60", "max_rps": rate / 8},
+            "POST /analyze-palm/": {"latency": "fixed:10", "max_rps": rate / 8, "throttle": "reject"},
+        },
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(profile, f)
+    # Separate process, so the mocks and the load generator do not share a GIL
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--service", "chatbot",
+                               "--service", "physiognomy", "--profile", f.name, "--port-offset", str(port_offset)],
+                              stdout=subprocess.DEVNULL)
+    ports = [urlparse(SERVICES[name]["base_url"]).port + port_offset for name in ("chatbot", "physiognomy")]
+    try:
+        deadline = time.monotonic() + 15
+        for port in ports:
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise SystemExit("mock servers did not start (is uvicorn installed?)")
+                    time.sleep(0.1)
+
+        chatbot_url = f"http://127.0.0.1:{ports[0]}/api/v1"
+        physiognomy_url = f"http://127.0.0.1:{ports[1]}"
+        targets = [build_target(config, None) for config in (
+            {"service": "chatbot", "endpoint": "POST /chat/message", "rate": rate, "base_url": chatbot_url},
+            {"service": "chatbot", "endpoint": "GET /chat/history/{conversation_id}", "rate": rate,
+             "base_url": chatbot_url},
+            {"service": "physiognomy", "endpoint": "POST /analyze-face/", "rate": rate / 4, "base_url": physiognomy_url,
+             "files": {"file": "khuon-mat-hinh-chu-nhat.jpg"}},
+            {"service": "physiognomy", "endpoint": "POST /analyze-palm/", "rate": rate / 4, "base_url": physiognomy_url,
+             "files": {"file": "vantay.jpg"}},
+        )]
+        asyncio.run(run_scenario(targets, duration))
+        received = {url: httpx.get(url + STATS_PATH).json() for url in (chatbot_url, physiognomy_url)}
+    finally:
+        server.terminate()
+        server.wait()
+        os.unlink(f.name)
+
+    print("=" * 100)
+    print(f"MOCK SERVERS UNDER LOAD ({duration:g}s, {sum(t.rate for t in targets):g} req/s offered)")
+    print("=" * 100)
+    print(f"{'endpoint':<46} {'injected':<24} {'rps':>6} {'p50':>7} {'p99':>7}  statuses")
+    for t in targets:
+        injected = profile["operations"].get(t.endpoint, profile["default"])
+        label = injected["latency"] + (f" cap {injected['max_rps']:g}" if "max_rps" in injected else "")
+        print(f"{t.name:<46} {label:<24} {t.latency.count / duration:>6.1f} {t.latency.quantile(0.5):>7.1f} "
+              f"{t.latency.quantile(0.99):>7.1f}  {dict(sorted(t.statuses.items()))}")
+    for url, stats in received.items():
+        print(f"{url}: {sum(s['bytes_in'] for s in stats.values()) / 1024:.0f} KiB of request bodies consumed, "
+              f"{sum(s['throttled'] for s in stats.values())} throttled")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock servers generated from the swagger specs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--service", action="append", choices=list(SERVICES), help="Repeatable (default: all but chatbot_docs)")
+    s.add_argument("--profile", help="Latency/error/throughput profile JSON (optionally keyed by service)")
+    s.add_argument("--check-auth", action="store_true", help="401 when a secured operation has no Authorization header")
+    s.add_argument("--port-offset", type=int, default=0, help="Added to each service's default port")
+    b = sub.add_parser("bench")
+    b.add_argument("--rate", type=float, default=40, help="Offered req/s for the chatbot endpoints")
+    b.add_argument("--duration", type=float, default=5)
+    b.add_argument("--port-offset", type=int, default=20000, help="Mocks listen on the default ports plus this")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.rate, args.duration, args.port_offset)
+        return
+    profile: Dict[str, Any] = {}
+    if args.profile:
+        with open(args.profile, encoding="utf-8") as f:
+            profile = json.load(f)
+    services = args.service or [name for name in SERVICES if name != "chatbot_docs"]
+    try:
+        asyncio.run(serve(services, profile, args.check_auth, args.port_offset))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,612 @@
+"""Normalized view of the service specs (Swagger 2 and OpenAPI 3).
+
+The repo carries four specs in two dialects:
+
+    swagger.json                   OpenAPI 3.0  glowlab backend (Node, :3000)
+    aichatbot.swagger              Swagger 2.0  lasotuvi chatbot (:8000/api/v1)
+    chatbotapidocs.json            Swagger 2.0  older chatbot spec
+    aianalyzepalmandface.swagger   OpenAPI 3.1  physiognomy API (:8001)
+
+``load_spec`` turns either dialect into the same ``Spec`` / ``Operation``
+model: body and formData parameters become a ``RequestBody``, parameter
+types become schemas, path-level parameters are merged into each operation,
+and schemas are addressed by plain name (``ChatStart``,
+``CloudinaryAnalysisRequest``) whichever section they came from.
+
+    from swagger_spec import load_service
+    spec = load_service("chatbot")
+    for op in spec.operations:
+        print(op.method, op.path, op.body and op.body.content_type)
+    spec.operation("POST", "/chat/message")       # indexed lookup
+    spec.schema_users["ChatStart"]                # operations referencing a schema
+
+Parsed specs are pickled under .cache/swagger_spec/ keyed by the SHA-256 of
+the file, so repeat loads skip JSON decoding and normalization entirely.
+
+What changed between two specs (operations, parameters, bodies, responses
+and schema fields)::
+
+    python swagger_spec.py diff chatbotapidocs.json aichatbot.swagger
+    python swagger_spec.py diff old/swagger.json swagger.json --json --exit-code
+    python swagger_spec.py bench
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Spec file, default base URL and the env var overriding it, per service
+SERVICES: Dict[str, Dict[str, str]] = {
+    "glowlab": {"file": "swagger.json", "base_url": "http://localhost:3000", "env": "GLOWLAB_BASE_URL"},
+    "chatbot": {"file": "aichatbot.swagger", "base_url": "http://localhost:8000/api/v1", "env": "CHATBOT_BASE_URL"},
+    "chatbot_docs": {"file": "chatbotapidocs.json", "base_url": "http://localhost:8000/api/v1", "env": "CHATBOT_BASE_URL"},
+    "physiognomy": {"file": "aianalyzepalmandface.swagger", "base_url": "http://localhost:8001", "env": "PHYSIOGNOMY_BASE_URL"},
+}
+
+METHODS = ("get", "put", "post", "delete", "patch", "head", "options")
+
+CACHE_DIR = os.getenv("SWAGGER_SPEC_CACHE", os.path.join(HERE, ".cache", "swagger_spec"))
+# Bump when the parsed model changes shape, so stale pickles are ignored
+CACHE_VERSION = 2
+
+
+@dataclass
+class Parameter:
+    name: str
+    location: str  # path | query | header | cookie
+    required: bool
+    schema: Dict[str, Any]
+    description: str = ""
+
+
+@dataclass
+class RequestBody:
+    content_type: str  # application/json | multipart/form-data | application/x-www-form-urlencoded
+    schema: Dict[str, Any]
+    required: bool = True
+
+
+@dataclass
+class Operation:
+    method: str  # upper case
+    path: str  # relative to the service base URL
+    operation_id: str
+    summary: str = ""
+    tags: List[str] = field(default_factory=list)
+    parameters: List[Parameter] = field(default_factory=list)
+    body: Optional[RequestBody] = None
+    responses: Dict[str, Optional[Dict[str, Any]]] = field(default_factory=dict)  # status -> schema
+    auth: bool = False  # requires a bearer token
+    description: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def success_schema(self) -> Optional[Dict[str, Any]]:
+        """Schema of the first 2xx response (None when undocumented)."""
+        for status in sorted(self.responses):
+            if status.startswith("2"):
+                return self.responses[status]
+        return None
+
+
+@dataclass
+class Spec:
+    name: str
+    title: str
+    dialect: str  # "swagger2" | "openapi3"
+    base_url: str
+    operations: List[Operation]
+    schemas: Dict[str, Dict[str, Any]]
+    base_path: str = ""  # basePath / first server URL as written in the spec
+    # Built once in __post_init__ (and pickled with the spec)
+    by_key: Dict[str, Operation] = field(init=False, repr=False, compare=False)
+    by_path: Dict[str, Dict[str, Operation]] = field(init=False, repr=False, compare=False)
+    schema_users: Dict[str, Set[str]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.by_key = {op.key: op for op in self.operations}
+        self.by_path = {}
+        for op in self.operations:
+            self.by_path.setdefault(op.path, {})[op.method] = op
+        # Schema name -> keys of the operations that reach it (directly or through other schemas)
+        self.schema_users = {}
+        for op in self.operations:
+            roots = [p.schema for p in op.parameters] + [s for s in op.responses.values() if s]
+            if op.body:
+                roots.append(op.body.schema)
+            for name in self._reachable(roots):
+                self.schema_users.setdefault(name, set()).add(op.key)
+
+    def _reachable(self, roots: List[Any]) -> Set[str]:
+        seen: Set[str] = set()
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                ref = node.get("$ref")
+                if isinstance(ref, str):
+                    name = ref_name(ref)
+                    if name not in seen:
+                        seen.add(name)
+                        stack.append(self.schemas.get(name))
+                stack.extend(v for k, v in node.items() if k != "$ref")
+            elif isinstance(node, list):
+                stack.extend(node)
+        return seen
+
+    def operation(self, method: str, path: str) -> Operation:
+        try:
+            return self.by_key[f"{method.upper()} {path}"]
+        except KeyError:
+            raise KeyError(f"{method.upper()} {path} not in {self.name}") from None
+
+    def deref(self, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Follow ``$ref`` chains to the target schema (one level; nested refs stay refs)."""
+        seen = set()
+        while schema and "$ref" in schema:
+            name = ref_name(schema["$ref"])
+            if name in seen:
+                break
+            seen.add(name)
+            schema = self.schemas.get(name, {})
+        return schema or {}
+
+
+def ref_name(ref: str) -> str:
+    """``#/definitions/ChatStart`` / ``#/components/schemas/ChatStart`` -> ``ChatStart``."""
+    return ref.rsplit("/", 1)[-1]
+
+
+def _normalize_refs(node: Any) -> Any:
+    """Rewrite every $ref to ``#/schemas/<Name>`` so both dialects look alike."""
+    if isinstance(node, dict):
+        out = {k: _normalize_refs(v) for k, v in node.items()}
+        if isinstance(out.get("$ref"), str):
+            out["$ref"] = "#/schemas/" + ref_name(out["$ref"])
+        return out
+    if isinstance(node, list):
+        return [_normalize_refs(v) for v in node]
+    return node
+
+
+def _swagger2_param_schema(param: Dict[str, Any]) -> Dict[str, Any]:
+    if "schema" in param:
+        return param["schema"]
+    schema = {k: param[k] for k in ("type", "format", "items", "enum", "default") if k in param}
+    if schema.get("type") == "file":
+        schema = {"type": "string", "format": "binary"}
+    return schema
+
+
+def _parse_swagger2(raw: Dict[str, Any], path: str, item: Dict[str, Any], method: str, op: Dict[str, Any]) -> Operation:
+    params, body = [], None
+    form: Dict[str, Any] = {"type": "object", "properties": {}, "required": []}
+    consumes = op.get("consumes") or raw.get("consumes") or ["application/json"]
+    for p in item.get("parameters", []) + op.get("parameters", []):
+        if p["in"] == "body":
+            body = RequestBody("application/json", _swagger2_param_schema(p), p.get("required", False))
+        elif p["in"] == "formData":
+            form["properties"][p["name"]] = _swagger2_param_schema(p)
+            if p.get("required"):
+                form["required"].append(p["name"])
+        else:
+            params.append(Parameter(p["name"], p["in"], p.get("required", p["in"] == "path"),
+                                    _swagger2_param_schema(p), p.get("description", "")))
+    if form["properties"]:
+        content_type = "multipart/form-data" if "multipart/form-data" in consumes else "application/x-www-form-urlencoded"
+        body = RequestBody(content_type, form, bool(form["required"]))
+    responses = {status: resp.get("schema") for status, resp in op.get("responses", {}).items()}
+    return Operation(method.upper(), path, op.get("operationId") or f"{method}_{path}", op.get("summary", ""),
+                     op.get("tags", []), params, body, responses, bool(op.get("security", raw.get("security"))),
+                     op.get("description", ""))
+
+
+def _parse_openapi3(raw: Dict[str, Any], path: str, item: Dict[str, Any], method: str, op: Dict[str, Any]) -> Operation:
+    params = [Parameter(p["name"], p["in"], p.get("required", p["in"] == "path"), p.get("schema", {}),
+                        p.get("description", ""))
+              for p in item.get("parameters", []) + op.get("parameters", [])]
+    body = None
+    if "requestBody" in op:
+        content = op["requestBody"].get("content", {})
+        if content:
+            content_type = next(iter(content))
+            body = RequestBody(content_type, content[content_type].get("schema", {}),
+                               op["requestBody"].get("required", False))
+    responses = {}
+    for status, resp in op.get("responses", {}).items():
+        content = resp.get("content") or {}
+        responses[status] = next(iter(content.values())).get("schema") if content else None
+    return Operation(method.upper(), path, op.get("operationId") or f"{method}_{path}", op.get("summary", ""),
+                     op.get("tags", []), params, body, responses, bool(op.get("security", raw.get("security"))),
+                     op.get("description", ""))
+
+
+def parse_spec(raw: Dict[str, Any], name: str = "", base_url: str = "") -> Spec:
+    """Build a ``Spec`` from an already-decoded Swagger 2 / OpenAPI 3 document."""
+    raw = _normalize_refs(raw)
+    if "swagger" in raw:
+        dialect, parse = "swagger2", _parse_swagger2
+        schemas = raw.get("definitions", {})
+        base_path = raw.get("basePath", "")
+    else:
+        dialect, parse = "openapi3", _parse_openapi3
+        schemas = raw.get("components", {}).get("schemas", {})
+        base_path = (raw.get("servers") or [{}])[0].get("url", "")
+
+    operations = []
+    for path, item in raw.get("paths", {}).items():
+        # Parameters can themselves be refs in OpenAPI 3; none of our specs use that
+        for method in METHODS:
+            if method in item:
+                operations.append(parse(raw, path, item, method, item[method]))
+    return Spec(name, raw.get("info", {}).get("title", name), dialect, base_url, operations, schemas, base_path)
+
+
+def sample_value(spec: Spec, schema: Optional[Dict[str, Any]], name: str = "", depth: int = 0) -> Any:
+    """
+    A schema-valid example value: ``example`` / ``default`` / first enum value
+    when the spec has one, otherwise a plausible value for the type (binary
+    fields become a few bytes).
+    """
+    schema = schema or {}
+    if "$ref" in schema:
+        if depth > 8:
+            return None
+        return sample_value(spec, spec.deref(schema), name, depth + 1)
+    for key in ("example", "default"):
+        if key in schema:
+            return schema[key]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            return sample_value(spec, schema[key][0], name, depth + 1)
+    kind = schema.get("type")
+    if kind == "string":
+        fmt = schema.get("format")
+        if fmt == "binary":
+            return b"\xff\xd8\xff\xe0"
+        if fmt == "date-time" or "time" in name.lower():
+            return "2026-01-01T00:00:00Z"
+        if fmt == "email" or "email" in name.lower():
+            return "user@example.com"
+        if "url" in name.lower():
+            return "https://example.com/image.jpg"
+        return name or "string"
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    if kind == "array":
+        return [sample_value(spec, schema.get("items"), name, depth + 1)]
+    if kind == "object" or "properties" in schema:
+        return {prop: sample_value(spec, sub, prop, depth + 1) for prop, sub in schema.get("properties", {}).items()}
+    return {}
+
+
+_JSON_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+def validate(spec: Spec, schema: Optional[Dict[str, Any]], value: Any, path: str = "$", depth: int = 0) -> List[str]:
+    """
+    Check a decoded JSON value against a schema (the subset our specs use:
+    type, nullable, enum, required, properties, items, anyOf/oneOf/allOf).
+
+    Returns:
+        Error messages with JSON paths; empty when the value conforms
+    """
+    schema = schema or {}
+    if "$ref" in schema:
+        return [] if depth > 16 else validate(spec, spec.deref(schema), value, path, depth + 1)
+    if schema.get("allOf"):
+        return [e for sub in schema["allOf"] for e in validate(spec, sub, value, path, depth + 1)]
+    for key in ("anyOf", "oneOf"):
+        if schema.get(key):
+            if any(not validate(spec, sub, value, path, depth + 1) for sub in schema[key]):
+                return []
+            return [f"{path}: matches none of {' | '.join(type_label(sub) for sub in schema[key])}"]
+
+    kinds = schema.get("type")
+    kinds = kinds if isinstance(kinds, list) else [kinds] if kinds else []
+    if value is None:
+        if not kinds or "null" in kinds or schema.get("nullable") or schema.get("x-nullable"):
+            return []
+        return [f"{path}: null, expected {'/'.join(kinds)}"]
+    if kinds and not any(kind in _JSON_TYPES and isinstance(value, _JSON_TYPES[kind])
+                         and not (isinstance(value, bool) and kind != "boolean") for kind in kinds):
+        return [f"{path}: {type(value).__name__}, expected {'/'.join(kinds)}"]
+    if schema.get("enum") and value not in schema["enum"]:
+        return [f"{path}: {value!r} not in enum"]
+
+    errors = []
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(spec, schema["items"], item, f"{path}[{i}]", depth + 1))
+    elif isinstance(value, dict):
+        errors.extend(f"{path}.{name}: missing" for name in schema.get("required", []) if name not in value)
+        for name, sub in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(validate(spec, sub, value[name], f"{path}.{name}", depth + 1))
+    return errors
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}-v{CACHE_VERSION}.pickle")
+
+
+# (sha256, name, base_url) -> Spec, for repeat loads within one process
+_loaded: Dict[Tuple[str, str, str], Spec] = {}
+
+
+def load_spec(path: str, name: str = "", base_url: str = "", use_cache: bool = True) -> Spec:
+    """
+    Read and normalize one spec file.
+
+    The parsed model is cached in memory and on disk, keyed by the SHA-256 of
+    the file contents, so an edited spec is always re-parsed.
+
+    Returns:
+        The shared ``Spec``; treat it as read-only
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    key = (digest, name, base_url)
+    if use_cache and key in _loaded:
+        return _loaded[key]
+
+    spec = None
+    if use_cache:
+        try:
+            with open(_cache_path(digest), "rb") as f:
+                spec = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            spec = None
+    if spec is None:
+        spec = parse_spec(json.loads(data.decode("utf-8")), name, base_url)
+        if use_cache:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp = _cache_path(digest) + f".{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, _cache_path(digest))
+            except OSError:
+                pass  # read-only checkout: still works, just uncached
+    spec.name, spec.base_url = name, base_url
+    if use_cache:
+        _loaded[key] = spec
+    return spec
+
+
+def service_base_url(name: str) -> str:
+    service = SERVICES[name]
+    return os.getenv(service["env"], service["base_url"]).rstrip("/")
+
+
+def load_service(name: str) -> Spec:
+    """Load one of SERVICES by name with its (env-overridable) base URL."""
+    return load_spec(os.path.join(HERE, SERVICES[name]["file"]), name, service_base_url(name))
+
+
+# ============================================
+# Diff
+# ============================================
+
+def type_label(schema: Optional[Dict[str, Any]]) -> str:
+    """Short type description: ``ChatStart``, ``array[integer]``, ``string(binary)``, ``string | null``."""
+    schema = schema or {}
+    if "$ref" in schema:
+        return ref_name(schema["$ref"])
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            return " | ".join(type_label(s) for s in schema[key])
+    kind = schema.get("type", "any")
+    if kind == "array":
+        return f"array[{type_label(schema.get('items'))}]"
+    if schema.get("format"):
+        return f"{kind}({schema['format']})"
+    if schema.get("enum"):
+        return f"{kind}{{{', '.join(map(str, schema['enum']))}}}"
+    return kind
+
+
+def _field_changes(old: Dict[str, Any], new: Dict[str, Any], prefix: str = "field") -> List[str]:
+    old_props, new_props = old.get("properties", {}), new.get("properties", {})
+    old_req, new_req = set(old.get("required", [])), set(new.get("required", []))
+    changes = []
+    for prop in sorted(set(old_props) | set(new_props)):
+        if prop not in old_props:
+            changes.append(f"{prefix} {prop} added ({type_label(new_props[prop])}"
+                           f"{', required' if prop in new_req else ''})")
+        elif prop not in new_props:
+            changes.append(f"{prefix} {prop} removed")
+        else:
+            before, after = type_label(old_props[prop]), type_label(new_props[prop])
+            if before != after:
+                changes.append(f"{prefix} {prop} type {before} -> {after}")
+            if (prop in old_req) != (prop in new_req):
+                changes.append(f"{prefix} {prop} now {'required' if prop in new_req else 'optional'}")
+    return changes
+
+
+def _operation_changes(old: Operation, new: Operation) -> List[str]:
+    changes = []
+    old_params = {(p.location, p.name): p for p in old.parameters}
+    new_params = {(p.location, p.name): p for p in new.parameters}
+    for key in sorted(set(old_params) | set(new_params)):
+        label = f"{key[0]} param {key[1]}"
+        if key not in old_params:
+            p = new_params[key]
+            changes.append(f"{label} added ({type_label(p.schema)}{', required' if p.required else ''})")
+        elif key not in new_params:
+            changes.append(f"{label} removed")
+        else:
+            a, b = old_params[key], new_params[key]
+            if type_label(a.schema) != type_label(b.schema):
+                changes.append(f"{label} type {type_label(a.schema)} -> {type_label(b.schema)}")
+            if a.required != b.required:
+                changes.append(f"{label} now {'required' if b.required else 'optional'}")
+
+    if (old.body is None) != (new.body is None):
+        changes.append("request body " + ("added" if new.body else "removed"))
+    elif old.body and new.body:
+        if old.body.content_type != new.body.content_type:
+            changes.append(f"request body {old.body.content_type} -> {new.body.content_type}")
+        if type_label(old.body.schema) != type_label(new.body.schema):
+            changes.append(f"request body {type_label(old.body.schema)} -> {type_label(new.body.schema)}")
+        elif "$ref" not in new.body.schema:
+            # Inline bodies (formData, multipart) have no schema of their own to diff separately
+            changes.extend(_field_changes(old.body.schema, new.body.schema, "body field"))
+
+    for status in sorted(set(old.responses) | set(new.responses)):
+        if status not in old.responses:
+            changes.append(f"response {status} added ({type_label(new.responses[status])})")
+        elif status not in new.responses:
+            changes.append(f"response {status} removed")
+        elif type_label(old.responses[status]) != type_label(new.responses[status]):
+            changes.append(f"response {status} {type_label(old.responses[status])} -> "
+                           f"{type_label(new.responses[status])}")
+    if old.auth != new.auth:
+        changes.append("auth " + ("required" if new.auth else "no longer required"))
+    return changes
+
+
+@dataclass
+class SpecDiff:
+    old: str
+    new: str
+    added_operations: List[str] = field(default_factory=list)
+    removed_operations: List[str] = field(default_factory=list)
+    changed_operations: Dict[str, List[str]] = field(default_factory=dict)
+    added_schemas: List[str] = field(default_factory=list)
+    removed_schemas: List[str] = field(default_factory=list)
+    changed_schemas: Dict[str, List[str]] = field(default_factory=dict)
+    # Unchanged operations reaching a changed schema
+    affected_operations: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added_operations or self.removed_operations or self.changed_operations
+                    or self.added_schemas or self.removed_schemas or self.changed_schemas)
+
+    def render(self) -> str:
+        lines = [f"{self.old} -> {self.new}",
+                 f"Operations: +{len(self.added_operations)} -{len(self.removed_operations)} "
+                 f"~{len(self.changed_operations)}"]
+        lines += [f"  + {key}" for key in self.added_operations]
+        lines += [f"  - {key}" for key in self.removed_operations]
+        for key, changes in self.changed_operations.items():
+            lines.append(f"  ~ {key}")
+            lines += [f"      {c}" for c in changes]
+        lines.append(f"Schemas: +{len(self.added_schemas)} -{len(self.removed_schemas)} ~{len(self.changed_schemas)}")
+        lines += [f"  + {name}" for name in self.added_schemas]
+        lines += [f"  - {name}" for name in self.removed_schemas]
+        for name, changes in self.changed_schemas.items():
+            lines.append(f"  ~ {name}")
+            lines += [f"      {c}" for c in changes]
+        for key, names in self.affected_operations.items():
+            lines.append(f"  * {key} (via {', '.join(names)})")
+        return "\n".join(lines)
+
+
+def diff_specs(old: Spec, new: Spec) -> SpecDiff:
+    """Operation- and schema-level differences between two loaded specs."""
+    result = SpecDiff(old.name, new.name)
+    result.added_operations = [op.key for op in new.operations if op.key not in old.by_key]
+    result.removed_operations = [op.key for op in old.operations if op.key not in new.by_key]
+    for op in new.operations:
+        if op.key in old.by_key:
+            changes = _operation_changes(old.by_key[op.key], op)
+            if changes:
+                result.changed_operations[op.key] = changes
+
+    result.added_schemas = sorted(set(new.schemas) - set(old.schemas))
+    result.removed_schemas = sorted(set(old.schemas) - set(new.schemas))
+    for name in sorted(set(old.schemas) & set(new.schemas)):
+        a, b = old.schemas[name], new.schemas[name]
+        changes = _field_changes(a, b)
+        if type_label(a) != type_label(b):
+            changes.insert(0, f"type {type_label(a)} -> {type_label(b)}")
+        if changes:
+            result.changed_schemas[name] = changes
+
+    for name in result.changed_schemas:
+        for key in sorted(new.schema_users.get(name, ())):
+            if key in old.by_key and key not in result.changed_operations:
+                result.affected_operations.setdefault(key, []).append(name)
+    return result
+
+
+def _resolve_path(path: str) -> str:
+    if path in SERVICES:
+        return os.path.join(HERE, SERVICES[path]["file"])
+    return path if os.path.exists(path) else os.path.join(HERE, path)
+
+
+def bench(rounds: int) -> None:
+    files = sorted({service["file"] for service in SERVICES.values()})
+    print("=" * 70)
+    print(f"SPEC LOADING (best of {rounds}, per file)")
+    print("=" * 70)
+    print(f"{'file':<32} {'KiB':>6} {'parse':>10} {'disk cache':>11} {'memory':>9}")
+    for file in files:
+        path = os.path.join(HERE, file)
+        timings = []
+        for mode in ("parse", "disk", "memory"):
+            best = float("inf")
+            for _ in range(rounds):
+                if mode != "memory":
+                    _loaded.clear()
+                t0 = time.perf_counter()
+                load_spec(path, use_cache=mode != "parse")
+                best = min(best, time.perf_counter() - t0)
+            timings.append(best * 1000)
+        print(f"{file:<32} {os.path.getsize(path) / 1024:>6.1f} {timings[0]:>8.2f}ms {timings[1]:>9.2f}ms "
+              f"{timings[2]:>7.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Swagger/OpenAPI spec tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    d = sub.add_parser("diff", help="Operation and schema differences between two specs")
+    d.add_argument("old", help="Spec file or service name")
+    d.add_argument("new", help="Spec file or service name")
+    d.add_argument("--json", action="store_true")
+    d.add_argument("--exit-code", action="store_true", help="Exit 1 when the specs differ")
+    b = sub.add_parser("bench", help="Parse vs cached load time")
+    b.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.rounds)
+        return
+    old_path, new_path = _resolve_path(args.old), _resolve_path(args.new)
+    result = diff_specs(load_spec(old_path, os.path.basename(old_path)), load_spec(new_path, os.path.basename(new_path)))
+    print(json.dumps(asdict(result), indent=2) if args.json else result.render())
+    if args.exit_code and not result.empty:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""Local memory-mapped vector index for the Tu Vi reference books (RAG).
+
+``TuviMessage.sources`` stores ``{"books": [...]}`` citations from a retrieval
+step over the Tu Vi reference texts. This module serves that retrieval from an
+on-disk index, with no external vector DB:
+
+    <index dir>/
+        meta.json         dim, count, embedder, ivf settings
+        vectors.npy       float16 (count, dim), L2-normalised rows
+        offsets.npy       int64 byte offset of each row's passage in passages.jsonl
+        passages.jsonl    {"book", "chapter", "text"} per line
+        centroids.npy     float32 (nlist, dim)   [IVF only]
+        lists.npy         int64 (nlist + 1) row ranges per partition [IVF only]
+
+Arrays are opened with ``mmap_mode="r"``, so every uvicorn worker maps the
+same pages from the OS page cache instead of holding a private copy. The
+index is loaded lazily on the first query.
+
+Build offline from a corpus (``.jsonl`` with ``book``/``chapter``/``text`` or
+a directory of ``.txt`` files, one book per file)::
+
+    python tuvi_book_index.py build --corpus books/ --out data/book_index --ivf 1024
+    python tuvi_book_index.py query "Tử Vi cư Ngọ" --k 5
+    python tuvi_book_index.py bench --passages 1000000
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_DIR = os.getenv("TUVI_BOOK_INDEX", "data/book_index")
+DEFAULT_DIM = 256
+BUILD_BATCH = 4096
+# Rows per matmul block when scanning; keeps the float32 working set ~16 MB
+SCAN_BLOCK = 16384
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedding stand-in (feature hashing of words and bigrams).
+
+    Stable across processes and machines (crc32, not Python's salted hash), so
+    an index built offline matches queries embedded in the API.
+    """
+
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterator[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        yield from words
+        for a, b in zip(words, words[1:]):
+            yield f"{a} {b}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+# ============================================
+# Build
+# ============================================
+
+def read_corpus(path: str, max_chars: int = 800) -> Iterator[Dict[str, str]]:
+    """
+    Yield passages from a .jsonl file or a directory of .txt books.
+
+    Text files are split on blank lines and packed into ~max_chars passages.
+    """
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    for name in sorted(os.listdir(path)):
+        if not name.endswith(".txt"):
+            continue
+        book = os.path.splitext(name)[0]
+        with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+            paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+        buffer = ""
+        for paragraph in paragraphs:
+            if buffer and len(buffer) + len(paragraph) > max_chars:
+                yield {"book": book, "chapter": "", "text": buffer}
+                buffer = ""
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            yield {"book": book, "chapter": "", "text": buffer}
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _kmeans(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a training sample; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty partitions from random sample rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK):
+        block = vectors[start:start + SCAN_BLOCK].astype(np.float32)
+        assign[start:start + SCAN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def _write_ivf(out_dir: str, nlist: int, train_size: int = 100_000) -> int:
+    """
+    Partition an already written flat index in place (rows reordered by list).
+
+    Returns:
+        Lists actually used: at most one per training vector, 0 (stay flat) for an empty index
+    """
+    vectors = np.load(os.path.join(out_dir, "vectors.npy"), mmap_mode="r")
+    offsets = np.load(os.path.join(out_dir, "offsets.npy"))
+    count, dim = vectors.shape
+    nlist = min(nlist, count, train_size)
+    if nlist <= 0:
+        return 0
+
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(count, min(train_size, count), replace=False))
+    centroids = _kmeans(vectors[sample_rows].astype(np.float32), nlist)
+
+    assign = _assign(vectors, centroids)
+    order = np.argsort(assign, kind="stable")
+    lists = np.zeros(nlist + 1, dtype=np.int64)
+    lists[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+    tmp_path = os.path.join(out_dir, "vectors.ivf.npy")
+    reordered = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(count, dim))
+    for start in range(0, count, SCAN_BLOCK):
+        reordered[start:start + SCAN_BLOCK] = vectors[order[start:start + SCAN_BLOCK]]
+    reordered.flush()
+    del reordered, vectors
+
+    os.replace(tmp_path, os.path.join(out_dir, "vectors.npy"))
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets[order])
+    np.save(os.path.join(out_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(out_dir, "lists.npy"), lists)
+    return nlist
+
+
+def build_index(
+    passages: Iterable[Dict[str, str]],
+    out_dir: str,
+    embedder: Optional[HashingEmbedder] = None,
+    ivf_lists: int = 0,
+) -> Dict[str, Any]:
+    """
+    Embed passages and write the memory-mappable index.
+
+    The corpus is read once; embeddings are computed from the passages.jsonl
+    written in that pass, so ``passages`` can be a generator.
+
+    Args:
+        passages: Iterable of {"book", "chapter", "text"}
+        out_dir: Index directory (created if missing)
+        embedder: Embedding model (defaults to HashingEmbedder)
+        ivf_lists: Number of IVF partitions, 0 for a flat index (capped at the
+            passage count; meta.json records the effective value)
+
+    Returns:
+        Contents of meta.json
+    """
+    embedder = embedder or HashingEmbedder()
+    os.makedirs(out_dir, exist_ok=True)
+    passages_path = os.path.join(out_dir, "passages.jsonl")
+
+    offsets = []
+    with open(passages_path, "wb") as f:
+        for passage in passages:
+            offsets.append(f.tell())
+            f.write(json.dumps(passage, ensure_ascii=False).encode("utf-8") + b"\n")
+    count = len(offsets)
+    np.save(os.path.join(out_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(out_dir, "vectors.npy"), mode="w+", dtype=np.float16, shape=(count, embedder.dim))
+    with open(passages_path, "r", encoding="utf-8") as f:
+        row = 0
+        for batch in _batched(f, BUILD_BATCH):
+            texts = [json.loads(line)["text"] for line in batch]
+            vectors[row:row + len(texts)] = embedder.embed(texts)
+            row += len(texts)
+    vectors.flush()
+    del vectors
+
+    if ivf_lists:
+        ivf_lists = _write_ivf(out_dir, ivf_lists)
+
+    meta = {"dim": embedder.dim, "count": count, "embedder": embedder.name, "ivf_lists": ivf_lists}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+# ============================================
+# Query
+# ============================================
+
+def _merge_topk(scores: np.ndarray, rows: np.ndarray, best: Tuple[np.ndarray, np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[part], rows[part]
+    all_scores = np.concatenate([best[0], scores])
+    all_rows = np.concatenate([best[1], rows])
+    if len(all_scores) > k:
+        part = np.argpartition(-all_scores, k - 1)[:k]
+        all_scores, all_rows = all_scores[part], all_rows[part]
+    return all_scores, all_rows
+
+
+class BookIndex:
+    """Read-only view over an index directory; arrays are memory-mapped."""
+
+    def __init__(self, index_dir: str, embedder: Optional[HashingEmbedder] = None):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.embedder = embedder or HashingEmbedder(self.meta["dim"])
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        self.passages_path = os.path.join(index_dir, "passages.jsonl")
+        self.centroids = None
+        self.lists = None
+        if self.meta.get("ivf_lists"):
+            self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+            self.lists = np.load(os.path.join(index_dir, "lists.npy"))
+
+    def _scan(self, query: np.ndarray, start: int, stop: int, best: Tuple[np.ndarray, np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        for block_start in range(start, stop, SCAN_BLOCK):
+            block_stop = min(block_start + SCAN_BLOCK, stop)
+            scores = self.vectors[block_start:block_stop].astype(np.float32) @ query
+            best = _merge_topk(scores, np.arange(block_start, block_stop), best, k)
+        return best
+
+    def search_vector(self, query: np.ndarray, k: int = 5, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """Top-k (row, score) for a normalised float32 query vector."""
+        best = (np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64))
+        if self.centroids is None:
+            best = self._scan(query, 0, len(self.vectors), best, k)
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            for list_id in probe:
+                best = self._scan(query, int(self.lists[list_id]), int(self.lists[list_id + 1]), best, k)
+        order = np.argsort(-best[0])
+        return [(int(best[1][i]), float(best[0][i])) for i in order]
+
+    def passage(self, row: int) -> Dict[str, Any]:
+        with open(self.passages_path, "rb") as f:
+            f.seek(int(self.offsets[row]))
+            return json.loads(f.readline())
+
+    def search(self, text: str, k: int = 5, nprobe: int = 8) -> List[Dict[str, Any]]:
+        """
+        Retrieve the k most similar passages for a question.
+
+        Args:
+            text: User question or rewritten retrieval query
+            k: Number of passages
+            nprobe: IVF partitions scanned (ignored for flat indexes)
+
+        Returns:
+            Passages with book, chapter, text and score
+        """
+        query = self.embedder.embed([text])[0]
+        results = []
+        for row, score in self.search_vector(query, k, nprobe):
+            passage = self.passage(row)
+            passage["score"] = round(score, 4)
+            results.append(passage)
+        return results
+
+
+_index: Optional[BookIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index(index_dir: str = INDEX_DIR) -> BookIndex:
+    """Shared lazily-opened index for the API process."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BookIndex(index_dir)
+    return _index
+
+
+def retrieve_sources(question: str, k: int = 5) -> Dict[str, Any]:
+    """Retrieval step for the agent; result is stored as ``TuviMessage.sources``."""
+    passages = get_index().search(question, k)
+    return {
+        "books": [
+            {"book": p["book"], "chapter": p.get("chapter", ""), "excerpt": p["text"][:300], "score": p["score"]}
+            for p in passages
+        ]
+    }
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _synthetic_index(out_dir: str, count: int, dim: int, ivf_lists: int) -> None:
+    """Write ``count`` random unit vectors (deterministic) plus stub passages."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(42)
+    vectors = np.lib.format.open_memmap(
+        os.path.join(out_dir, "vectors.npy"), mode="w+", dtype=np.float16, shape=(count, dim))
+    offsets = np.empty(count, dtype=np.int64)
+    with open(os.path.join(out_dir, "passages.jsonl"), "wb") as f:
+        for start in range(0, count, 100_000):
+            stop = min(start + 100_000, count)
+            block = rng.standard_normal((stop - start, dim), dtype=np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            vectors[start:stop] = block
+            for row in range(start, stop):
+                offsets[row] = f.tell()
+                f.write(b'{"book": "bench", "chapter": "", "text": "passage %d"}\n' % row)
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+    if ivf_lists:
+        ivf_lists = _write_ivf(out_dir, ivf_lists)
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"dim": dim, "count": count, "embedder": "random", "ivf_lists": ivf_lists}, f)
+
+
+def _bench_queries(index: BookIndex, queries: np.ndarray, k: int, nprobe: int) -> Dict[str, float]:
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        index.search_vector(query, k, nprobe)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        "qps": round(1000 * len(latencies) / sum(latencies), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tu Vi book vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from a corpus")
+    build.add_argument("--corpus", required=True)
+    build.add_argument("--out", default=INDEX_DIR)
+    build.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    build.add_argument("--ivf", type=int, default=0, help="IVF partitions (0 = flat)")
+
+    query = sub.add_parser("query", help="Query the index")
+    query.add_argument("text")
+    query.add_argument("--index", default=INDEX_DIR)
+    query.add_argument("--k", type=int, default=5)
+
+    bench = sub.add_parser("bench", help="Query latency on synthetic vectors")
+    bench.add_argument("--passages", type=int, default=1_000_000)
+    bench.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    bench.add_argument("--ivf", type=int, default=1024)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--k", type=int, default=5)
+    bench.add_argument("--dir", default="bench_book_index")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        t0 = time.perf_counter()
+        meta = build_index(read_corpus(args.corpus), args.out, HashingEmbedder(args.dim), args.ivf)
+        print(f"Indexed {meta['count']} passages in {time.perf_counter() - t0:.1f}s -> {args.out}")
+        return
+
+    if args.command == "query":
+        for passage in BookIndex(args.index).search(args.text, args.k):
+            print(f"[{passage['score']:.3f}] {passage['book']} {passage.get('chapter', '')}: {passage['text'][:120]}")
+        return
+
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print("=" * 60)
+    print(f"BOOK INDEX BENCHMARK ({args.passages} passages, dim {args.dim}, float16)")
+    print("=" * 60)
+    flat_dir = os.path.join(args.dir, "flat")
+    t0 = time.perf_counter()
+    _synthetic_index(flat_dir, args.passages, args.dim, 0)
+    print(f"flat build: {time.perf_counter() - t0:.1f}s")
+    print(f"flat scan: {_bench_queries(BookIndex(flat_dir), queries[:20], args.k, 0)}")
+
+    if args.ivf:
+        ivf_dir = os.path.join(args.dir, "ivf")
+        t0 = time.perf_counter()
+        _synthetic_index(ivf_dir, args.passages, args.dim, args.ivf)
+        print(f"ivf build ({args.ivf} lists): {time.perf_counter() - t0:.1f}s")
+        index = BookIndex(ivf_dir)
+        for nprobe in (4, 16, 64):
+            print(f"ivf nprobe={nprobe}: {_bench_queries(index, queries, args.k, nprobe)}")
+
+
+if __name__ == "__main__":
+    main()
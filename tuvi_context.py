@@ -0,0 +1,370 @@
+"""Rolling conversation summary for Tu Vi chat context assembly.
+
+``/chat/message`` used to rebuild the model context from the full
+``TuviConversation.messages`` history, so prompt size grew with every turn.
+Instead the conversation keeps a rolling summary in ``agentState``::
+
+    "summary": {
+        "text": "...",              # compressed history
+        "throughCreateAt": "...",   # createAt of the last TuviMessage folded into text
+        "throughMessageId": 123,    # its id (tiebreak between equal createAt)
+        "tokens": 410,
+        "folds": 7
+    }
+
+Context = system prompt + summary + as many of the last ``KEEP_LAST`` raw
+messages as fit in the token budget. After each turn ``after_turn`` folds
+messages that fell out of the raw window into the summary; only those few
+messages are read, never the whole history.
+
+Benchmark (fake LLM, no database)::
+
+    python tuvi_context.py --turns 10 100 1000
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Optional sibling module, as in database_pg
+try:
+    from tuvi_query_stats import traced
+except ImportError:
+    def traced(fn):
+        return fn
+
+# Raw messages kept verbatim next to the summary
+KEEP_LAST = int(os.getenv("TUVI_CONTEXT_KEEP_LAST", "8"))
+# Token budget for summary + raw messages (system prompt not included)
+BUDGET_TOKENS = int(os.getenv("TUVI_CONTEXT_BUDGET_TOKENS", "3000"))
+# Fold only when this many messages overflow the raw window (amortises LLM calls)
+FOLD_EVERY = int(os.getenv("TUVI_CONTEXT_FOLD_EVERY", "4"))
+# Target size the summarizer is asked to stay under
+SUMMARY_MAX_TOKENS = int(os.getenv("TUVI_CONTEXT_SUMMARY_TOKENS", "600"))
+
+# summarize_fn(previous_summary, messages_to_fold, max_tokens) -> new summary text
+SummarizeFn = Callable[[str, List[Dict[str, Any]], int], str]
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def estimate_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except ImportError:
+    def estimate_tokens(text: str) -> int:
+        """Rough token count; Vietnamese with diacritics averages ~3 chars/token."""
+        return max(1, len(text) // 3)
+
+
+def _message_tokens(message: Dict[str, Any]) -> int:
+    # +4 for role/separators in chat formats
+    return estimate_tokens(message["content"]) + 4
+
+
+def assemble_context(
+    agent_state: Optional[Dict[str, Any]],
+    recent_messages: List[Dict[str, Any]],
+    system_prompt: str,
+    budget_tokens: int = BUDGET_TOKENS,
+) -> List[Dict[str, str]]:
+    """
+    Build model messages from the rolling summary and recent raw messages.
+
+    Newest messages win when the budget is tight; the summary is always kept.
+
+    Args:
+        agent_state: TuviConversation.agentState
+        recent_messages: Last messages in chronological order (role, content)
+        system_prompt: System prompt for the agent
+        budget_tokens: Budget for summary + raw messages
+
+    Returns:
+        List of {"role", "content"} dicts ready for the LLM
+    """
+    summary = (agent_state or {}).get("summary") or {}
+    context = [{"role": "system", "content": system_prompt}]
+    remaining = budget_tokens
+
+    if summary.get("text"):
+        context.append({"role": "system", "content": f"Tóm tắt cuộc trò chuyện trước:\n{summary['text']}"})
+        remaining -= summary.get("tokens") or estimate_tokens(summary["text"])
+
+    kept: List[Dict[str, str]] = []
+    for message in reversed(recent_messages):
+        cost = _message_tokens(message)
+        if cost > remaining and kept:
+            break
+        kept.append({"role": message["role"], "content": message["content"]})
+        remaining -= cost
+    context.extend(reversed(kept))
+    return context
+
+
+def fold_count(unsummarized: int, keep_last: int = KEEP_LAST, fold_every: int = FOLD_EVERY) -> int:
+    """
+    Number of oldest unsummarized messages to fold now.
+
+    Args:
+        unsummarized: Messages after the summary watermark
+        keep_last: Raw messages kept outside the summary
+        fold_every: Minimum overflow before a fold is worth an LLM call
+
+    Returns:
+        0 if the raw window has not overflowed enough yet
+    """
+    overflow = unsummarized - keep_last
+    return overflow if overflow >= fold_every else 0
+
+
+def fold_messages(
+    agent_state: Optional[Dict[str, Any]],
+    to_fold: List[Dict[str, Any]],
+    summarize_fn: SummarizeFn,
+) -> Dict[str, Any]:
+    """
+    Merge messages that left the raw window into the rolling summary.
+
+    Args:
+        agent_state: Current TuviConversation.agentState
+        to_fold: Oldest unsummarized messages, chronological, with id/role/content
+            (and createAt as an ISO string when loaded from the database)
+        summarize_fn: LLM call that merges new messages into the summary
+
+    Returns:
+        New agentState dict (the input is not mutated)
+    """
+    state = dict(agent_state or {})
+    previous = state.get("summary") or {}
+    text = summarize_fn(previous.get("text", ""), to_fold, SUMMARY_MAX_TOKENS)
+    state["summary"] = {
+        "text": text,
+        "throughCreateAt": to_fold[-1].get("createAt"),
+        "throughMessageId": to_fold[-1]["id"],
+        "tokens": estimate_tokens(text),
+        "folds": previous.get("folds", 0) + 1,
+    }
+    return state
+
+
+# ============================================
+# Database wrappers (lasotuvi API)
+# ============================================
+
+# Legacy conversations (no summary yet) are folded in steps of this size
+MAX_FOLD_BATCH = 200
+
+
+def _through_id(agent_state: Optional[Dict[str, Any]]) -> int:
+    return ((agent_state or {}).get("summary") or {}).get("throughMessageId", 0)
+
+
+def _watermark(agent_state: Optional[Dict[str, Any]]) -> Tuple[Optional[str], int]:
+    """(throughCreateAt, throughMessageId) of the summary; createAt is None for older summaries."""
+    summary = (agent_state or {}).get("summary") or {}
+    return summary.get("throughCreateAt"), summary.get("throughMessageId", 0)
+
+
+def _after(watermark: Tuple[Optional[str], int]):
+    """
+    Filter for messages not yet folded, in the (createAt, id) order history is read in.
+
+    Ids are not chronological (sequence values commit out of order, imported
+    rows keep their createAt), so ``id > throughMessageId`` alone can skip or
+    refold messages. Summaries written before throughCreateAt existed fall
+    back to the id.
+    """
+    from sqlalchemy import tuple_
+
+    from database_pg import TuviMessage
+
+    created, through_id = watermark
+    if created is None:
+        return TuviMessage.id > through_id
+    return tuple_(TuviMessage.createAt, TuviMessage.id) > tuple_(datetime.fromisoformat(created), through_id)
+
+
+@traced
+def _load_messages(db, conversation_id: int, watermark: Tuple[Optional[str], int], limit: int,
+                   newest: bool) -> List[Dict[str, Any]]:
+    """Messages after ``watermark`` in chronological order; newest or oldest ``limit`` of them."""
+    from database_pg import TuviMessage
+
+    order = (TuviMessage.createAt.desc(), TuviMessage.id.desc()) if newest else (TuviMessage.createAt, TuviMessage.id)
+    rows = (
+        db.query(TuviMessage.id, TuviMessage.role, TuviMessage.content, TuviMessage.createAt)
+        .filter(TuviMessage.conversationId == conversation_id, _after(watermark))
+        .order_by(*order)
+        .limit(limit)
+        .all()
+    )
+    if newest:
+        rows = list(reversed(rows))
+    return [{"id": r.id, "role": r.role.value, "content": r.content,
+             "createAt": r.createAt.isoformat() if r.createAt else None} for r in rows]
+
+
+def build_context(conversation_id: int, system_prompt: str, budget_tokens: int = BUDGET_TOKENS) -> List[Dict[str, str]]:
+    """
+    Load summary + last KEEP_LAST messages and assemble the model context.
+
+    Args:
+        conversation_id: TuviConversation.id
+        system_prompt: System prompt for the agent
+        budget_tokens: Budget for summary + raw messages
+
+    Returns:
+        List of {"role", "content"} dicts
+    """
+    from database_pg import SessionLocal, TuviConversation, primary_only
+
+    # The user message was just written to the primary; a replica may not have it yet
+    with primary_only():
+        db = SessionLocal()
+        try:
+            conversation = db.query(TuviConversation.agentState).filter(TuviConversation.id == conversation_id).first()
+            agent_state = conversation.agentState if conversation else None
+            # Reads at most the raw window (+ pending fold), served by idx_tuvimsg_convid_created
+            recent = _load_messages(db, conversation_id, _watermark(agent_state), KEEP_LAST + FOLD_EVERY, newest=True)
+            return assemble_context(agent_state, recent, system_prompt, budget_tokens)
+        finally:
+            db.close()
+
+
+def after_turn(conversation_id: int, summarize_fn: SummarizeFn) -> bool:
+    """
+    Update the rolling summary after the assistant reply has been stored.
+
+    The summary is written as a versioned ``set`` patch (tuvi_agent_state),
+    so concurrent agentState changes are kept. After a conflict the patch is
+    retried with the same summary; if another worker folded first, nothing is
+    written.
+
+    Args:
+        conversation_id: TuviConversation.id
+        summarize_fn: LLM call that merges new messages into the summary
+
+    Returns:
+        True if the summary was updated
+    """
+    from sqlalchemy import func
+
+    from database_pg import SessionLocal, TuviMessage, primary_only
+    from tuvi_agent_state import StaleAgentState, transition
+
+    # Summary computed on the first attempt, with the watermark it was folded from
+    folded: Dict[str, Any] = {}
+
+    def plan(state: Dict[str, Any]) -> List[tuple]:
+        watermark = _watermark(state)
+        if folded:
+            # The LLM call is not repeated; a fold from a different base would be stale
+            return [("set", ("summary",), folded["summary"])] if folded["from"] == watermark else []
+        # Same for the assistant reply stored just before this call
+        with primary_only():
+            db = SessionLocal()
+            try:
+                pending = db.query(func.count(TuviMessage.id)).filter(
+                    TuviMessage.conversationId == conversation_id, _after(watermark)).scalar()
+                count = min(fold_count(pending), MAX_FOLD_BATCH)
+                if not count:
+                    return []
+                to_fold = _load_messages(db, conversation_id, watermark, count, newest=False)
+            finally:
+                db.close()
+        folded["from"] = watermark
+        folded["summary"] = fold_messages(state, to_fold, summarize_fn)["summary"]
+        return [("set", ("summary",), folded["summary"])]
+
+    try:
+        state, _ = transition(conversation_id, plan)
+    except StaleAgentState:
+        return False
+    return bool(folded) and folded["from"] == _watermark(state)
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _fake_turns(count: int) -> List[Dict[str, Any]]:
+    messages = []
+    for turn in range(count):
+        messages.append({"id": 2 * turn + 1, "role": "user",
+                         "content": f"Câu hỏi {turn}: năm nay sự nghiệp và tài lộc của tôi thế nào, cung Quan Lộc có sao gì?"})
+        messages.append({"id": 2 * turn + 2, "role": "assistant",
+                         "content": f"Trả lời {turn}: " + "Cung Quan Lộc có Tử Vi, Thiên Phủ đồng cung, công việc ổn định. " * 6})
+    return messages
+
+
+def _fake_summarize(previous: str, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+    # Deterministic stand-in: keep the tail of old summary plus one line per message
+    lines = previous.splitlines() + [f"- {m['role']}: {m['content'][:60]}" for m in messages]
+    text = "\n".join(lines)
+    return text[-max_tokens * 3:]
+
+
+def _llm_ms(prompt_tokens: int, base_ms: float, per_1k_ms: float) -> float:
+    """Latency model for the fake LLM: fixed overhead + prefill cost per 1k tokens."""
+    return base_ms + per_1k_ms * prompt_tokens / 1000
+
+
+def run_benchmark(turns: int, base_ms: float, per_1k_ms: float) -> Dict[str, Any]:
+    system_prompt = "Bạn là chuyên gia Tử Vi. " * 20
+    messages = _fake_turns(turns)
+
+    # Full history (old behaviour)
+    t0 = time.perf_counter()
+    full = [{"role": "system", "content": system_prompt}] + [{"role": m["role"], "content": m["content"]} for m in messages]
+    full_tokens = sum(estimate_tokens(m["content"]) + 4 for m in full)
+    full_assembly_ms = (time.perf_counter() - t0) * 1000
+
+    # Rolling summary maintained turn by turn
+    state: Optional[Dict[str, Any]] = None
+    summarize_calls = 0
+    for turn in range(1, turns + 1):
+        unsummarized = [m for m in messages[:2 * turn] if m["id"] > _through_id(state)]
+        count = fold_count(len(unsummarized))
+        if count:
+            state = fold_messages(state, unsummarized[:count], _fake_summarize)
+            summarize_calls += 1
+
+    through = _through_id(state)
+    t0 = time.perf_counter()
+    recent = [m for m in messages if m["id"] > through][-(KEEP_LAST + FOLD_EVERY):]
+    rolling = assemble_context(state, recent, system_prompt)
+    rolling_tokens = sum(estimate_tokens(m["content"]) + 4 for m in rolling)
+    rolling_assembly_ms = (time.perf_counter() - t0) * 1000
+
+    return {
+        "turns": turns,
+        "full_prompt_tokens": full_tokens,
+        "rolling_prompt_tokens": rolling_tokens,
+        "full_e2e_ms": round(full_assembly_ms + _llm_ms(full_tokens, base_ms, per_1k_ms), 1),
+        "rolling_e2e_ms": round(rolling_assembly_ms + _llm_ms(rolling_tokens, base_ms, per_1k_ms), 1),
+        "summarize_calls": summarize_calls,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt size/latency benchmark for rolling summaries")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--llm-base-ms", type=float, default=300.0, help="Fake LLM fixed latency")
+    parser.add_argument("--llm-per-1k-ms", type=float, default=40.0, help="Fake LLM latency per 1k prompt tokens")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"ROLLING SUMMARY BENCHMARK (keep_last={KEEP_LAST}, budget={BUDGET_TOKENS} tokens)")
+    print("=" * 80)
+    print(f"{'turns':>6} {'full tok':>10} {'rolling tok':>12} {'full ms':>10} {'rolling ms':>11} {'folds':>6}")
+    for turns in args.turns:
+        r = run_benchmark(turns, args.llm_base_ms, args.llm_per_1k_ms)
+        print(f"{r['turns']:>6} {r['full_prompt_tokens']:>10} {r['rolling_prompt_tokens']:>12} "
+              f"{r['full_e2e_ms']:>10} {r['rolling_e2e_ms']:>11} {r['summarize_calls']:>6}")
+
+
+if __name__ == "__main__":
+    main()
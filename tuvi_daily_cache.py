@@ -0,0 +1,315 @@
+"""Two-level cache for Tu Vi daily-fortune answers.
+
+Level 1 holds ``chinese_daily`` tool results per calendar date. They are the
+same for every user, so a single entry serves the whole user base.
+
+Level 2 holds the generated answer per (chart, date). It expires at local
+midnight in the chart's ``timezone``, which is when "today" changes for the
+owner of that chart.
+
+Usage inside the chat handler (``messageType == daily_fortune``)::
+
+    from tuvi_daily_cache import daily_fortune_cache
+
+    tool_result = daily_fortune_cache.get_tool_result(
+        context_date, lambda: call_chinese_daily(context_date))
+    answer = daily_fortune_cache.get_answer(
+        chart["id"], context_date, chart.get("timezone"),
+        lambda: generate_answer(chart, tool_result))
+
+Run ``python tuvi_daily_cache.py`` for a replay benchmark with a fake tool
+and a fake LLM.
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python 3.8 (lasotuvi image)
+    from backports.zoneinfo import ZoneInfo
+
+# Charts created before the chat system have no timezone stored
+DEFAULT_TIMEZONE = "Asia/Ho_Chi_Minh"
+
+# Last place on earth where a given calendar date ends (UTC-12).
+# Tool results for a date stay valid until that date is over everywhere.
+LATEST_TIMEZONE = "Etc/GMT+12"
+
+DEFAULT_MAX_TOOL_ENTRIES = 64
+DEFAULT_MAX_ANSWER_ENTRIES = 50_000
+
+
+def _zone(tz_name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz_name or DEFAULT_TIMEZONE)
+    except Exception:
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _as_date(value: Any) -> date:
+    """Normalise ``contextDate`` (datetime, date or ISO string) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def end_of_day(day: date, tz_name: Optional[str]) -> float:
+    """
+    Epoch seconds of the midnight that ends ``day`` in ``tz_name``.
+
+    Args:
+        day: Calendar date
+        tz_name: IANA timezone name, e.g. "Asia/Ho_Chi_Minh"
+
+    Returns:
+        Unix timestamp of local midnight following ``day``
+    """
+    next_day = day + timedelta(days=1)
+    midnight = datetime(next_day.year, next_day.month, next_day.day, tzinfo=_zone(tz_name))
+    return midnight.timestamp()
+
+
+def local_today(tz_name: Optional[str], now: Optional[float] = None) -> date:
+    """Current calendar date in the chart's timezone."""
+    ts = time.time() if now is None else now
+    return datetime.fromtimestamp(ts, tz=_zone(tz_name)).date()
+
+
+class _ExpiringLRU:
+    """Size-bounded LRU map whose entries carry an absolute expiry time."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, now: float) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        stale = [key for key in self._data if predicate(key)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class DailyFortuneCache:
+    """
+    Process-local cache for daily-fortune tool data and answers.
+
+    Loaders are called outside the lock, so a slow LLM call never blocks
+    lookups for other charts. Two concurrent misses on the same key may both
+    call the loader; the second result simply overwrites the first.
+    """
+
+    def __init__(
+        self,
+        max_tool_entries: int = DEFAULT_MAX_TOOL_ENTRIES,
+        max_answer_entries: int = DEFAULT_MAX_ANSWER_ENTRIES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._tools = _ExpiringLRU(max_tool_entries)
+        self._answers = _ExpiringLRU(max_answer_entries)
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def get_tool_result(self, context_date: Any, loader: Callable[[], Any], tool: str = "chinese_daily") -> Any:
+        """
+        Get the shared tool result for a date, calling ``loader`` on a miss.
+
+        Args:
+            context_date: ``TuviMessage.contextDate`` (datetime, date or ISO string)
+            loader: Zero-argument callable that invokes the tool
+            tool: Tool name recorded in ``toolCalls``
+
+        Returns:
+            Tool result (cached or fresh)
+        """
+        day = _as_date(context_date)
+        key = (tool, day)
+        now = self._clock()
+        with self._lock:
+            found, value = self._tools.get(key, now)
+        if found:
+            return value
+
+        value = loader()
+        with self._lock:
+            self._tools.put(key, value, end_of_day(day, LATEST_TIMEZONE))
+        return value
+
+    def get_answer(
+        self,
+        chart_id: int,
+        context_date: Any,
+        timezone: Optional[str],
+        loader: Callable[[], Any],
+        chart_version: Any = None,
+    ) -> Any:
+        """
+        Get the generated answer for a chart and date, calling ``loader`` on a miss.
+
+        Args:
+            chart_id: TuviChart.id
+            context_date: ``TuviMessage.contextDate``
+            timezone: ``TuviChart.timezone`` (None falls back to Vietnam time)
+            loader: Zero-argument callable that produces the answer (LLM call)
+            chart_version: Optional ``TuviChart.updatedAt`` so edited charts miss
+
+        Returns:
+            Answer (cached or fresh)
+        """
+        day = _as_date(context_date)
+        key = (chart_id, day, chart_version)
+        now = self._clock()
+        with self._lock:
+            found, value = self._answers.get(key, now)
+        if found:
+            return value
+
+        value = loader()
+        expires_at = end_of_day(local_today(timezone, now), timezone)
+        # Questions about another day still roll over with the owner's "today"
+        with self._lock:
+            self._answers.put(key, value, expires_at)
+        return value
+
+    def invalidate_chart(self, chart_id: int) -> int:
+        """Drop all cached answers for a chart (call after chart edits/deletes)."""
+        with self._lock:
+            return self._answers.invalidate(lambda key: key[0] == chart_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tools = _ExpiringLRU(self._tools.max_entries)
+            self._answers = _ExpiringLRU(self._answers.max_entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for both levels (suitable for a /health payload)."""
+        with self._lock:
+            return {"tool_results": self._tools.stats(), "answers": self._answers.stats()}
+
+
+# Shared instance for the API process
+daily_fortune_cache = DailyFortuneCache()
+
+
+# ============================================
+# Replay benchmark
+# ============================================
+
+def _synthetic_log(users: int, requests: int, days: int, seed: int) -> List[Tuple[int, date, str]]:
+    """(chart_id, context_date, timezone) tuples; most users ask about today."""
+    rng = random.Random(seed)
+    zones = ["Asia/Ho_Chi_Minh", "Asia/Ho_Chi_Minh", "Asia/Ho_Chi_Minh", "Asia/Tokyo", "Europe/Berlin", "America/Los_Angeles"]
+    chart_zones = {chart_id: rng.choice(zones) for chart_id in range(1, users + 1)}
+    today = date.today()
+    log = []
+    for _ in range(requests):
+        # Skewed popularity: a minority of users ask most of the questions
+        chart_id = min(int(rng.paretovariate(1.2)), users)
+        offset = 0 if rng.random() < 0.85 else rng.randrange(1, days)
+        log.append((chart_id, today + timedelta(days=offset), chart_zones[chart_id]))
+    return log
+
+
+def run_replay(log: List[Tuple[int, date, str]], tool_ms: float, llm_ms: float, use_cache: bool) -> Dict[str, Any]:
+    counters = {"tool_calls": 0, "llm_calls": 0}
+    cache = DailyFortuneCache()
+
+    def call_tool(day: date) -> Dict[str, Any]:
+        counters["tool_calls"] += 1
+        time.sleep(tool_ms / 1000)
+        return {"date": day.isoformat(), "can_chi": "Giáp Thìn"}
+
+    def call_llm(chart_id: int, tool_result: Dict[str, Any]) -> str:
+        counters["llm_calls"] += 1
+        time.sleep(llm_ms / 1000)
+        return f"Vận hạn ngày {tool_result['date']} cho lá số {chart_id}"
+
+    latencies = []
+    started = time.perf_counter()
+    for chart_id, day, tz_name in log:
+        t0 = time.perf_counter()
+        if use_cache:
+            tool_result = cache.get_tool_result(day, lambda: call_tool(day))
+            cache.get_answer(chart_id, day, tz_name, lambda: call_llm(chart_id, tool_result))
+        else:
+            call_llm(chart_id, call_tool(day))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "requests": len(log),
+        "tool_calls": counters["tool_calls"],
+        "llm_calls": counters["llm_calls"],
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        "wall_s": round(elapsed, 3),
+    }
+    if use_cache:
+        result["cache"] = cache.stats()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay benchmark for the daily-fortune cache")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=3, help="Spread of contextDate values")
+    parser.add_argument("--tool-ms", type=float, default=1.0, help="Fake chinese_daily latency")
+    parser.add_argument("--llm-ms", type=float, default=2.0, help="Fake LLM latency")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    log = _synthetic_log(args.users, args.requests, args.days, args.seed)
+    baseline = run_replay(log, args.tool_ms, args.llm_ms, use_cache=False)
+    cached = run_replay(log, args.tool_ms, args.llm_ms, use_cache=True)
+
+    print("=" * 60)
+    print("DAILY FORTUNE CACHE REPLAY")
+    print("=" * 60)
+    for label, result in (("no cache", baseline), ("cached", cached)):
+        print(f"\n{label}:")
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+    print(f"\nLLM calls avoided: {1 - cached['llm_calls'] / baseline['llm_calls']:.1%}")
+    print(f"Mean latency reduction: {1 - cached['mean_ms'] / baseline['mean_ms']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""JSON encode/decode hooks for the lasotuvi JSON columns.
+
+``database_pg`` passes these to ``create_engine(json_serializer=...,
+json_deserializer=...)`` so ``houses``, ``toolCalls``, ``sources`` and
+``agentState`` go through orjson instead of the stdlib ``json`` module.
+
+Select the backend with ``TUVI_JSON_BACKEND`` (``orjson`` or ``stdlib``).
+Without orjson installed, or for values orjson rejects (integers beyond 64
+bits, str/int subclasses), the stdlib encoder is used. Both stay as strict as
+SQLAlchemy's default ``json.dumps``: datetimes, Decimals, sets and other
+non-JSON values raise TypeError instead of being stringified.
+"""
+
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = os.getenv("TUVI_JSON_BACKEND", "orjson" if orjson else "stdlib")
+if JSON_BACKEND == "orjson" and orjson is None:
+    JSON_BACKEND = "stdlib"
+
+# Passthrough: hand datetimes/dataclasses to the stdlib encoder, which rejects them like before
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                   | orjson.OPT_PASSTHROUGH_SUBCLASS) if orjson else 0
+
+
+def stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def stdlib_loads(data: Union[str, bytes]) -> Any:
+    return json.loads(data)
+
+
+def orjson_dumps(obj: Any) -> str:
+    try:
+        # Drivers expect str for JSON parameters
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+    except TypeError:
+        return stdlib_dumps(obj)
+
+
+def orjson_loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data)
+
+
+if JSON_BACKEND == "orjson":
+    json_dumps, json_loads = orjson_dumps, orjson_loads
+else:
+    json_dumps, json_loads = stdlib_dumps, stdlib_loads
@@ -0,0 +1,315 @@
+"""Hourly latency rollups from TuviMessage.processingTime.
+
+``run`` folds new TuviMessage rows (by createAt, past a watermark) into
+TuviLatencyRollup: one LatencySketch per (UTC hour, messageType). The bin
+index ``ceil(ln(ms) / ln(gamma))`` is computed in SQL and rows are grouped by
+(hour, type, bin) there, so Python receives a few hundred rows per batch no
+matter how many messages it covers. Sketches for touched hours are merged
+with the stored ones and the watermark advances in the same transaction.
+
+Questions are answered by merging at most 24 sketches per day per type,
+never scanning raw rows::
+
+    python tuvi_latency_rollup.py run
+    python tuvi_latency_rollup.py query --type question --days 7 --quantiles 0.5 0.99
+    python tuvi_latency_rollup.py query --days 1 --by-hour
+
+Run ``run`` every few minutes (cron, next to tuvi_partitions.py maintain).
+Rows younger than ``--settle`` seconds are left for the next run so rows
+whose transactions commit late are not skipped. Rows inserted with a
+``createAt`` already behind the watermark (backdated rows, tuvi_copy.py
+imports) are not picked up; refold those hours with ``run --rewind``::
+
+    python tuvi_latency_rollup.py run --rewind 2026-09-01T00:00
+
+Benchmark (seeds messages server-side, then times a full rollup)::
+
+    DATABASE_URL=... python tuvi_latency_rollup.py bench --messages 50000000
+"""
+
+import argparse
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database_pg import TuviLatencyRollup, TuviRollupWatermark, engine, init_db
+from latency_sketch import DEFAULT_RELATIVE_ACCURACY, MIN_VALUE, LatencySketch
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "latency_rollup"
+NO_TYPE = "-"
+
+_BINNED_SQL = text("""
+    SELECT date_trunc('hour', "createAt") AS hour,
+           COALESCE("messageType"::text, :no_type) AS message_type,
+           CASE WHEN "processingTime" <= :min_value THEN NULL
+                ELSE ceil(ln("processingTime") / :ln_gamma)::integer END AS bin,
+           count(*) AS n,
+           sum("processingTime") AS total,
+           min("processingTime") AS lo,
+           max("processingTime") AS hi
+    FROM "TuviMessage"
+    WHERE "createAt" >= :start AND "createAt" < :end AND "processingTime" IS NOT NULL
+    GROUP BY 1, 2, 3
+""")
+
+
+def _cutoff(conn, settle: float) -> datetime:
+    return conn.execute(text("SELECT timezone('utc', now()) - make_interval(secs => :settle)"),
+                        {"settle": settle}).scalar()
+
+
+def _batch_end(conn, start: datetime, cutoff: datetime, batch_size: int) -> datetime:
+    """createAt closing a window of about ``batch_size`` rows from ``start`` (uses the createAt index)."""
+    row = conn.execute(text("""
+        SELECT "createAt" FROM "TuviMessage"
+        WHERE "createAt" >= :start AND "createAt" < :cutoff
+        ORDER BY "createAt" OFFSET :n LIMIT 1
+    """), {"start": start, "cutoff": cutoff, "n": batch_size}).first()
+    if row is None:
+        return cutoff
+    # More than batch_size rows share ``start``: take them all rather than stall
+    return max(row[0], start + timedelta(microseconds=1))
+
+
+def _fold_batch(conn, start: datetime, end: datetime, accuracy: float) -> Tuple[int, int]:
+    """Merge rows with createAt in [start, end) into the rollup; returns (messages, hour buckets touched)."""
+    ln_gamma = LatencySketch(accuracy).ln_gamma
+    groups: Dict[Tuple[datetime, str], List[Any]] = defaultdict(list)
+    for row in conn.execute(_BINNED_SQL, {"no_type": NO_TYPE, "min_value": MIN_VALUE, "ln_gamma": ln_gamma,
+                                          "start": start, "end": end}):
+        groups[(row.hour, row.message_type)].append(row)
+    if not groups:
+        return 0, 0
+
+    rollup = TuviLatencyRollup.__table__
+    hours = sorted({hour for hour, _ in groups})
+    existing = {
+        (r.bucketStart, r.messageType): LatencySketch.from_bytes(r.sketch)
+        for r in conn.execute(
+            rollup.select().where(rollup.c.bucketStart.in_(hours)).with_for_update()
+        )
+    }
+
+    values, messages = [], 0
+    for key, rows in groups.items():
+        sketch = LatencySketch(accuracy)
+        sketch.add_bins(((r.bin, r.n) for r in rows), sum(r.total for r in rows),
+                        min(r.lo for r in rows), max(r.hi for r in rows))
+        messages += sketch.count
+        if key in existing:
+            sketch.merge(existing[key])
+        values.append({"bucketStart": key[0], "messageType": key[1], "count": sketch.count,
+                       "sumMs": sketch.sum, "sketch": sketch.to_bytes(), "updateAt": datetime.utcnow()})
+
+    stmt = pg_insert(rollup).values(values)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=["bucketStart", "messageType"],
+        set_={"count": stmt.excluded["count"], "sumMs": stmt.excluded.sumMs,
+              "sketch": stmt.excluded.sketch, "updateAt": stmt.excluded.updateAt},
+    ))
+    return messages, len(values)
+
+
+def run(batch_size: int = 2_000_000, settle: float = 300, accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> Dict[str, Any]:
+    """
+    Fold every settled TuviMessage past the watermark into TuviLatencyRollup.
+
+    Args:
+        batch_size: Approximate messages per transaction
+        settle: Skip rows younger than this many seconds
+        accuracy: Sketch relative accuracy (must stay the same across runs)
+
+    Returns:
+        Messages folded, batches, elapsed seconds and the new watermark
+    """
+    watermark = TuviRollupWatermark.__table__
+    started = time.perf_counter()
+    messages = batches = 0
+
+    with engine.begin() as conn:
+        conn.execute(pg_insert(watermark).values(name=WATERMARK, lastCreateAt=datetime(1970, 1, 1),
+                                                 updateAt=datetime.utcnow())
+                     .on_conflict_do_nothing(index_elements=["name"]))
+        cutoff = _cutoff(conn, settle)
+
+    while True:
+        with engine.begin() as conn:
+            # Row lock: a concurrent run waits here instead of double counting
+            last = conn.execute(watermark.select().where(watermark.c.name == WATERMARK)
+                                .with_for_update()).first().lastCreateAt
+            if last >= cutoff:
+                break
+            end = _batch_end(conn, last, cutoff, batch_size)
+            folded, buckets = _fold_batch(conn, last, end, accuracy)
+            conn.execute(watermark.update().where(watermark.c.name == WATERMARK)
+                         .values(lastCreateAt=end, updateAt=datetime.utcnow()))
+        messages += folded
+        batches += 1
+        logger.info("Folded %s messages into %s hour buckets (createAt < %s)", folded, buckets, end)
+
+    return {"messages": messages, "batches": batches, "watermark": cutoff.isoformat(),
+            "elapsed_s": round(time.perf_counter() - started, 2)}
+
+
+def rewind(since: datetime) -> None:
+    """Drop rollups from the hour of ``since`` on and move the watermark back, so the next run refolds them."""
+    hour = since.replace(minute=0, second=0, microsecond=0)
+    watermark = TuviRollupWatermark.__table__
+    rollup = TuviLatencyRollup.__table__
+    with engine.begin() as conn:
+        last = conn.execute(watermark.select().where(watermark.c.name == WATERMARK).with_for_update()).first()
+        if last is None or last.lastCreateAt <= hour:
+            return
+        conn.execute(rollup.delete().where(rollup.c.bucketStart >= hour))
+        conn.execute(watermark.update().where(watermark.c.name == WATERMARK)
+                     .values(lastCreateAt=hour, updateAt=datetime.utcnow()))
+
+
+def latency_percentiles(
+    message_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+    by_hour: bool = False,
+) -> Any:
+    """
+    Percentiles of processingTime (ms) from the rollup.
+
+    Args:
+        message_type: MessageTypeEnum name, or None for all types
+        since: UTC start (default: 7 days ago)
+        until: UTC end, exclusive (default: now)
+        quantiles: Quantiles in 0..1
+        by_hour: Return one summary per hour instead of one overall
+
+    Returns:
+        Summary dict (count, mean, min, max, pXX), or a list of them with "hour"
+    """
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=7)
+    rollup = TuviLatencyRollup.__table__
+    query = rollup.select().where(rollup.c.bucketStart >= since, rollup.c.bucketStart < until)
+    if message_type is not None:
+        query = query.where(rollup.c.messageType == message_type)
+
+    per_hour: Dict[datetime, LatencySketch] = {}
+    with engine.connect() as conn:
+        for row in conn.execute(query.order_by(rollup.c.bucketStart)):
+            sketch = LatencySketch.from_bytes(row.sketch)
+            if row.bucketStart in per_hour:
+                per_hour[row.bucketStart].merge(sketch)
+            else:
+                per_hour[row.bucketStart] = sketch
+
+    if by_hour:
+        return [dict(hour=hour.isoformat(), **sketch.summary(quantiles)) for hour, sketch in per_hour.items()]
+    total = LatencySketch(next(iter(per_hour.values())).relative_accuracy) if per_hour else LatencySketch()
+    for sketch in per_hour.values():
+        total.merge(sketch)
+    return total.summary(quantiles)
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _seed(messages: int, days: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO "TuviChart" ("userId", payload, houses, extra, "createdAt", "updatedAt") '
+                          "VALUES (999004, '{}', '[]', '{}', now(), now())"))
+        chart_id = conn.execute(text('SELECT max(id) FROM "TuviChart"')).scalar()
+        conn.execute(text('INSERT INTO "TuviConversation" ("userId", "chartId", title) '
+                          "SELECT 999004, :chart, 'bench ' || g FROM generate_series(1, 1000) g"), {"chart": chart_id})
+        first_conv = conn.execute(text('SELECT min(id) FROM "TuviConversation" WHERE "chartId" = :c'),
+                                  {"c": chart_id}).scalar()
+    # Lognormal processingTime (Box-Muller), spread over ``days``, in 5M-row statements
+    for start in range(0, messages, 5_000_000):
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO "TuviMessage" ("conversationId", role, content, "messageType", "processingTime", "createAt")
+                SELECT :first + g % 1000, 'assistant'::messageroleenum, 'bench',
+                       (ARRAY['question', 'question', 'question', 'daily_fortune', 'initial_analysis'])[1 + g % 5]::messagetypeenum,
+                       exp(7.3 + 0.5 * sqrt(-2 * ln(1 - random())) * cos(2 * pi() * random())),
+                       timezone('utc', now()) - make_interval(secs => 600 + random() * :span)
+                FROM generate_series(:lo, :hi) g
+            """), {"first": first_conv, "lo": start + 1, "hi": min(start + 5_000_000, messages),
+                   "span": days * 86400})
+
+
+def bench(messages: int, days: int, batch_size: int) -> None:
+    init_db()
+    _seed(messages, days)
+    with engine.begin() as conn:
+        conn.execute(text('DELETE FROM "TuviLatencyRollup"'))
+        conn.execute(text('DELETE FROM "TuviRollupWatermark" WHERE name = :n'), {"n": WATERMARK})
+
+    print("=" * 70)
+    print(f"LATENCY ROLLUP ({messages:,} messages over {days} days)")
+    print("=" * 70)
+    result = run(batch_size=batch_size, settle=0)
+    print(f"full rollup: {result['messages']:,} messages in {result['elapsed_s']}s "
+          f"({result['messages'] / max(result['elapsed_s'], 1e-9):,.0f} rows/s, {result['batches']} batches)")
+    print(f"incremental run with nothing new: {run(settle=0)['elapsed_s']}s")
+
+    since = datetime.utcnow() - timedelta(days=7)
+    t0 = time.perf_counter()
+    summary = latency_percentiles("question", since, quantiles=(0.5, 0.99))
+    rollup_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        exact = conn.execute(text("""
+            SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY "processingTime"),
+                   percentile_cont(0.99) WITHIN GROUP (ORDER BY "processingTime")
+            FROM "TuviMessage" WHERE "messageType" = 'question' AND "createAt" >= :since
+        """), {"since": since}).first()
+    raw_ms = (time.perf_counter() - t0) * 1000
+    print(f"p50/p99 question, last 7 days: rollup {summary['p50']:.1f}/{summary['p99']:.1f} ms in {rollup_ms:.1f} ms; "
+          f"raw scan {exact[0]:.1f}/{exact[1]:.1f} ms in {raw_ms:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TuviMessage latency rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="Fold new messages into the hourly rollup")
+    r.add_argument("--batch-size", type=int, default=2_000_000)
+    r.add_argument("--settle", type=float, default=300, help="Seconds before a message is rolled up")
+    r.add_argument("--rewind", type=datetime.fromisoformat, metavar="UTC_TIME",
+                   help="Refold hours from this time on first (after backdated inserts or imports)")
+
+    q = sub.add_parser("query", help="Percentiles from the rollup")
+    q.add_argument("--type", dest="message_type", help="messageType (default: all)")
+    q.add_argument("--days", type=float, default=7)
+    q.add_argument("--quantiles", type=float, nargs="+", default=[0.5, 0.9, 0.99])
+    q.add_argument("--by-hour", action="store_true")
+
+    b = sub.add_parser("bench")
+    b.add_argument("--messages", type=int, default=50_000_000)
+    b.add_argument("--days", type=int, default=90)
+    b.add_argument("--batch-size", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "run":
+        init_db()
+        if args.rewind:
+            rewind(args.rewind)
+        print(run(args.batch_size, args.settle))
+    elif args.command == "query":
+        since = datetime.utcnow() - timedelta(days=args.days)
+        result = latency_percentiles(args.message_type, since, quantiles=args.quantiles, by_hour=args.by_hour)
+        for item in (result if args.by_hour else [result]):
+            print(item)
+    else:
+        bench(args.messages, args.days, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Monthly range partitioning and retention for TuviMessage.
+
+TuviMessage grows without bound and every history query goes through one big
+heap and ``idx_tuvimsg_convid_created``. This module:
+
+- ``migrate``: rebuilds TuviMessage as ``PARTITION BY RANGE ("createAt")``
+  with one partition per month plus a DEFAULT partition, copying rows in id
+  batches while a trigger logs the ids written meanwhile; under a short lock
+  at the end the logged ids are re-copied and the tables swapped
+- ``maintain``: creates upcoming monthly partitions and applies retention:
+  partitions older than ``--keep-months`` are detached, exported with COPY to
+  a gzip CSV plus manifest, and only then dropped (no bulk DELETEs)
+- ``bench``: insert throughput and recent-history latency, plain vs partitioned
+
+Run ``maintain`` daily (cron or the scheduler used for the precompute job)::
+
+    python tuvi_partitions.py maintain --months-ahead 3 --keep-months 18 --archive-dir /root/archive/tuvimsg
+
+Partitioned tables need the partition key in the primary key, so the
+migrated table's key is ("id", "createAt"); ids still come from the original
+sequence. The Prisma schema should declare the composite key before the next
+``prisma migrate`` or it will try to revert it.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from database_pg import engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = "TuviMessage"
+DEFAULT_PARTITION = f"{TABLE}_pdefault"
+CHANGE_LOG = f"{TABLE}_migrate_log"
+PARTITION_RE = re.compile(r"^TuviMessage_p(\d{4})_(\d{2})$")
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _create_partition_sql(parent: str, month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{parent}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+    )
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name)"), {"name": TABLE}).scalar())
+
+
+def list_partitions(conn) -> List[Tuple[str, date]]:
+    """(partition name, month) for attached monthly partitions, oldest first."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"), {"name": TABLE}).scalars().all()
+    result = []
+    for name in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            result.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(result, key=lambda item: item[1])
+
+
+# ============================================
+# Migration
+# ============================================
+
+def migrate(batch_size: int = 50_000, months_ahead: int = 3) -> Dict[str, Any]:
+    """
+    Convert TuviMessage to a monthly partitioned table.
+
+    Rows are copied in id batches while the old table keeps serving traffic.
+    A trigger installed before the copy logs the id of every row inserted,
+    updated or deleted meanwhile; the final step, under an exclusive lock,
+    replaces exactly those ids from the old table and renames.
+
+    Args:
+        batch_size: Rows copied per transaction
+        months_ahead: Future partitions created up front
+
+    Returns:
+        Migration statistics
+    """
+    # Partitions get their final names (TuviMessage_pYYYY_MM) right away
+    new = f"{TABLE}_partitioned"
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            return {"status": "already partitioned"}
+        conn.execute(text(f'DROP TABLE IF EXISTS "{new}", "{CHANGE_LOG}"'))
+        # CREATE TRIGGER waits for in-flight writers, so every write not visible
+        # to the batch copy below is logged
+        conn.execute(text(f'CREATE UNLOGGED TABLE "{CHANGE_LOG}" (id bigint NOT NULL)'))
+        conn.execute(text(
+            f'CREATE OR REPLACE FUNCTION "{CHANGE_LOG}_fn"() RETURNS trigger LANGUAGE plpgsql AS $$ '
+            f'BEGIN INSERT INTO "{CHANGE_LOG}" VALUES (CASE WHEN TG_OP = \'DELETE\' THEN OLD.id ELSE NEW.id END); '
+            f'IF TG_OP = \'UPDATE\' AND OLD.id <> NEW.id THEN INSERT INTO "{CHANGE_LOG}" VALUES (OLD.id); END IF; '
+            f'RETURN NULL; END $$'))
+        conn.execute(text(f'DROP TRIGGER IF EXISTS "{CHANGE_LOG}_trg" ON "{TABLE}"'))
+        conn.execute(text(
+            f'CREATE TRIGGER "{CHANGE_LOG}_trg" AFTER INSERT OR UPDATE OR DELETE ON "{TABLE}" '
+            f'FOR EACH ROW EXECUTE FUNCTION "{CHANGE_LOG}_fn"()'))
+
+        bounds = conn.execute(text(f'SELECT min("createAt"), max(id) FROM "{TABLE}"')).first()
+        conn.execute(text(f'UPDATE "{TABLE}" SET "createAt" = timezone(\'utc\', now()) WHERE "createAt" IS NULL'))
+        # LIKE ... INCLUDING DEFAULTS keeps nextval() on the existing id sequence
+        conn.execute(text(
+            f'CREATE TABLE "{new}" (LIKE "{TABLE}" INCLUDING DEFAULTS) PARTITION BY RANGE ("createAt")'))
+        conn.execute(text(f'ALTER TABLE "{new}" ALTER COLUMN "createAt" SET NOT NULL'))
+        conn.execute(text(f'ALTER TABLE "{new}" ALTER COLUMN "createAt" SET DEFAULT timezone(\'utc\', now())'))
+        conn.execute(text(f'ALTER TABLE "{new}" ADD PRIMARY KEY (id, "createAt")'))
+
+        first = _month_start((bounds[0] or datetime.utcnow()).date())
+        last = _month_start(date.today(), months_ahead)
+        month = first
+        while month <= last:
+            conn.execute(text(_create_partition_sql(new, month)))
+            month = _month_start(month, 1)
+        # Rows outside the monthly ranges (clock skew, maintain not run) land here
+        # instead of failing the insert; ensure_partitions refuses to proceed
+        # while it is non-empty
+        conn.execute(text(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{new}" DEFAULT'))
+        # Index and FK exist before the copy so the final locked step stays short
+        # (NOT VALID foreign keys are not supported on partitioned tables)
+        conn.execute(text(
+            f'CREATE INDEX idx_tuvimsg_convid_created_p ON "{new}" ("conversationId", "createAt")'))
+        conn.execute(text(
+            f'ALTER TABLE "{new}" ADD CONSTRAINT "TuviMessage_conversationId_part_fkey" '
+            f'FOREIGN KEY ("conversationId") REFERENCES "TuviConversation"(id) ON DELETE CASCADE'))
+
+    max_id = bounds[1] or 0
+    copied, last_id = 0, 0
+    started = time.perf_counter()
+    while last_id < max_id:
+        with engine.begin() as conn:
+            result = conn.execute(text(
+                f'INSERT INTO "{new}" SELECT * FROM "{TABLE}" WHERE id > :lo AND id <= :hi'),
+                {"lo": last_id, "hi": last_id + batch_size})
+            copied += result.rowcount
+        last_id += batch_size
+        logger.info("Copied %s rows (id <= %s)", copied, last_id)
+
+    with engine.begin() as conn:
+        conn.execute(text(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE'))
+        conn.execute(text(f'UPDATE "{TABLE}" SET "createAt" = timezone(\'utc\', now()) WHERE "createAt" IS NULL'))
+        # Rows written during the copy: drop whatever was copied for those ids
+        # and take the current version (if any) from the old table
+        changed = f'SELECT DISTINCT id FROM "{CHANGE_LOG}"'
+        removed = conn.execute(text(f'DELETE FROM "{new}" WHERE id IN ({changed})')).rowcount
+        result = conn.execute(text(f'INSERT INTO "{new}" SELECT * FROM "{TABLE}" WHERE id IN ({changed})'))
+        copied += result.rowcount - removed
+        expected = conn.execute(text(f'SELECT count(*) FROM "{TABLE}"')).scalar()
+        if copied != expected:
+            raise RuntimeError(f"Row count mismatch after catch-up: {copied} copied, {expected} in {TABLE}")
+        conn.execute(text(f'DROP TRIGGER "{CHANGE_LOG}_trg" ON "{TABLE}"'))
+        conn.execute(text(f'DROP FUNCTION "{CHANGE_LOG}_fn"()'))
+        conn.execute(text(f'DROP TABLE "{CHANGE_LOG}"'))
+        # Move sequence ownership so dropping the old table later keeps the id sequence
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": f'"{TABLE}"'}).scalar()
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{new}".id'))
+        conn.execute(text(f'ALTER TABLE "{TABLE}" RENAME TO "{TABLE}_unpartitioned"'))
+        conn.execute(text(f'ALTER TABLE "{new}" RENAME TO "{TABLE}"'))
+
+    return {"status": "migrated", "rows": copied, "elapsed_s": round(time.perf_counter() - started, 1),
+            "old_table": f"{TABLE}_unpartitioned"}
+
+
+# ============================================
+# Maintenance
+# ============================================
+
+def ensure_partitions(months_ahead: int = 3, today: Optional[date] = None) -> List[str]:
+    """
+    Create partitions for the current month and the next ``months_ahead``.
+
+    Raises RuntimeError if the DEFAULT partition holds rows: they were written
+    outside every monthly range and must be moved into a proper partition
+    (which Postgres refuses to create over them) before maintenance continues.
+    """
+    today = today or date.today()
+    created = []
+    with engine.begin() as conn:
+        stray = conn.execute(text(
+            f'SELECT count(*), min("createAt"), max("createAt") FROM "{DEFAULT_PARTITION}"')).first()
+        if stray[0]:
+            logger.error("%s holds %s rows (%s .. %s)", DEFAULT_PARTITION, stray[0], stray[1], stray[2])
+            raise RuntimeError(f"{DEFAULT_PARTITION} holds {stray[0]} rows outside the monthly partitions")
+        existing = {name for name, _ in list_partitions(conn)}
+        for offset in range(months_ahead + 1):
+            month = _month_start(today, offset)
+            if partition_name(month) not in existing:
+                conn.execute(text(_create_partition_sql(TABLE, month)))
+                created.append(partition_name(month))
+    return created
+
+
+def _archive_partition(name: str, archive_dir: str) -> Dict[str, Any]:
+    """COPY a detached partition to <archive_dir>/<name>.csv.gz and write a manifest."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    tmp_path = path + ".tmp"
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+        cursor.execute(f'SELECT count(*) FROM "{name}"')
+        rows = cursor.fetchone()[0]
+        raw.commit()
+    finally:
+        raw.close()
+
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    manifest = {"partition": name, "rows": rows, "file": os.path.basename(path), "sha256": digest.hexdigest(),
+                "bytes": os.path.getsize(path), "archived_at": datetime.utcnow().isoformat()}
+    with open(os.path.join(archive_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def apply_retention(keep_months: int, archive_dir: str, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Detach, archive and drop partitions that ended more than ``keep_months`` ago.
+
+    A partition is dropped only after its archive and manifest are on disk; if
+    archiving fails it stays detached for a later retry.
+    """
+    cutoff = _month_start(today or date.today(), -keep_months)
+    archived = []
+    with engine.begin() as conn:
+        expired = [name for name, month in list_partitions(conn) if month < cutoff]
+        for name in expired:
+            conn.execute(text(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"'))
+
+    # Includes partitions detached by an earlier run that failed to archive
+    with engine.connect() as conn:
+        detached = conn.execute(text(
+            "SELECT relname FROM pg_class WHERE relname ~ :pattern AND relkind = 'r' AND NOT relispartition"),
+            {"pattern": PARTITION_RE.pattern}).scalars().all()
+
+    for name in detached:
+        try:
+            manifest = _archive_partition(name, archive_dir)
+        except Exception as e:
+            logger.error("Archiving %s failed, leaving it detached: %s", name, e)
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        archived.append(manifest)
+    return archived
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def bench(rows: int, conversations: int, months: int, insert_rows: int) -> None:
+    """
+    Plain vs partitioned copies of TuviMessage-shaped tables seeded server-side.
+
+    Uses standalone tables (bench_msg_plain / bench_msg_part) so it can run on
+    any scratch database.
+    """
+    today = date.today()
+    first = _month_start(today, -months + 1)
+    span_seconds = (datetime.utcnow() - datetime(first.year, first.month, 1)).total_seconds()
+    columns = ('id bigserial, "conversationId" integer NOT NULL, role text NOT NULL, content text NOT NULL, '
+               '"createAt" timestamp NOT NULL')
+    seed = (
+        'INSERT INTO {table} ("conversationId", role, content, "createAt") '
+        "SELECT (random() * :convs)::int, CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END, "
+        "'Cung Quan Lộc có Tử Vi, Thiên Phủ đồng cung, công việc ổn định.', "
+        "timezone('utc', now()) - (random() * :span) * interval '1 second' "
+        "FROM generate_series(1, :n) g"
+    )
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_msg_plain, bench_msg_part"))
+        conn.execute(text(f"CREATE TABLE bench_msg_plain ({columns}, PRIMARY KEY (id))"))
+        conn.execute(text(f'CREATE TABLE bench_msg_part ({columns}, PRIMARY KEY (id, "createAt")) '
+                          'PARTITION BY RANGE ("createAt")'))
+        month = first
+        while month <= _month_start(today, 1):
+            conn.execute(text(
+                f'CREATE TABLE bench_msg_part_{month:%Y_%m} PARTITION OF bench_msg_part '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"))
+            month = _month_start(month, 1)
+
+    print("=" * 70)
+    print(f"TUVIMESSAGE PARTITIONING ({rows:,} rows over {months} months)")
+    print("=" * 70)
+    for table in ("bench_msg_plain", "bench_msg_part"):
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            for done in range(0, rows, 1_000_000):
+                conn.execute(text(seed.format(table=table)),
+                             {"convs": conversations, "span": span_seconds, "n": min(1_000_000, rows - done)})
+            conn.execute(text(f'CREATE INDEX ON {table} ("conversationId", "createAt")'))
+            conn.execute(text(f"ANALYZE {table}"))
+        print(f"{table}: seeded in {time.perf_counter() - t0:.0f}s")
+
+    history = ('SELECT id, role, content, "createAt" FROM {table} WHERE "conversationId" = :conv '
+               "AND \"createAt\" > timezone('utc', now()) - interval '30 days' ORDER BY \"createAt\" DESC LIMIT 50")
+    for table in ("bench_msg_plain", "bench_msg_part"):
+        with engine.begin() as conn:
+            t0 = time.perf_counter()
+            for start in range(0, insert_rows, 1000):
+                conn.execute(text(
+                    f'INSERT INTO {table} ("conversationId", role, content, "createAt") '
+                    "VALUES (:conv, 'user', 'Năm nay tài lộc thế nào?', timezone('utc', now()))"),
+                    [{"conv": (start + i) % conversations} for i in range(1000)])
+            insert_rate = insert_rows / (time.perf_counter() - t0)
+
+        latencies = []
+        with engine.connect() as conn:
+            for i in range(500):
+                t0 = time.perf_counter()
+                conn.execute(text(history.format(table=table)), {"conv": (i * 7919) % conversations}).all()
+                latencies.append((time.perf_counter() - t0) * 1000)
+        latencies.sort()
+        print(f"{table}: insert {insert_rate:,.0f} rows/s, recent history p50 {latencies[250]:.2f} ms "
+              f"p99 {latencies[494]:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TuviMessage partitioning and retention")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    mig = sub.add_parser("migrate", help="Convert TuviMessage to monthly partitions")
+    mig.add_argument("--batch-size", type=int, default=50_000)
+    mig.add_argument("--months-ahead", type=int, default=3)
+
+    maintain = sub.add_parser("maintain", help="Create upcoming partitions and apply retention")
+    maintain.add_argument("--months-ahead", type=int, default=3)
+    maintain.add_argument("--keep-months", type=int, default=18)
+    maintain.add_argument("--archive-dir", default="/root/archive/tuvimsg")
+
+    b = sub.add_parser("bench", help="Plain vs partitioned benchmark")
+    b.add_argument("--rows", type=int, default=50_000_000)
+    b.add_argument("--conversations", type=int, default=500_000)
+    b.add_argument("--months", type=int, default=24)
+    b.add_argument("--insert-rows", type=int, default=100_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "migrate":
+        print(migrate(args.batch_size, args.months_ahead))
+    elif args.command == "maintain":
+        print(f"Created: {ensure_partitions(args.months_ahead)}")
+        for manifest in apply_retention(args.keep_months, args.archive_dir):
+            print(f"Archived {manifest['partition']}: {manifest['rows']} rows -> {manifest['file']}")
+    else:
+        bench(args.rows, args.conversations, args.months, args.insert_rows)
+
+
+if __name__ == "__main__":
+    main()
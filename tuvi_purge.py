@@ -0,0 +1,300 @@
+"""Batched background purge of soft-deleted Tu Vi charts and conversations.
+
+``delFlag`` soft-deletes leave charts, conversations and their messages in the
+hot tables forever. The purge worker hard-deletes them bottom-up (messages,
+daily fortunes, conversations, charts) with set-based statements of the form::
+
+    DELETE FROM "TuviMessage" WHERE id IN (SELECT ... LIMIT :n FOR UPDATE SKIP LOCKED)
+
+Each batch is its own short transaction with a ``lock_timeout``; rows locked
+by live traffic are skipped and retried after a back-off, and the pause between batches grows when batches
+get slow. Only rows flagged longer than ``--grace-days`` ago are purged, so a
+recent delete can still be undone.
+
+    python tuvi_purge.py run --batch-size 2000 --grace-days 7
+    DATABASE_URL=... python tuvi_purge.py bench --charts 20000 --deleted-ratio 0.3
+"""
+
+import argparse
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+
+from database_pg import (
+    GenderEnum, MessageRoleEnum, MessageTypeEnum,
+    TuviChart, TuviConversation, TuviMessage, engine, init_db,
+)
+
+logger = logging.getLogger(__name__)
+
+# Conversation is purgeable if it or its chart was soft-deleted before :cutoff
+_DEAD_CONVERSATION = (
+    '(c."delFlag" IS TRUE AND c."updateAt" < :cutoff) OR (ch."delFlag" IS TRUE AND ch."updatedAt" < :cutoff)'
+)
+
+# (table, alias locked, SELECT of purgeable ids)
+PURGE_STEPS = [
+    ("TuviMessage", "m", f'''
+        SELECT m.id FROM "TuviMessage" m
+        JOIN "TuviConversation" c ON c.id = m."conversationId"
+        JOIN "TuviChart" ch ON ch.id = c."chartId"
+        WHERE {_DEAD_CONVERSATION}'''),
+    ("TuviDailyFortune", "f", '''
+        SELECT f.id FROM "TuviDailyFortune" f
+        JOIN "TuviChart" ch ON ch.id = f."chartId"
+        WHERE ch."delFlag" IS TRUE AND ch."updatedAt" < :cutoff'''),
+    ("TuviConversation", "c", f'''
+        SELECT c.id FROM "TuviConversation" c
+        JOIN "TuviChart" ch ON ch.id = c."chartId"
+        WHERE {_DEAD_CONVERSATION}'''),
+    ("TuviChart", "ch", '''
+        SELECT ch.id FROM "TuviChart" ch
+        WHERE ch."delFlag" IS TRUE AND ch."updatedAt" < :cutoff'''),
+]
+
+# SQLSTATE lock_not_available, raised when lock_timeout expires
+LOCK_NOT_AVAILABLE = "55P03"
+# Rounds a step waits for rows that SKIP LOCKED keeps hiding before leaving them to the next run
+MAX_LOCKED_ROUNDS = 10
+
+
+def _delete_sql(table: str, alias: str, select: str) -> str:
+    return f'DELETE FROM "{table}" WHERE id IN ({select} LIMIT :n FOR UPDATE OF {alias} SKIP LOCKED)'
+
+
+class PurgeWorker:
+    """
+    Deletes soft-deleted rows in bounded, throttled batches.
+
+    Args:
+        batch_size: Rows per DELETE
+        pause: Base sleep between batches (seconds)
+        target_batch_ms: Batches slower than this double the pause (up to 10x)
+        lock_timeout_ms: Per-batch lock timeout; a timeout backs off and retries
+        grace_days: Only purge rows flagged at least this long ago
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 2000,
+        pause: float = 0.05,
+        target_batch_ms: float = 200.0,
+        lock_timeout_ms: int = 2000,
+        grace_days: float = 7,
+    ):
+        self.batch_size = batch_size
+        self.base_pause = pause
+        self.pause = pause
+        self.target_batch_ms = target_batch_ms
+        self.lock_timeout_ms = lock_timeout_ms
+        self.grace_days = grace_days
+        self.stopped = False
+        self.metrics: Dict[str, Dict[str, Any]] = {
+            table: {"deleted": 0, "batches": 0, "lock_timeouts": 0, "locked_rounds": 0, "last_batch_ms": 0.0,
+                    "elapsed_s": 0.0}
+            for table, _, _ in PURGE_STEPS
+        }
+
+    def _batch(self, sql: str, cutoff: datetime) -> int:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{int(self.lock_timeout_ms)}ms'"))
+            return conn.execute(text(sql), {"n": self.batch_size, "cutoff": cutoff}).rowcount
+
+    def _remaining(self, select: str, cutoff: datetime) -> bool:
+        with engine.connect() as conn:
+            return bool(conn.execute(text(f"SELECT EXISTS ({select})"), {"cutoff": cutoff}).scalar())
+
+    def _throttle(self, batch_ms: float) -> None:
+        if batch_ms > self.target_batch_ms:
+            self.pause = min(max(self.pause * 2, 0.01), max(self.base_pause * 10, 0.5))
+        else:
+            self.pause = max(self.base_pause, self.pause / 2)
+        time.sleep(self.pause)
+
+    def run(self, progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Purge until no flagged rows remain (or ``stop()`` is called).
+
+        Args:
+            progress: Called with (table, metrics) after every batch
+
+        Returns:
+            Per-table metrics
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.grace_days)
+        for table, alias, select in PURGE_STEPS:
+            sql = _delete_sql(table, alias, select)
+            stats = self.metrics[table]
+            started = time.perf_counter()
+            failures = 0
+            while not self.stopped:
+                t0 = time.perf_counter()
+                try:
+                    deleted = self._batch(sql, cutoff)
+                except OperationalError as e:
+                    if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+                        raise
+                    # lock_timeout: live traffic holds the rows, back off and retry
+                    failures += 1
+                    stats["lock_timeouts"] += 1
+                    logger.warning("Purge batch on %s timed out waiting for locks: %s", table, e.orig)
+                    if failures >= 10:
+                        raise
+                    self._throttle(float("inf"))
+                    continue
+                failures = 0
+                stats["last_batch_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                stats["deleted"] += deleted
+                stats["batches"] += 1
+                stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+                stats["rows_per_s"] = round(stats["deleted"] / stats["elapsed_s"], 1) if stats["elapsed_s"] else 0.0
+                if progress:
+                    progress(table, stats)
+                # A short batch only means rows were skipped or ran out; stop once
+                # a batch finds nothing and no purgeable row is left, locked or not
+                if deleted == 0:
+                    if not self._remaining(select, cutoff):
+                        break
+                    stats["locked_rounds"] += 1
+                    if stats["locked_rounds"] >= MAX_LOCKED_ROUNDS:
+                        logger.warning("Purge of %s left rows locked by live traffic for the next run", table)
+                        break
+                    self._throttle(float("inf"))
+                    continue
+                self._throttle(stats["last_batch_ms"])
+        return self.metrics
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+def _log_progress(table: str, stats: Dict[str, Any]) -> None:
+    logger.info("%s: deleted %s in %s batches (%s rows/s, last batch %s ms)",
+                table, stats["deleted"], stats["batches"], stats.get("rows_per_s"), stats["last_batch_ms"])
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def _sizes() -> Dict[str, str]:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT relname, pg_size_pretty(pg_table_size(oid)), pg_size_pretty(pg_indexes_size(oid)) "
+            "FROM pg_class WHERE relname IN ('TuviChart', 'TuviConversation', 'TuviMessage')")).all()
+    return {name: f"table {table_size}, indexes {index_size}" for name, table_size, index_size in rows}
+
+
+def _latencies(user_ids: List[int], conversation_ids: List[int]) -> Dict[str, float]:
+    """p50 of the hot read paths: chart list per user and recent history per conversation."""
+    queries = {
+        "list_charts": ('SELECT id, payload FROM "TuviChart" WHERE "userId" = :k AND "delFlag" IS NOT TRUE '
+                        "ORDER BY id DESC LIMIT 20", user_ids),
+        "user_conversations": ('SELECT id, title FROM "TuviConversation" WHERE "userId" = :k AND "delFlag" IS NOT TRUE '
+                               'ORDER BY "updateAt" DESC LIMIT 50', user_ids),
+        "chat_history": ('SELECT id, content FROM "TuviMessage" WHERE "conversationId" = :k '
+                         'ORDER BY "createAt" DESC LIMIT 50', conversation_ids),
+    }
+    result = {}
+    with engine.connect() as conn:
+        for name, (sql, keys) in queries.items():
+            samples = []
+            for key in keys:
+                t0 = time.perf_counter()
+                conn.execute(text(sql), {"k": key}).all()
+                samples.append((time.perf_counter() - t0) * 1000)
+            samples.sort()
+            result[f"{name}_p50_ms"] = round(samples[len(samples) // 2], 3)
+    return result
+
+
+def seed(charts: int, deleted_ratio: float, conversations_per_chart: int, messages_per_conversation: int) -> None:
+    """Insert bench users' charts/conversations/messages; ~deleted_ratio of the data is soft-deleted."""
+    rng = random.Random(11)
+    old = datetime.utcnow() - timedelta(days=30)
+    base_user = 5_000_000
+    with engine.begin() as conn:
+        conn.execute(insert(TuviChart.__table__), [
+            {"userId": base_user + i // 3, "payload": {"i": i}, "houses": [{"cung": "Mệnh"}] * 12, "extra": {},
+             "gender": GenderEnum.male, "delFlag": rng.random() < deleted_ratio, "updatedAt": old}
+            for i in range(charts)
+        ])
+        chart_ids = conn.execute(text('SELECT id FROM "TuviChart" WHERE "userId" >= :u ORDER BY id'),
+                                 {"u": base_user}).scalars().all()
+
+    for start in range(0, len(chart_ids), 500):
+        chunk = chart_ids[start:start + 500]
+        with engine.begin() as conn:
+            conn.execute(insert(TuviConversation.__table__), [
+                {"userId": base_user + (start + j) // 3, "chartId": chart_id, "title": "bench", "agentState": {},
+                 "delFlag": rng.random() < deleted_ratio / 3, "updateAt": old}
+                for j, chart_id in enumerate(chunk) for _ in range(conversations_per_chart)
+            ])
+            conv_ids = conn.execute(text('SELECT id FROM "TuviConversation" WHERE "chartId" = ANY(:ids)'),
+                                    {"ids": list(chunk)}).scalars().all()
+            conn.execute(insert(TuviMessage.__table__), [
+                {"conversationId": conv_id, "role": MessageRoleEnum.user if k % 2 == 0 else MessageRoleEnum.assistant,
+                 "content": "Cung Quan Lộc có Tử Vi, Thiên Phủ đồng cung. " * 4,
+                 "messageType": MessageTypeEnum.question, "createAt": old + timedelta(minutes=k)}
+                for conv_id in conv_ids for k in range(messages_per_conversation)
+            ])
+
+
+def bench(charts: int, deleted_ratio: float, vacuum_full: bool) -> None:
+    init_db()
+    seed(charts, deleted_ratio, conversations_per_chart=3, messages_per_conversation=20)
+    with engine.connect() as conn:
+        user_ids = conn.execute(text('SELECT DISTINCT "userId" FROM "TuviChart" WHERE "userId" >= 5000000 LIMIT 300')).scalars().all()
+        conversation_ids = conn.execute(text(
+            'SELECT c.id FROM "TuviConversation" c JOIN "TuviChart" ch ON ch.id = c."chartId" '
+            'WHERE c."delFlag" IS NOT TRUE AND ch."delFlag" IS NOT TRUE LIMIT 300')).scalars().all()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text('VACUUM ANALYZE "TuviChart", "TuviConversation", "TuviMessage"'))
+
+    print("=" * 70)
+    print(f"SOFT-DELETE PURGE ({charts} charts, {deleted_ratio:.0%} flagged)")
+    print("=" * 70)
+    print(f"before: {_sizes()}")
+    print(f"before: {_latencies(user_ids, conversation_ids)}")
+
+    worker = PurgeWorker(grace_days=1, pause=0)
+    print(f"purge:  {worker.run()}")
+
+    vacuum = "VACUUM (FULL, ANALYZE)" if vacuum_full else "VACUUM ANALYZE"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'{vacuum} "TuviChart", "TuviConversation", "TuviMessage"'))
+    print(f"after {vacuum}: {_sizes()}")
+    print(f"after:  {_latencies(user_ids, conversation_ids)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Purge soft-deleted Tu Vi rows")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run")
+    run.add_argument("--batch-size", type=int, default=2000)
+    run.add_argument("--pause", type=float, default=0.05)
+    run.add_argument("--grace-days", type=float, default=7)
+
+    b = sub.add_parser("bench")
+    b.add_argument("--charts", type=int, default=20_000)
+    b.add_argument("--deleted-ratio", type=float, default=0.3)
+    b.add_argument("--vacuum-full", action="store_true", help="Reclaim disk space (takes exclusive locks)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "run":
+        worker = PurgeWorker(batch_size=args.batch_size, pause=args.pause, grace_days=args.grace_days)
+        for table, stats in worker.run(_log_progress).items():
+            print(f"{table}: {stats}")
+    else:
+        bench(args.charts, args.deleted_ratio, args.vacuum_full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Per-query instrumentation and slow-query log for database_pg.
+
+SQLAlchemy cursor events time every statement on the engine and aggregate
+by (fingerprint, origin):
+
+- fingerprint: the statement with literals, IN-lists and whitespace
+  normalized, so ``... WHERE id = 12`` and ``... WHERE id = 13`` collapse
+- origin: the innermost ``@traced`` function on the stack (``fetch_chart``,
+  ``list_charts``, history loads in tuvi_context), ``-`` otherwise
+- duration histogram, rows returned, max
+
+Statements slower than ``TUVI_SLOW_QUERY_MS`` are logged and their plan is
+captured with ``EXPLAIN (FORMAT JSON)`` on a background thread (at most once
+per fingerprint per ``EXPLAIN_INTERVAL`` seconds), so the request never
+waits on it.
+
+Off unless ``TUVI_QUERY_STATS=1``; when off, ``@traced`` returns the function
+unchanged and no listeners are attached. Report (admin only: pass the app's
+admin dependency, or send ``X-Debug-Token: $TUVI_DEBUG_TOKEN``)::
+
+    from tuvi_query_stats import create_router
+    app.include_router(create_router([Depends(require_admin)]), prefix="/api/v1")   # GET /debug/query-stats
+
+Hook overhead benchmark (in-memory SQLite, no server needed)::
+
+    python tuvi_query_stats.py bench --queries 20000
+"""
+
+import argparse
+import bisect
+import contextvars
+import functools
+import hmac
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TUVI_QUERY_STATS", "0").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("TUVI_SLOW_QUERY_MS", "200"))
+EXPLAIN_INTERVAL = 300.0
+# Shared secret for the debug router when the app passes no admin dependency; unset = always 403
+DEBUG_TOKEN = os.getenv("TUVI_DEBUG_TOKEN", "")
+MAX_SLOW_ENTRIES = 100
+
+# Upper bounds in ms; the last bucket is open-ended
+BUCKETS_MS = [0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+_origin: contextvars.ContextVar[str] = contextvars.ContextVar("tuvi_query_origin", default="-")
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    # (?<!:) keeps ::jsonb / ::text casts intact
+    (re.compile(r"%\(\w+\)s|%s|(?<!:):\w+"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize literals and bind markers out of a statement (cached per statement text)."""
+    for pattern, repl in _LITERALS:
+        statement = pattern.sub(repl, statement)
+    return statement.strip()
+
+
+def traced(fn: Callable) -> Callable:
+    """Attribute queries issued inside ``fn`` to its name."""
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _origin.set(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _origin.reset(token)
+    return wrapper
+
+
+class _Stat:
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class QueryStats:
+    """Thread-safe aggregate of statement timings plus recent slow queries."""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._stats: Dict[Tuple[str, str], _Stat] = {}
+        self._lock = threading.Lock()
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=MAX_SLOW_ENTRIES)
+        self._explained: Dict[str, float] = {}
+        # (engine, slow entry, statement, parameters); parameters never go into the entry
+        self._explain_queue: "queue.Queue[Tuple[Engine, Dict[str, Any], str, Any]]" = queue.Queue(maxsize=50)
+        self._explain_thread: Optional[threading.Thread] = None
+
+    def record(self, statement: str, duration_ms: float, rows: int, origin: str) -> str:
+        fp = fingerprint(statement)
+        i = bisect.bisect_left(BUCKETS_MS, duration_ms)
+        with self._lock:
+            stat = self._stats.get((fp, origin))
+            if stat is None:
+                stat = self._stats[(fp, origin)] = _Stat()
+            stat.count += 1
+            stat.total_ms += duration_ms
+            stat.rows += max(rows, 0)
+            stat.buckets[i] += 1
+            if duration_ms > stat.max_ms:
+                stat.max_ms = duration_ms
+        return fp
+
+    def record_slow(self, engine: Engine, fp: str, statement: str, parameters: Any, duration_ms: float,
+                    origin: str) -> None:
+        entry = {"fingerprint": fp, "origin": origin, "duration_ms": round(duration_ms, 2),
+                 "at": time.time(), "plan": None}
+        self.slow.append(entry)
+        logger.warning("Slow query %.1f ms in %s: %s", duration_ms, origin, fp[:500])
+
+        now = time.monotonic()
+        if engine.dialect.name != "postgresql" or now - self._explained.get(fp, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+            return
+        self._explained[fp] = now
+        try:
+            self._explain_queue.put_nowait((engine, entry, statement, parameters))
+        except queue.Full:
+            return
+        if self._explain_thread is None or not self._explain_thread.is_alive():
+            self._explain_thread = threading.Thread(target=self._explain_loop, name="query-explain", daemon=True)
+            self._explain_thread.start()
+
+    def _explain_loop(self) -> None:
+        while True:
+            engine, entry, statement, parameters = self._explain_queue.get()
+            # Plain DBAPI cursor: bypasses the engine events, so EXPLAIN is not recorded itself.
+            # The statement stays parameterized; values are bound by the driver, not stored.
+            raw = engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                entry["plan"] = cursor.fetchone()[0]
+                raw.rollback()
+            except Exception as e:
+                entry["plan"] = {"error": str(e)}
+            finally:
+                raw.close()
+
+    def report(self, top: int = 20, order_by: str = "total_ms") -> Dict[str, Any]:
+        """
+        Aggregated statements, heaviest first.
+
+        Args:
+            top: Number of (fingerprint, origin) entries
+            order_by: total_ms, count, max_ms, p99_ms or rows
+
+        Returns:
+            Dict with "queries" and "slow" lists
+        """
+        with self._lock:
+            items = [(fp, origin, stat, stat.percentile(0.5), stat.percentile(0.99))
+                     for (fp, origin), stat in self._stats.items()]
+        queries = [{
+            "fingerprint": fp,
+            "origin": origin,
+            "count": stat.count,
+            "total_ms": round(stat.total_ms, 2),
+            "mean_ms": round(stat.total_ms / stat.count, 3),
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "max_ms": round(stat.max_ms, 2),
+            "rows": stat.rows,
+        } for fp, origin, stat, p50, p99 in items]
+        queries.sort(key=lambda q: q[order_by], reverse=True)
+        return {"slow_query_ms": self.slow_ms, "queries": queries[:top], "slow": [dict(e) for e in self.slow]}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        self.slow.clear()
+        self._explained.clear()
+
+
+query_stats = QueryStats()
+
+# engine -> (before, after) listeners, kept for uninstall
+_listeners: "weakref.WeakKeyDictionary[Engine, Tuple[Callable, Callable]]" = weakref.WeakKeyDictionary()
+
+
+def install(engine: Engine, stats: QueryStats = query_stats) -> None:
+    """Attach the timing listeners to ``engine`` (idempotent)."""
+    if engine in _listeners:
+        return
+    perf_counter, record, get_origin = time.perf_counter, stats.record, _origin.get
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (perf_counter() - context._query_start) * 1000
+        origin = get_origin()
+        fp = record(statement, duration_ms, cursor.rowcount, origin)
+        if duration_ms >= stats.slow_ms:
+            # executemany: the plan of the first parameter set stands for the batch
+            stats.record_slow(engine, fp, statement, parameters[0] if executemany else parameters, duration_ms, origin)
+
+    _listeners[engine] = (before_cursor_execute, after_cursor_execute)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def uninstall(engine: Engine) -> None:
+    """Detach the timing listeners from ``engine``."""
+    listeners = _listeners.pop(engine, None)
+    if listeners:
+        event.remove(engine, "before_cursor_execute", listeners[0])
+        event.remove(engine, "after_cursor_execute", listeners[1])
+
+
+def install_if_enabled(engine: Engine) -> None:
+    """Attach the listeners when TUVI_QUERY_STATS is set."""
+    if ENABLED:
+        install(engine)
+
+
+def create_router(dependencies: Optional[List[Any]] = None):
+    """
+    FastAPI router with GET/DELETE /debug/query-stats (fastapi imported lazily).
+
+    Args:
+        dependencies: Route dependencies, normally the app's admin check. When
+            omitted, requests must send ``X-Debug-Token`` matching
+            ``TUVI_DEBUG_TOKEN`` and are refused while it is unset.
+    """
+    from fastapi import APIRouter, Depends, Header, HTTPException
+
+    if dependencies is None:
+        def require_debug_token(x_debug_token: str = Header("")):
+            if not DEBUG_TOKEN or not hmac.compare_digest(x_debug_token.encode("utf-8"), DEBUG_TOKEN.encode("utf-8")):
+                raise HTTPException(status_code=403, detail="Forbidden")
+
+        dependencies = [Depends(require_debug_token)]
+    router = APIRouter(dependencies=dependencies)
+
+    @router.get("/debug/query-stats")
+    def get_query_stats(top: int = 20, order_by: str = "total_ms"):
+        if order_by not in ("total_ms", "count", "max_ms", "p99_ms", "rows"):
+            order_by = "total_ms"
+        return query_stats.report(top, order_by)
+
+    @router.delete("/debug/query-stats")
+    def reset_query_stats():
+        query_stats.reset()
+        return {"status": "reset"}
+
+    return router
+
+
+# ============================================
+# Benchmark
+# ============================================
+
+def bench(queries: int, url: str) -> None:
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS qs_bench"))
+        conn.execute(text("CREATE TABLE qs_bench (id INTEGER PRIMARY KEY, v TEXT)"))
+        conn.execute(text("INSERT INTO qs_bench (id, v) VALUES (:id, :v)"), [{"id": i, "v": "x"} for i in range(100)])
+
+    def fetch_row(conn, i: int) -> None:
+        conn.execute(text("SELECT id, v FROM qs_bench WHERE id = :id"), {"id": i % 100}).fetchall()
+
+    def run() -> float:
+        with engine.connect() as conn:
+            fetch_row(conn, 0)
+            t0 = time.perf_counter()
+            for i in range(queries):
+                fetch_row(conn, i)
+            return (time.perf_counter() - t0) / queries * 1e6
+
+    stats = QueryStats(slow_ms=1e9)
+
+    print("=" * 70)
+    print(f"QUERY STATS OVERHEAD ({engine.dialect.name}, {queries} queries)")
+    print("=" * 70)
+    results = {}
+    for label in ("off", "on") * 5:
+        if label == "on":
+            install(engine, stats)
+        else:
+            uninstall(engine)
+        results.setdefault(label, []).append(run())
+    off, on = min(results["off"]), min(results["on"])
+    print(f"hooks off {off:8.1f} us/query")
+    print(f"hooks on  {on:8.1f} us/query   overhead {on - off:+.1f} us ({(on - off) / off * 100:+.1f}%)")
+    report = stats.report(top=1)["queries"][0]
+    print(f"recorded: {report['count']} x {report['fingerprint']!r} p50 {report['p50_ms']} ms")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE qs_bench"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="database_pg query instrumentation")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Measure hook overhead per statement")
+    b.add_argument("--queries", type=int, default=20000)
+    b.add_argument("--url", default="sqlite://", help="Engine URL (default: in-memory SQLite)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args.queries, args.url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Memoization of deterministic Tu Vi agent tool calls.
+
+Every agent turn records ``toolCalls`` such as
+``{"tool": "chinese_daily", "params": {...}, "result": {...}}`` and the same
+deterministic tools are re-invoked with identical params across turns and
+users. ``ToolMemo`` caches results keyed by tool name + canonicalized params:
+
+- per-tool TTL (tools without a TTL are never memoized)
+- size-bounded LRU in process memory
+- optional on-disk SQLite store (WAL mode) shared by all uvicorn workers on
+  the host, enabled with ``TUVI_TOOL_MEMO_PATH``
+
+Both tiers hold the JSON encoding (as stored in toolCalls), and every call,
+including the one that ran the tool, returns a freshly decoded copy. Callers
+get one stable type whichever tier answered (dates come back as strings),
+and cannot mutate a shared cached object.
+
+Usage in the agent::
+
+    from tuvi_tool_memo import tool_memo
+
+    result = tool_memo.call("chinese_daily", params, lambda: chinese_daily(**params))
+
+Replay benchmark (toolCalls exported from TuviMessage, or synthetic)::
+
+    python tuvi_tool_memo.py --log toolcalls.jsonl
+    python tuvi_tool_memo.py --turns 2000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Seconds a result stays valid per tool; tools not listed are not memoized
+DEFAULT_TOOL_TTLS: Dict[str, float] = {
+    "chinese_daily": 24 * 3600,
+    "rag_lookup": 6 * 3600,
+}
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_DISK_ROWS = 200_000
+
+
+def _load_ttls() -> Dict[str, float]:
+    ttls = dict(DEFAULT_TOOL_TTLS)
+    # e.g. TUVI_TOOL_TTLS='{"chinese_daily": 43200, "lunar_convert": 604800}'
+    ttls.update(json.loads(os.getenv("TUVI_TOOL_TTLS", "{}")))
+    return ttls
+
+
+def canonical_key(tool: str, params: Dict[str, Any]) -> str:
+    """
+    Stable cache key for a tool invocation.
+
+    Key order, whitespace and unicode escaping in params do not matter;
+    values that JSON cannot encode (dates) are stringified.
+    """
+    blob = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f"{tool}:{hashlib.sha256(blob.encode('utf-8')).hexdigest()}"
+
+
+class DiskStore:
+    """SQLite-backed shared store; one connection per thread."""
+
+    def __init__(self, path: str, max_rows: int = DEFAULT_MAX_DISK_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._puts = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_memo ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_memo_accessed ON tool_memo (accessed)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """(JSON text, expires) of a live entry, or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires, accessed FROM tool_memo WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        # Coarse LRU clock: avoid a write on every hit
+        if now - row[2] > 60:
+            conn.execute("UPDATE tool_memo SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return row[0], row[1]
+
+    def put(self, key: str, blob: str, expires: float, now: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO tool_memo (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, blob, expires, now),
+        )
+        self._puts += 1
+        if self._puts % 500 == 0:
+            self._prune(conn, now)
+        conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM tool_memo WHERE expires <= ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM tool_memo").fetchone()[0] - self.max_rows
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM tool_memo WHERE key IN (SELECT key FROM tool_memo ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+
+
+class ToolMemo:
+    """
+    Memoizes tool results by tool name + canonical params.
+
+    Memory is checked first, then the disk store; a disk hit is promoted to
+    memory. Failures from the tool are never cached.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        disk_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttls = _load_ttls() if ttls is None else ttls
+        self.max_entries = max_entries
+        self.disk = DiskStore(disk_path) if disk_path else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires, JSON text)
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"invocations": 0, "memory_hits": 0, "disk_hits": 0})
+
+    def call(self, tool: str, params: Dict[str, Any], invoke: Callable[[], Any]) -> Any:
+        """
+        Return the memoized result for (tool, params), invoking the tool on a miss.
+
+        Args:
+            tool: Tool name as recorded in toolCalls
+            params: Tool parameters
+            invoke: Zero-argument callable that runs the tool
+
+        Returns:
+            Tool result; a JSON round-trip of it when memoized
+        """
+        ttl = self.ttls.get(tool)
+        if not ttl:
+            self._count(tool, "invocations")
+            return invoke()
+
+        key = canonical_key(tool, params)
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self._counts[tool]["memory_hits"] += 1
+                blob = entry[1]
+            else:
+                blob = None
+        if blob is not None:
+            return json.loads(blob)
+
+        if self.disk is not None:
+            found = self.disk.get(key, now)
+            if found is not None:
+                blob, expires = found
+                # Keep the stored expiry: a fresh TTL here would outlive the disk entry
+                self._remember(key, blob, expires)
+                self._count(tool, "disk_hits")
+                return json.loads(blob)
+
+        self._count(tool, "invocations")
+        blob = json.dumps(invoke(), ensure_ascii=False, default=str)
+        self._remember(key, blob, now + ttl)
+        if self.disk is not None:
+            self.disk.put(key, blob, now + ttl, now)
+        return json.loads(blob)
+
+    def _remember(self, key: str, blob: str, expires: float) -> None:
+        with self._lock:
+            self._memory[key] = (expires, blob)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, tool: str, field: str) -> None:
+        with self._lock:
+            self._counts[tool][field] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tool invocation and hit counters."""
+        with self._lock:
+            return {"entries": len(self._memory), "tools": {tool: dict(c) for tool, c in self._counts.items()}}
+
+
+def memoized(tool: str, memo: Optional["ToolMemo"] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator for tool functions taking keyword params::
+
+        @memoized("chinese_daily")
+        def chinese_daily(date: str, timezone: str) -> dict: ...
+    """
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(**params: Any) -> Any:
+            return (memo or tool_memo).call(tool, params, lambda: fn(**params))
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorate
+
+
+# Shared instance for the API process
+tool_memo = ToolMemo(disk_path=os.getenv("TUVI_TOOL_MEMO_PATH") or None)
+
+
+# ============================================
+# Replay benchmark
+# ============================================
+
+def load_log(path: str) -> List[List[Dict[str, Any]]]:
+    """One agent turn per line: a toolCalls list (as stored in TuviMessage.toolCalls)."""
+    turns = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                calls = json.loads(line)
+                turns.append(calls if isinstance(calls, list) else [calls])
+    return turns
+
+
+def synthetic_log(turns: int, seed: int = 3) -> List[List[Dict[str, Any]]]:
+    rng = random.Random(seed)
+    topics = ["sự nghiệp", "tình duyên", "tài lộc", "sức khỏe", "gia đạo", "Tử Vi cư Ngọ", "Thiên Phủ"]
+    log = []
+    for _ in range(turns):
+        calls = [{"tool": "chinese_daily", "params": {"date": f"2026-10-{rng.randint(18, 20)}", "timezone": "Asia/Ho_Chi_Minh"}}]
+        if rng.random() < 0.7:
+            calls.append({"tool": "rag_lookup", "params": {"query": rng.choice(topics), "k": 5}})
+        if rng.random() < 0.2:
+            # Non-deterministic tool: never memoized
+            calls.append({"tool": "web_search", "params": {"q": rng.choice(topics)}})
+        log.append(calls)
+    return log
+
+
+def replay(log: List[List[Dict[str, Any]]], memo: Optional[ToolMemo], tool_ms: Dict[str, float]) -> Dict[str, Any]:
+    invocations: Dict[str, int] = defaultdict(int)
+
+    def make_invoke(tool: str, params: Dict[str, Any]) -> Callable[[], Any]:
+        def invoke() -> Any:
+            invocations[tool] += 1
+            time.sleep(tool_ms.get(tool, 1.0) / 1000)
+            return {"tool": tool, "echo": params}
+        return invoke
+
+    latencies = []
+    for calls in log:
+        t0 = time.perf_counter()
+        for call in calls:
+            invoke = make_invoke(call["tool"], call["params"])
+            if memo is None:
+                invoke()
+            else:
+                memo.call(call["tool"], call["params"], invoke)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    latencies.sort()
+    return {
+        "turns": len(log),
+        "invocations": dict(invocations),
+        "total_invocations": sum(invocations.values()),
+        "mean_turn_ms": round(sum(latencies) / len(latencies), 3),
+        "p99_turn_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay benchmark for tool-call memoization")
+    parser.add_argument("--log", help="JSONL of toolCalls lists; synthetic if omitted")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--disk", help="Also exercise the SQLite store at this path")
+    args = parser.parse_args()
+
+    log = load_log(args.log) if args.log else synthetic_log(args.turns)
+    tool_ms = {"chinese_daily": 2.0, "rag_lookup": 3.0, "web_search": 1.0}
+
+    before = replay(log, None, tool_ms)
+    memo = ToolMemo(ttls=DEFAULT_TOOL_TTLS, disk_path=args.disk)
+    after = replay(log, memo, tool_ms)
+
+    print("=" * 60)
+    print("TOOL MEMOIZATION REPLAY")
+    print("=" * 60)
+    for label, result in (("before", before), ("after", after)):
+        print(f"\n{label}:")
+        for key, value in result.items():
+            print(f"  {key}: {value}")
+    print(f"\nmemo stats: {memo.stats()}")
+
+
+if __name__ == "__main__":
+    main()
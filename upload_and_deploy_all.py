@@ -1,5 +1,6 @@
 import paramiko
 import os
+import subprocess
 import sys
 import time
 
@@ -170,5 +171,14 @@ EOF
     sftp.close()
     client.close()
 
+    # Hit every GET in the specs; fails the deploy on errors, bad shapes or slower endpoints
+    print("\n--- SMOKE TEST ---")
+    time.sleep(15)  # containers were just (re)started
+    smoke = subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "smoke_test.py"),
+                            "--host", hostname])
+    if smoke.returncode != 0:
+        print("Smoke test failed, see above.")
+        sys.exit(smoke.returncode)
+
 except Exception as e:
     print(f"An error occurred: {e}")